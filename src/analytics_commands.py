@@ -0,0 +1,53 @@
+"""
+Analytics command-line interface module for the Personality Analysis System.
+
+This module contains functions that handle CLI commands summarizing the candidate
+population, such as cohorts found in the friendliness/dominance plane.
+
+Functions:
+    show_cohorts: Handles the 'analytics cohorts' command to report population cohorts.
+"""
+
+import math
+import time
+from typing import Any
+from person_dao import PersonDAO
+from services.analytics_service import AnalyticsService
+
+
+def show_cohorts(args: Any) -> None:
+    """Handles the 'analytics cohorts' command."""
+    person_dao = PersonDAO()
+    person_dao.create_tables()
+    start = time.perf_counter()
+    try:
+        service = AnalyticsService(person_dao, chunk_size=args.chunk_size)
+        report = service.cohorts(method=args.method, clusters=args.clusters, cell_size=args.cell_size,
+                                 seed=args.seed)
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return
+    except Exception as e:
+        print(f"Error analyzing cohorts: {str(e)}")
+        return
+    elapsed = time.perf_counter() - start
+
+    print(f"Persons: {report.total} ({report.observed} with traits, {report.unobserved} without)")
+    if report.observed == 0:
+        print("No persons with traits to analyze.")
+        return
+
+    print("Quadrants:")
+    for name, count in report.quadrants.items():
+        print(f"- {name}: {count} ({count / report.observed:.1%})")
+
+    label_width = max(len('Cohort'), *(len(cohort.label) for cohort in report.cohorts))
+    density = '' if report.method == 'kmeans' else f" {'Density':>9}"
+    print(f"\n{'Cohort':<{label_width}} {'Count':>9} {'Share':>7} {'F':>6} {'D':>6} "
+          f"{'F std':>6} {'D std':>6} {'RMS':>6}{density}")
+    for cohort in report.cohorts:
+        density = '' if math.isnan(cohort.density) else f" {cohort.density:>9.1f}"
+        print(f"{cohort.label:<{label_width}} {cohort.count:>9} {cohort.share:>7.1%} "
+              f"{cohort.friendliness:>6.2f} {cohort.dominance:>6.2f} {cohort.friendliness_std:>6.2f} "
+              f"{cohort.dominance_std:>6.2f} {cohort.rms_radius:>6.2f}{density}")
+    print(f"\nWithin-cohort sum of squares: {report.inertia:.2f} ({elapsed:.2f}s)")
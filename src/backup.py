@@ -0,0 +1,221 @@
+"""
+Online backup module for the Personality Analysis System.
+
+This module snapshots and restores SQLite database files through SQLite's backup API.
+How a snapshot copies depends on the source's journal mode. With WAL
+(``--concurrency wal`` or ``writer``) every page is copied in a single backup step,
+i.e. inside one read transaction: other connections keep reading and writing while
+it runs, and their writes cannot restart it. With a rollback journal a read
+transaction blocks writers, so the copy goes in batches with a short pause between
+them in which writers get the lock. Every write in such a pause restarts the copy;
+after ``MAX_SNAPSHOT_RESTARTS`` restarts the remaining attempt is made in a single
+step, during which writers wait. Restores copy from a snapshot nobody writes to, so
+they go in batches as well.
+
+Snapshots can be gzip-compressed (``.gz`` suffix) and are accompanied by a
+``<snapshot>.sha256`` file in ``sha256sum`` format, which ``restore`` verifies.
+
+Classes:
+    SnapshotInfo: Describes a written snapshot.
+
+Functions:
+    snapshot: Copies a live database into a snapshot file.
+    restore: Copies a snapshot back into a database file.
+"""
+
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+import db_connection
+import schema
+
+# Constants
+DEFAULT_PAGES_PER_STEP = 1024  # for restores and rollback-journal snapshots
+STEP_SLEEP = 0.005  # seconds between batches, lets other connections at the database
+MAX_SNAPSHOT_RESTARTS = 3  # batched snapshot attempts before copying in one step
+CHECKSUM_SUFFIX = '.sha256'
+COPY_CHUNK_SIZE = 1024 * 1024
+
+ProgressCallback = Callable[[int, int, int], None]
+
+
+@dataclass
+class SnapshotInfo:
+    """Describes a written snapshot."""
+    path: str
+    size_bytes: int
+    sha256: Optional[str]
+    compressed: bool
+
+
+def _copy_pages(source: sqlite3.Connection, target: sqlite3.Connection,
+                pages: int, progress: Optional[ProgressCallback]):
+    """Copies ``pages`` pages per backup step, or all of them in one step with -1."""
+    source.backup(target, pages=pages, progress=progress, sleep=STEP_SLEEP)
+
+
+class _Restarted(Exception):
+    """Aborts a batched snapshot that writes to the source keep restarting."""
+
+
+def _copy_snapshot_pages(source: sqlite3.Connection, target: sqlite3.Connection,
+                         pages: int, progress: Optional[ProgressCallback]):
+    """
+    Copies a live database without holding its lock for long.
+
+    WAL sources are copied in one step. Rollback-journal sources are copied in
+    batches of ``pages`` and fall back to one step after ``MAX_SNAPSHOT_RESTARTS``.
+    """
+    if source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal':
+        _copy_pages(source, target, -1, progress)
+        return
+
+    restarts = 0
+    last_remaining = None
+
+    def step_done(status, remaining, total):
+        nonlocal restarts, last_remaining
+        # Each step copies at least one page, so remaining only fails to shrink on a restart
+        if last_remaining is not None and remaining >= last_remaining:
+            restarts += 1
+            if restarts > MAX_SNAPSHOT_RESTARTS:
+                raise _Restarted()
+        last_remaining = remaining
+        if progress:
+            progress(status, remaining, total)
+        if remaining:
+            # No lock is held between steps; this is when writers get theirs
+            time.sleep(STEP_SLEEP)
+
+    try:
+        _copy_pages(source, target, pages, step_done)
+    except _Restarted:
+        _copy_pages(source, target, -1, progress)
+
+
+def _copy_file(source_path: str, target_path: str, compress: bool = False, decompress: bool = False):
+    """Streams a file to another path, optionally gzip-compressing or decompressing it."""
+    opener = gzip.open if decompress else open
+    with opener(source_path, 'rb') as source:
+        with (gzip.open(target_path, 'wb') if compress else open(target_path, 'wb')) as target:
+            shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot(db_name: str, output_path: str, compress: Optional[bool] = None, checksum: bool = True,
+             pages: int = DEFAULT_PAGES_PER_STEP, progress: Optional[ProgressCallback] = None) -> SnapshotInfo:
+    """
+    Writes a consistent snapshot of a live database.
+
+    Args:
+        db_name: The database file to copy.
+        output_path: Snapshot file to write. It is replaced atomically when complete.
+        compress: Gzip the snapshot. Defaults to True when output_path ends in '.gz'.
+        checksum: Also write ``output_path + '.sha256'``.
+        pages: Pages copied per backup step when the source uses a rollback journal.
+        progress: Optional callback(status, remaining, total) called after each backup step.
+    """
+    if pages < 1:
+        raise ValueError("pages must be at least 1")
+    if compress is None:
+        compress = output_path.endswith('.gz')
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+
+    fd, staging_path = tempfile.mkstemp(prefix='.snapshot-', suffix='.db', dir=output_dir)
+    os.close(fd)
+    final_tmp_path = staging_path + '.out'
+    try:
+        source = sqlite3.connect(db_name, timeout=db_connection.DB_TIMEOUT, uri=db_connection.is_uri(db_name))
+        target = sqlite3.connect(staging_path)
+        try:
+            _copy_snapshot_pages(source, target, pages, progress)
+        finally:
+            target.close()
+            source.close()
+
+        if compress:
+            _copy_file(staging_path, final_tmp_path, compress=True)
+        else:
+            os.replace(staging_path, final_tmp_path)
+        # Checksum the bytes on disk, i.e. the compressed bytes for compressed snapshots
+        digest = _file_sha256(final_tmp_path) if checksum else None
+        os.replace(final_tmp_path, output_path)
+    finally:
+        for leftover in (staging_path, final_tmp_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    if checksum:
+        with open(output_path + CHECKSUM_SUFFIX, 'w', encoding='utf-8') as handle:
+            handle.write(f"{digest}  {os.path.basename(output_path)}\n")
+    return SnapshotInfo(output_path, os.path.getsize(output_path), digest if checksum else None, compress)
+
+
+def verify_checksum(snapshot_path: str) -> bool:
+    """Checks a snapshot against its .sha256 file. Raises FileNotFoundError if there is none."""
+    with open(snapshot_path + CHECKSUM_SUFFIX, encoding='utf-8') as handle:
+        expected = handle.read().split()[0].lower()
+    return _file_sha256(snapshot_path) == expected
+
+
+def restore(snapshot_path: str, db_name: str, require_checksum: bool = False,
+            pages: int = DEFAULT_PAGES_PER_STEP, progress: Optional[ProgressCallback] = None):
+    """
+    Replaces the contents of a database with a snapshot.
+
+    The snapshot's checksum is verified when a .sha256 file exists (or required with
+    ``require_checksum``), and its integrity is checked before any page of the target
+    is touched. The copy itself goes through the backup API, so the target is
+    replaced in one step from the point of view of other connections.
+    """
+    if pages < 1:
+        raise ValueError("pages must be at least 1")
+    if os.path.exists(snapshot_path + CHECKSUM_SUFFIX):
+        if not verify_checksum(snapshot_path):
+            raise ValueError(f"Checksum mismatch for snapshot '{snapshot_path}'")
+    elif require_checksum:
+        raise ValueError(f"No checksum file found for snapshot '{snapshot_path}'")
+
+    staging_dir = tempfile.mkdtemp(prefix='restore-')
+    try:
+        source_path = snapshot_path
+        if snapshot_path.endswith('.gz'):
+            source_path = os.path.join(staging_dir, 'snapshot.db')
+            _copy_file(snapshot_path, source_path, compress=False, decompress=True)
+
+        source = sqlite3.connect(Path(source_path).absolute().as_uri() + '?mode=ro', uri=True)
+        try:
+            try:
+                result = source.execute('PRAGMA quick_check').fetchone()[0]
+            except sqlite3.DatabaseError as e:
+                raise ValueError(f"'{snapshot_path}' is not a valid database snapshot: {e}")
+            if result != 'ok':
+                raise ValueError(f"Snapshot '{snapshot_path}' failed integrity check: {result}")
+            target = sqlite3.connect(db_name, timeout=db_connection.DB_TIMEOUT,
+                                     uri=db_connection.is_uri(db_name))
+            try:
+                _copy_pages(source, target, pages, progress)
+            finally:
+                target.close()
+        finally:
+            source.close()
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    # The restored file may be at a different schema version than this process assumed
+    schema.invalidate(db_name)
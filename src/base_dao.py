@@ -0,0 +1,370 @@
+"""
+Storage interface module for the Personality Analysis System.
+
+This module defines the contract between the services and the storage backends. The
+services only call the methods declared here, so they run unchanged on any backend:
+
+- SQLite (``person_dao.PersonDAO``, ``trait_dao.TraitDAO``, ``company_dao.CompanyDAO``):
+  durable, shareable between processes, with triggers keeping saved rankings current.
+- Memory (``memory_dao``): everything in process memory, in NumPy arrays and hash maps,
+  persisted by snapshots written off the request path.
+
+Behaviour that does not depend on the storage, such as input validation, the cached
+search indexes, merging duplicate profiles and grouping similar names, is implemented
+once here.
+
+``db_name`` identifies a store: SQLite DAOs use the database path, other backends a
+unique label. It keys the process-wide index caches, so it must differ between stores.
+
+Classes:
+    BaseDAO: Abstract base class defining the interface for all DAO operations.
+    BasePersonDAO: Interface for person profiles, trait counts and name keys.
+    BaseTraitDAO: Interface for the trait lexicon.
+    BaseCompanyDAO: Interface for saved company profiles and open roles.
+    SimilarPersonError: Raised when a new name looks like an existing person's.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import decay as decay_model
+import fuzzy_index
+import lexicon
+import name_keys
+import personality_models
+import role_index
+from company import Company
+
+# Constants
+DEFAULT_ARRAY_CHUNK = 100_000
+MAX_PERSON_NAME_LENGTH = 100
+MAX_TRAIT_NAME_LENGTH = 50
+
+# (trait, other) -> number of descriptions that named both; see person_dao.cooccurrences
+TraitPairCounts = Dict[Tuple[str, str], int]
+# friendliness, dominance, n_friendliness, n_dominance and decayed sums of one profile
+ProfileState = Tuple[float, float, int, int, personality_models.DecayState]
+
+
+class SimilarPersonError(ValueError):
+    """Raised when a new person's name looks like the names of existing persons."""
+    def __init__(self, name: str, matches: List[str]):
+        super().__init__(f"Person '{name}' may be a duplicate of: {', '.join(matches)}")
+        self.name = name
+        self.matches = matches
+
+
+class BaseDAO(ABC):
+    """Abstract base class for Database Access Objects."""
+    def __init__(self, db_name: str):
+        self.db_name = db_name
+
+    @abstractmethod
+    def create_tables(self):
+        pass
+
+    @abstractmethod
+    def get_all(self):
+        pass
+
+
+class BasePersonDAO(BaseDAO):
+    """Interface for person profiles, their trait counts and their name keys."""
+
+    @abstractmethod
+    def get_all(self) -> List[Dict]:
+        """Retrieves all persons as dictionaries with person, friendliness, dominance and counts."""
+
+    @abstractmethod
+    def get_person(self, name: str) -> Optional[Dict]:
+        """Retrieves a single person by name, including their time-decayed sums."""
+
+    @abstractmethod
+    def add_person(self, name: str, allow_similar: bool = False):
+        """Adds a person; raises ValueError if it exists and SimilarPersonError if it looks like another."""
+
+    @abstractmethod
+    def add_persons(self, names: Iterable[str],
+                    allow_similar: bool = False) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Adds persons, skipping existing names. Returns (added, {held back name: similar names})."""
+
+    @abstractmethod
+    def update_personalities(self, updates: Iterable[Tuple]):
+        """Applies (name, personality, n_friendliness, n_dominance[, decay[, traits[, pairs]]]) updates at once."""
+
+    @abstractmethod
+    def modify_person(self, name: str, modify: Callable[[Dict], Tuple]):
+        """
+        Reads a person and writes ``modify(person)`` back as one atomic update.
+
+        ``modify`` gets the person as returned by get_person and returns the
+        (personality, n_friendliness, n_dominance[, decay[, traits[, pairs]]]) to write.
+        No other update of the person can happen in between, so none is lost.
+
+        Raises:
+            ValueError: If the person does not exist.
+        """
+
+    def update_personality(self, name: str, personality: personality_models.Personality,
+                           n_friendliness: int, n_dominance: int,
+                           decay: Optional[personality_models.DecayState] = None,
+                           traits: Optional[Dict[str, int]] = None,
+                           pairs: Optional[TraitPairCounts] = None):
+        """
+        Updates the personality scores and counts, and the decayed sums if given, for a given person.
+
+        ``traits`` maps the traits observed since the last update to their number of
+        observations, and ``pairs`` holds the co-occurrence counts of the descriptions
+        they came from (see cooccurrences). Both are added in the same transaction.
+        """
+        self.update_personalities([(name, personality, n_friendliness, n_dominance, decay, traits, pairs)])
+
+    @abstractmethod
+    def iter_coordinates(self, batch_size: int = 1000) -> Iterator[Tuple[str, float, float]]:
+        """Streams (person, friendliness, dominance) rows."""
+
+    @abstractmethod
+    def coordinate_summary(self) -> Dict:
+        """Returns total, unobserved, and min/max friendliness and dominance of observed persons."""
+
+    @abstractmethod
+    def iter_coordinate_arrays(self, chunk_size: int = DEFAULT_ARRAY_CHUNK,
+                               observed_only: bool = True) -> Iterator[np.ndarray]:
+        """Streams (friendliness, dominance) coordinates as float arrays of shape (n, 2)."""
+
+    @abstractmethod
+    def iter_decay_batches(self, batch_size: int = 1000) -> Iterator[List[Tuple[str, Optional[float], float, float, float]]]:
+        """Streams batches of (person, decay_updated_at, decay_weight, decay_f_sum, decay_d_sum) rows."""
+
+    @abstractmethod
+    def get_decay_half_life(self) -> Optional[float]:
+        """Returns the half-life the decayed sums are built with, or None before the first decayed write."""
+
+    @abstractmethod
+    def record_decay_half_life(self, half_life_days: float):
+        """Records the half-life of decayed writes; raises ValueError if another one is recorded."""
+
+    @abstractmethod
+    def get_trait_counts(self, name: str) -> Dict[str, int]:
+        """Returns how many times each trait has been observed for a person."""
+
+    @abstractmethod
+    def get_cooccurring(self, trait: str, top: Optional[int] = None) -> Tuple[int, List[Tuple[str, int]]]:
+        """Returns (descriptions naming ``trait``, [(other, descriptions naming both)]) by count, then name."""
+
+    @abstractmethod
+    def get_top_pairs(self, top: Optional[int] = None) -> List[Tuple[str, str, int]]:
+        """Returns the (trait, other, descriptions) pairs named together most often, each pair once."""
+
+    @abstractmethod
+    def apply_trait_deltas(self, deltas: Dict[str, Tuple[float, float]]) -> int:
+        """Shifts every person who observed a changed trait by its share of the change. Returns how many."""
+
+    @abstractmethod
+    def find_duplicate_groups(self) -> List[List[str]]:
+        """Returns sorted groups of stored names that likely belong to the same person."""
+
+    @abstractmethod
+    def merge_persons(self, keep: str, duplicates: Sequence[str],
+                      half_life_days: float = decay_model.DEFAULT_HALF_LIFE_DAYS) -> Dict:
+        """Merges duplicate profiles into ``keep`` and deletes them. Returns the merged person."""
+
+    @abstractmethod
+    def get_company_dao(self) -> 'BaseCompanyDAO':
+        """Returns the company DAO whose saved rankings follow this DAO's persons."""
+
+    @abstractmethod
+    def reset_database(self):
+        """Deletes all persons and everything derived from them."""
+
+    @staticmethod
+    def _validate_name(name: str) -> str:
+        if not isinstance(name, str):
+            raise TypeError("Person name must be a string")
+        if not name.strip():
+            raise ValueError("Person name cannot be empty")
+        name = name.strip()
+        if len(name) > MAX_PERSON_NAME_LENGTH:  # Reasonable limit
+            raise ValueError(f"Person name cannot exceed {MAX_PERSON_NAME_LENGTH} characters")
+        return name
+
+    @staticmethod
+    def _merge_profiles(profiles: Sequence[ProfileState], half_life_days: float
+                        ) -> Tuple[personality_models.Personality, int, int, personality_models.DecayState]:
+        """
+        Combines profiles into one, as if all their observations had been made by one person.
+
+        Scores are the means over all observations, i.e. the averages weighted by
+        observation counts; counts and decayed sums (brought to a common time) add up.
+        """
+        n_friendliness = sum(profile[2] for profile in profiles)
+        n_dominance = sum(profile[3] for profile in profiles)
+        personality = personality_models.Personality(
+            sum(profile[0] * profile[2] for profile in profiles) / n_friendliness if n_friendliness else 0.0,
+            sum(profile[1] * profile[3] for profile in profiles) / n_dominance if n_dominance else 0.0)
+        decay = decay_model.merge((profile[4] for profile in profiles), half_life_days)
+        return personality, n_friendliness, n_dominance, decay
+
+    @staticmethod
+    def _group_similar(blocks: Iterable[List[str]]) -> List[List[str]]:
+        """
+        Joins the similar names of each block into groups, across blocks.
+
+        Only names within a block are compared, so "Jon Doe", "John Doe" and
+        "John  Doe" form one group through any chain of similar pairs.
+        """
+        parent: Dict[str, str] = {}
+
+        def find(name: str) -> str:
+            parent.setdefault(name, name)
+            while parent[name] != name:
+                parent[name] = parent[parent[name]]
+                name = parent[name]
+            return name
+
+        for block in blocks:
+            if len(block) < 2:
+                continue
+            normalized = [name_keys.normalize_name(name) for name in block]
+            for i in range(len(block)):
+                for j in range(i + 1, len(block)):
+                    if name_keys.is_similar_normalized(normalized[i], normalized[j]):
+                        parent[find(block[i])] = find(block[j])
+
+        groups: Dict[str, List[str]] = {}
+        for name in parent:
+            groups.setdefault(find(name), []).append(name)
+        return sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+
+class BaseTraitDAO(BaseDAO):
+    """Interface for the trait lexicon."""
+
+    @abstractmethod
+    def get_all(self) -> Dict[str, personality_models.Personality]:
+        """Retrieves all traits as a dictionary keyed by trait name."""
+
+    @abstractmethod
+    def get_trait(self, name: str) -> Optional[personality_models.Personality]:
+        """Retrieves a single trait by name."""
+
+    @abstractmethod
+    def add_trait(self, name: str, personality: personality_models.Personality):
+        """Adds a new trait; raises ValueError if it exists."""
+
+    @abstractmethod
+    def update_trait(self, name: str,
+                     personality: personality_models.Personality) -> Optional[personality_models.Personality]:
+        """Updates an existing trait and returns its previous coordinates, or None if it does not exist."""
+
+    @abstractmethod
+    def add_traits(self, rows: Iterable[Tuple[str, float, float]]):
+        """Adds (trait, friendliness, dominance) rows at once, skipping existing traits."""
+
+    @abstractmethod
+    def import_traits(self, traits: Dict[str, personality_models.Personality],
+                      prune: bool = False, dry_run: bool = False) -> lexicon.LexiconDiff:
+        """Upserts a whole lexicon at once and returns what changed."""
+
+    @abstractmethod
+    def iter_traits(self, batch_size: int = 1000) -> Iterator[Tuple[str, float, float]]:
+        """Streams (trait, friendliness, dominance) rows ordered by name."""
+
+    @abstractmethod
+    def get_lexicon_version(self) -> Tuple[str, int]:
+        """Returns a (generation, version) pair that changes whenever any trait is written."""
+
+    @abstractmethod
+    def reset_database(self):
+        """Deletes all traits."""
+
+    def get_trait_index(self) -> fuzzy_index.TraitIndex:
+        """Returns the fuzzy trait index, rebuilt only when the lexicon version changes."""
+        self.create_tables()
+        return fuzzy_index.get_cached_index(
+            self.db_name, self.get_lexicon_version(),
+            lambda: (trait for trait, _, _ in self.iter_traits())
+        )
+
+    def get_all_traits(self) -> List[Dict]:
+        """Returns all traits as a list of dictionaries."""
+        return [{'trait': trait, 'friendliness': friendliness, 'dominance': dominance}
+                for trait, friendliness, dominance in self.iter_traits()]
+
+    @staticmethod
+    def _validate_trait(name: str, personality: personality_models.Personality) -> str:
+        """Checks a new trait and returns its normalized name."""
+        if not isinstance(name, str):
+            raise TypeError("Trait name must be a string")
+        if not name.strip():
+            raise ValueError("Trait name cannot be empty")
+        if not isinstance(personality, personality_models.Personality):
+            raise TypeError("Personality must be a Personality object")
+
+        name = name.strip().lower()  # Normalize trait names
+        if len(name) > MAX_TRAIT_NAME_LENGTH:  # Reasonable limit
+            raise ValueError(f"Trait name cannot exceed {MAX_TRAIT_NAME_LENGTH} characters")
+
+        # Validate personality scores
+        low, high = lexicon.SCORE_RANGE
+        if not (low <= personality.friendliness <= high) or not (low <= personality.dominance <= high):
+            raise ValueError("Personality scores must be between -10 and 10")
+        return name
+
+
+class BaseCompanyDAO(BaseDAO):
+    """Interface for saved company profiles with their rankings, and open roles."""
+
+    @abstractmethod
+    def get_all(self) -> List[Company]:
+        """Retrieves all saved profiles ordered by name."""
+
+    @abstractmethod
+    def get_profile(self, name: str) -> Optional[Company]:
+        """Retrieves a single saved profile by name."""
+
+    @abstractmethod
+    def save_profile(self, company: Company):
+        """Creates or replaces a profile; its ranking then follows every person write."""
+
+    @abstractmethod
+    def delete_profile(self, name: str) -> bool:
+        """Deletes a profile and its ranking. Returns False if it did not exist."""
+
+    @abstractmethod
+    def get_top(self, name: str, k: int) -> List[Tuple[str, float]]:
+        """Returns the k best (person, distance) pairs of a saved profile, ties broken by name."""
+
+    @abstractmethod
+    def count_ranked(self, name: str) -> int:
+        """Returns the number of persons in a saved profile's ranking."""
+
+    @abstractmethod
+    def save_roles(self, roles: Iterable[Company]) -> int:
+        """Creates or replaces roles at once. Returns the number written."""
+
+    @abstractmethod
+    def delete_role(self, name: str) -> bool:
+        """Deletes a role. Returns False if it did not exist."""
+
+    @abstractmethod
+    def get_roles(self) -> List[Company]:
+        """Retrieves all roles ordered by name."""
+
+    @abstractmethod
+    def iter_role_targets(self, batch_size: int = 1000) -> Iterator[Tuple[str, float, float]]:
+        """Streams (role, friendliness, dominance) rows."""
+
+    @abstractmethod
+    def get_roles_version(self) -> Tuple[str, int]:
+        """Returns a (generation, version) pair that changes whenever any role is written."""
+
+    def get_role_index(self) -> role_index.RoleIndex:
+        """Returns the spatial index of roles, rebuilt only when the roles version changes."""
+        self.create_tables()
+        return role_index.get_cached_index(self.db_name, self.get_roles_version(), self.iter_role_targets)
+
+    @staticmethod
+    def _check_target(company: Company, kind: str = 'Profile'):
+        if not isinstance(company, Company) or company.target is None:
+            raise TypeError(f"{kind} must be a Company with a target personality")
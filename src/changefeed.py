@@ -0,0 +1,313 @@
+"""
+Change feed module for the Personality Analysis System.
+
+This module replicates writes between instances of the same database, for example
+between regions, without copying whole files. Triggers on the captured tables record
+the key of every inserted, updated or deleted row in a ``change_log`` table (see
+``schema._change_capture``). ``export_changes`` writes the changes logged after a
+sequence number to a JSON Lines file and ``apply_changes`` replays such a file onto
+another instance, so syncing costs time proportional to the rows changed since the
+last sync rather than to the size of the database.
+
+Besides the main tables, the persons database captures the per-person trait counts,
+the trait co-occurrence counts and the recorded decay half-life, which cannot be
+derived from persons rows. Their keys span several columns and are written as JSON
+arrays. Name blocking keys are not shipped: replicated person inserts queue their
+names, which the target's PersonDAO indexes like any other.
+
+Changes are exported as row states, not as operations: every key changed since
+``since`` appears once, either with its current row or as a delete. Replaying a file
+therefore always converges to the source's state, and applying the same file twice,
+or overlapping files, is harmless. Each file records its source instance and the
+sequence number it runs through, which the target remembers in
+``replication_state`` so the next export can start from there. Records the target
+has already applied are skipped, so replaying an old file never rolls rows back,
+and a file that starts after the target's position is refused rather than leaving a
+gap.
+
+The first lines of a file look like::
+
+    {"format": "traits-changes", "version": 1, "database": "persons", "source": "9f2c...", "since": 0, "through": 42}
+    {"seq": 17, "table": "persons", "op": "upsert", "key": "Ann", "row": {"person": "Ann", "friendliness": 7.0, ...}}
+    {"seq": 42, "table": "persons", "op": "delete", "key": "Bob"}
+    {"seq": 43, "table": "person_traits", "op": "upsert", "key": ["Ann", "friendly"], "row": {...}}
+
+Classes:
+    ExportInfo: Describes a written change file.
+    ApplyInfo: Describes an applied change file.
+
+Functions:
+    export_changes: Writes the changes logged after a sequence number to a file.
+    apply_changes: Replays a change file onto a database.
+    replication_position: Returns the last sequence number applied from a source.
+    prune_changes: Deletes change log entries that every replica has applied.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+import db_connection
+import schema
+
+# Constants
+FORMAT = 'traits-changes'
+FORMAT_VERSION = 1
+FETCH_BATCH_SIZE = 1000
+# Captured tables and their key columns, per database; a tuple key is logged as a JSON array
+CAPTURED_TABLES: Dict[str, Dict[str, Union[str, Tuple[str, ...]]]] = {
+    'persons': {'persons': 'person', 'person_traits': ('person', 'trait'), 'trait_pairs': ('trait', 'other'),
+                'decay_meta': ('id',)},
+    'traits': {'traits': 'trait'},
+}
+MIGRATIONS = {
+    'persons': schema.PERSONS_MIGRATIONS,
+    'traits': schema.TRAITS_MIGRATIONS,
+}
+
+
+@dataclass
+class ExportInfo:
+    """Describes a written change file."""
+    path: str
+    source: str
+    since: int
+    through: int  # pass as ``since`` to the next export
+    upserts: int
+    deletes: int
+
+
+@dataclass
+class ApplyInfo:
+    """Describes an applied change file."""
+    source: str
+    through: int
+    upserts: int
+    deletes: int
+    skipped: int  # records already applied from this source
+
+
+def _key_columns(key: Union[str, Tuple[str, ...]]) -> Tuple[str, ...]:
+    return (key,) if isinstance(key, str) else key
+
+
+def _key_values(key: Union[str, Tuple[str, ...]], row_key) -> List:
+    """The key column values of a record's key, checked against the table's key columns."""
+    if isinstance(key, str):
+        if not isinstance(row_key, str):
+            raise ValueError("key must be a string")
+        return [row_key]
+    if not isinstance(row_key, list) or len(row_key) != len(key):
+        raise ValueError(f"key must be a list of {len(key)} values")
+    return row_key
+
+
+def _check_database(database: str):
+    if database not in CAPTURED_TABLES:
+        raise ValueError(f"Unknown database '{database}'. Use one of: {', '.join(CAPTURED_TABLES)}")
+
+
+@contextmanager
+def _open_text(path: str, mode: str):
+    """Opens a file for text I/O, with '-' for stdin or stdout."""
+    if path == '-':
+        yield sys.stdout if 'w' in mode else sys.stdin
+        return
+    with open(path, mode, encoding='utf-8', newline='\n') as handle:
+        yield handle
+
+
+def export_changes(db_name: str, database: str, path: str, since: int = 0) -> ExportInfo:
+    """
+    Writes every row changed after sequence number ``since`` to a change file.
+
+    The export reads one consistent snapshot of the database, so concurrent writers
+    neither block it nor leave it half-applied; their changes go into the next export.
+
+    Args:
+        db_name: The database to export from.
+        database: Which database it is, 'persons' or 'traits'.
+        path: The file to write, or '-' for stdout.
+        since: Only changes logged after this sequence number are exported.
+    """
+    _check_database(database)
+    if since < 0:
+        raise ValueError("since cannot be negative")
+    schema.ensure_schema(db_name, MIGRATIONS[database])
+    upserts = deletes = 0
+    with db_connection.DatabaseConnection(db_name) as (conn, cursor):
+        cursor.execute('BEGIN')  # one read snapshot for the whole export
+        try:
+            source = cursor.execute('SELECT source FROM change_log_meta WHERE id = 1').fetchone()[0]
+            through = cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+            through = max(through, since)
+            with _open_text(path, 'w') as handle:
+                header = {'format': FORMAT, 'version': FORMAT_VERSION, 'database': database,
+                          'source': source, 'since': since, 'through': through}
+                handle.write(json.dumps(header) + '\n')
+                for table, key in CAPTURED_TABLES[database].items():
+                    key_columns = _key_columns(key)
+                    if isinstance(key, str):
+                        join = f't.{key} = c.row_key'
+                    else:
+                        join = ' AND '.join(f"t.{column} = json_extract(c.row_key, '$[{i}]')"
+                                            for i, column in enumerate(key_columns))
+                    # The latest change of each key, joined with the row as it is now
+                    cursor.execute(f'''
+                        SELECT c.seq, c.row_key, t.*
+                        FROM (SELECT MAX(seq) AS seq, row_key FROM change_log
+                              WHERE table_name = ? AND seq > ? AND seq <= ?
+                              GROUP BY row_key) AS c
+                        LEFT JOIN {table} AS t ON {join}
+                        ORDER BY c.seq
+                    ''', (table, since, through))
+                    columns = [description[0] for description in cursor.description][2:]
+                    while True:
+                        rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                        if not rows:
+                            break
+                        for seq, row_key, *values in rows:
+                            row = dict(zip(columns, values))
+                            if not isinstance(key, str):
+                                row_key = json.loads(row_key)
+                            if row[key_columns[0]] is None:
+                                record = {'seq': seq, 'table': table, 'op': 'delete', 'key': row_key}
+                                deletes += 1
+                            else:
+                                record = {'seq': seq, 'table': table, 'op': 'upsert', 'key': row_key, 'row': row}
+                                upserts += 1
+                            handle.write(json.dumps(record) + '\n')
+        finally:
+            conn.rollback()
+    return ExportInfo(path, source, since, through, upserts, deletes)
+
+
+def _read_header(line: str, database: str) -> Dict:
+    try:
+        header = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Not a change file: {e}")
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise ValueError("Not a change file: missing header")
+    if header.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported change file version {header.get('version')}")
+    if header.get('database') != database:
+        raise ValueError(f"Change file is for the '{header.get('database')}' database, not '{database}'")
+    return header
+
+
+def apply_changes(db_name: str, database: str, path: str) -> ApplyInfo:
+    """
+    Replays a change file onto a database in one transaction.
+
+    Upserts write the exported row, keeping only columns the target table has, and
+    deletes remove the key if present, so applying a file any number of times gives
+    the same result. The file's source and end sequence number are recorded in
+    ``replication_state``, and records at or below the recorded position are
+    skipped. Local triggers run as for any other write, so saved rankings, name
+    blocking keys and the lexicon version stay current, and the applied rows are
+    logged for replicas further down the chain.
+
+    Args:
+        db_name: The database to apply to.
+        database: Which database it is, 'persons' or 'traits'.
+        path: The change file, or '-' for stdin.
+
+    Raises:
+        ValueError: If the file is not a change file for this database, a record is
+            invalid, or the file starts after the changes applied so far from its source.
+    """
+    _check_database(database)
+    schema.ensure_schema(db_name, MIGRATIONS[database])
+    tables = CAPTURED_TABLES[database]
+
+    def apply(conn, cursor):
+        table_columns = {table: [row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()]
+                         for table in tables}
+        counts = {'upsert': 0, 'delete': 0, 'skipped': 0}
+        with _open_text(path, 'r') as handle:
+            header = _read_header(handle.readline(), database)
+            row = cursor.execute('SELECT seq FROM replication_state WHERE source = ?',
+                                 (header['source'],)).fetchone()
+            position = row[0] if row else 0
+            if header['since'] > position:
+                raise ValueError(f"Changes {position + 1}-{header['since']} from source {header['source']} "
+                                 f"have not been applied yet; export with --since {position}")
+            for line_number, line in enumerate(handle, start=2):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    table, op, row_key = record['table'], record['op'], record['key']
+                    if table not in tables or op not in ('upsert', 'delete'):
+                        raise ValueError(f"unknown table '{table}' or operation '{op}'")
+                    if record['seq'] <= position:
+                        counts['skipped'] += 1
+                        continue
+                    key_columns = _key_columns(tables[table])
+                    key_values = _key_values(tables[table], row_key)
+                    if op == 'delete':
+                        cursor.execute(f'DELETE FROM {table} WHERE '
+                                       + ' AND '.join(f'{column} = ?' for column in key_columns), key_values)
+                    else:
+                        row = {column: value for column, value in record['row'].items()
+                               if column in table_columns[table]}
+                        if [row.get(column) for column in key_columns] != key_values:
+                            raise ValueError("row does not match its key")
+                        columns = list(row)
+                        updates = ', '.join(f'{column} = excluded.{column}' for column in columns
+                                            if column not in key_columns)
+                        cursor.execute(
+                            f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) '
+                            f'ON CONFLICT({", ".join(key_columns)}) DO '
+                            + (f'UPDATE SET {updates}' if updates else 'NOTHING'),
+                            [row[column] for column in columns])
+                except (json.JSONDecodeError, KeyError, TypeError, AttributeError, ValueError) as e:
+                    raise ValueError(f"Line {line_number}: invalid change record ({e})")
+                counts[op] += 1
+        cursor.execute('''
+            INSERT INTO replication_state (source, seq, applied_at) VALUES (?, ?, ?)
+            ON CONFLICT(source) DO UPDATE SET seq = MAX(seq, excluded.seq), applied_at = excluded.applied_at
+        ''', (header['source'], header['through'], time.time()))
+        return ApplyInfo(header['source'], header['through'], counts['upsert'], counts['delete'],
+                         counts['skipped'])
+
+    if path != '-':
+        return db_connection.run_write(db_name, apply)
+    # A retried transaction reads its input again, which stdin cannot do
+    with tempfile.TemporaryDirectory(prefix='changes-') as directory:
+        path = os.path.join(directory, 'changes.jsonl')
+        with open(path, 'w', encoding='utf-8', newline='\n') as spool:
+            shutil.copyfileobj(sys.stdin, spool)
+        return db_connection.run_write(db_name, apply)
+
+
+def replication_position(db_name: str, database: str, source: str) -> Optional[int]:
+    """Returns the last sequence number applied from ``source``, or None if nothing was."""
+    _check_database(database)
+    schema.ensure_schema(db_name, MIGRATIONS[database])
+    with db_connection.DatabaseConnection(db_name) as (_, cursor):
+        row = cursor.execute('SELECT seq FROM replication_state WHERE source = ?', (source,)).fetchone()
+        return row[0] if row else None
+
+
+def prune_changes(db_name: str, database: str, through: int) -> int:
+    """
+    Deletes change log entries up to and including ``through``. Returns the number deleted.
+
+    Only prune what every replica has applied; a replica that is further behind has
+    to be re-initialized from a snapshot.
+    """
+    _check_database(database)
+    schema.ensure_schema(db_name, MIGRATIONS[database])
+
+    def prune(conn, cursor):
+        cursor.execute('DELETE FROM change_log WHERE seq <= ?', (through,))
+        return cursor.rowcount
+
+    return db_connection.run_write(db_name, prune)
@@ -2,28 +2,37 @@
 Company entity module for the Personality Analysis System.
 
 This module defines the Company class which represents a company entity in the system.
-The Company class serves as a simple data container for company names, with business
-logic and database operations handled by the CompanyService.
+The Company class serves as a simple data container for a company (or role) name and,
+for saved profiles, the description and resolved target personality, with business
+logic and database operations handled by the CompanyService and CompanyDAO.
 
 Classes:
     Company: Represents a company with basic name validation and representation.
 """
 
-# Removed imports: Personality, PersonDAO, TraitDAO, distance, Dict, List, Tuple
+from typing import Optional
+from personality_models import Personality
 
 class Company:
     """Represents a company entity, primarily holding its name.
     Analysis and matching operations are managed by CompanyService.
     """
-    def __init__(self, name: str):
+    def __init__(self, name: str, description: Optional[str] = None,
+                 target: Optional[Personality] = None):
         """Initializes a Company object.
 
         Args:
             name: The name of the company.
+            description: The job description the profile was built from, if saved.
+            target: The target personality resolved from the description, if saved.
         """
         if not isinstance(name, str) or not name:
             raise ValueError("Company name must be a non-empty string.")
+        if target is not None and not isinstance(target, Personality):
+            raise TypeError("Target must be a Personality object.")
         self.name = name
+        self.description = description
+        self.target = target
 
     def __repr__(self):
         return f"Company(name='{self.name}')"
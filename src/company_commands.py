@@ -7,12 +7,29 @@ job descriptions using personality trait matching.
 
 Functions:
     query_company_trait_match: Handles the 'company query' command to find personality matches.
+    save_company_profile: Handles the 'company save' command to store a profile and its ranking.
+    show_company_top: Handles the 'company top' command to read a saved profile's best matches.
+    list_company_profiles: Handles the 'company profiles' command to list saved profiles.
+    delete_company_profile: Handles the 'company delete' command to remove a saved profile.
+    add_role: Handles the 'company add-role' command to store an open role.
+    import_roles: Handles the 'company import-roles' command to store open roles from a file.
+    list_roles: Handles the 'company roles' command to list open roles.
+    delete_role: Handles the 'company delete-role' command to remove an open role.
 """
 
-from typing import Any
+from typing import Any, List
+import lexicon
+from person_commands import read_description_rows
 from person_dao import PersonDAO
 from trait_dao import TraitDAO
+from company_dao import CompanyDAO
 from services.company_service import CompanyService
+from tenancy import TenantRouter
+
+def _format_rank(rank: List[float]) -> str:
+    """Formats an optional percentile rank as a suffix, e.g. ', top 3%'."""
+    return f", top {rank[0]:.3g}%" if rank else ""
+
 
 def query_company_trait_match(args: Any) -> None:
     """Handles the 'company query' command using the CompanyService."""
@@ -27,6 +44,10 @@ def query_company_trait_match(args: Any) -> None:
         print("Error: Company name must be a non-empty string.")
         return
 
+    if getattr(args, 'all_tenants', False):
+        _query_all_tenants(args)
+        return
+
     # Instantiate DAOs and Service
     person_dao = PersonDAO()
     trait_dao = TraitDAO()
@@ -34,7 +55,11 @@ def query_company_trait_match(args: Any) -> None:
 
     try:
         # Delegate matching logic to the service
-        ranked_persons = company_service.find_matches_for_description(company_description)
+        ranked_persons = company_service.find_matches_for_description(
+            company_description, top=getattr(args, 'top', None),
+            decay_half_life_days=getattr(args, 'decay_half_life', None),
+            percentiles=getattr(args, 'percentile', False),
+            decay_prior_weight=getattr(args, 'decay_prior_weight', 0.0))
 
         if not ranked_persons:
             print(f"No matching persons found for company '{args.company_name}' "
@@ -43,13 +68,175 @@ def query_company_trait_match(args: Any) -> None:
 
         print(f"\nPersons ranked by personality match for '{args.company_name}':")
         # Output results from the service
-        for person_name, distance in ranked_persons:
-            print(f"- {person_name}, Distance: {distance:.2f}")
+        for person_name, distance, *rank in ranked_persons:
+            print(f"- {person_name}, Distance: {distance:.2f}{_format_rank(rank)}")
 
+    except ValueError as e:
+        print(f"Error: {e}")
     except TypeError as e:
         # Catch type errors potentially raised by service/DAO layers
         print(f"Error during matching process: {e}")
     except Exception as e:
         # Catch unexpected errors
         print(f"An unexpected error occurred: {e}")
-        # Consider logging the full traceback here for debugging
\ No newline at end of file
+        # Consider logging the full traceback here for debugging
+
+
+def _query_all_tenants(args: Any) -> None:
+    """Ranks candidates across every tenant's persons database."""
+    router = TenantRouter()
+    try:
+        matches = router.find_matches(args.company_description, top=getattr(args, 'top', None),
+                                      decay_half_life_days=getattr(args, 'decay_half_life', None),
+                                      percentiles=getattr(args, 'percentile', False),
+                                      decay_prior_weight=getattr(args, 'decay_prior_weight', 0.0))
+        if not matches:
+            print(f"No matching persons found in any tenant for company '{args.company_name}' "
+                  f"based on description: '{args.company_description}'")
+            return
+        print(f"\nPersons across all tenants ranked by personality match for '{args.company_name}':")
+        for tenant, person_name, distance, *rank in matches:
+            print(f"- [{tenant}] {person_name}, Distance: {distance:.2f}{_format_rank(rank)}")
+    except ValueError as e:
+        print(f"Error: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+
+def save_company_profile(args: Any) -> None:
+    """Handles the 'company save' command."""
+    if not isinstance(args.company_name, str) or not args.company_name.strip():
+        print("Error: Company name must be a non-empty string.")
+        return
+    if not isinstance(args.company_description, str) or not args.company_description.strip():
+        print("Error: Company description must be a non-empty string.")
+        return
+
+    person_dao = PersonDAO()
+    person_dao.create_tables()
+    company_service = CompanyService(person_dao, TraitDAO())
+    try:
+        company = company_service.save_profile(args.company_name, args.company_description)
+        print(f"Profile '{company.name}' saved with target personality "
+              f"(F:{company.target.friendliness:.2f}, D:{company.target.dominance:.2f}).")
+    except ValueError as e:
+        print(f"Error: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred while saving profile: {e}")
+
+
+def show_company_top(args: Any) -> None:
+    """Handles the 'company top' command."""
+    company_service = CompanyService(PersonDAO(), TraitDAO())
+    try:
+        ranked_persons = company_service.get_profile_matches(args.company_name, args.top,
+                                                             percentiles=getattr(args, 'percentile', False))
+        if not ranked_persons:
+            print(f"No persons ranked yet for profile '{args.company_name}'.")
+            return
+        print(f"\nTop {len(ranked_persons)} persons for saved profile '{args.company_name}':")
+        for person_name, distance, *rank in ranked_persons:
+            print(f"- {person_name}, Distance: {distance:.2f}{_format_rank(rank)}")
+    except ValueError as e:
+        print(f"Error: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+
+def list_company_profiles(args: Any) -> None:
+    """Handles the 'company profiles' command."""
+    company_dao = CompanyDAO()
+    try:
+        company_dao.create_tables()
+        profiles = company_dao.get_all()
+        if profiles:
+            print("Saved profiles:")
+            for company in profiles:
+                print(f"- {company.name} (F:{company.target.friendliness:.2f}, "
+                      f"D:{company.target.dominance:.2f}): {company.description}")
+        else:
+            print("No saved profiles found.")
+    except Exception as e:
+        print(f"Error listing profiles: {e}")
+
+
+def delete_company_profile(args: Any) -> None:
+    """Handles the 'company delete' command."""
+    company_dao = CompanyDAO()
+    try:
+        company_dao.create_tables()
+        if company_dao.delete_profile(args.company_name):
+            print(f"Profile '{args.company_name}' deleted.")
+        else:
+            print(f"Error: No saved profile named '{args.company_name}'.")
+    except Exception as e:
+        print(f"Error deleting profile: {e}")
+
+
+def add_role(args: Any) -> None:
+    """Handles the 'company add-role' command."""
+    if not isinstance(args.role_name, str) or not args.role_name.strip():
+        print("Error: Role name must be a non-empty string.")
+        return
+    company_service = CompanyService(PersonDAO(), TraitDAO())
+    try:
+        saved, _ = company_service.save_roles([(args.role_name, args.role_description)])
+        if not saved:
+            print("Error: No valid traits found in description to form a target personality.")
+            return
+        print(f"Role '{args.role_name.strip()}' saved.")
+    except (TypeError, ValueError) as e:
+        print(f"Error: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred while saving role: {e}")
+
+
+def import_roles(args: Any) -> None:
+    """Handles the 'company import-roles' command."""
+    try:
+        rows = read_description_rows(args.path, lexicon.detect_format(args.path, args.format))
+    except (OSError, ValueError) as e:
+        print(f"Error reading roles from '{args.path}': {e}")
+        return
+    company_service = CompanyService(PersonDAO(), TraitDAO())
+    try:
+        saved, skipped = company_service.save_roles(rows)
+    except (TypeError, ValueError) as e:
+        print(f"Error: {e}")
+        return
+    except Exception as e:
+        print(f"An unexpected error occurred while importing roles: {e}")
+        return
+    print(f"Imported {saved} roles, skipped {len(skipped)} without known traits.")
+    for name in skipped:
+        print(f"- {name}")
+
+
+def list_roles(args: Any) -> None:
+    """Handles the 'company roles' command."""
+    company_dao = CompanyDAO()
+    try:
+        company_dao.create_tables()
+        roles = company_dao.get_roles()
+        if roles:
+            print("Open roles:")
+            for role in roles:
+                print(f"- {role.name} (F:{role.target.friendliness:.2f}, "
+                      f"D:{role.target.dominance:.2f}): {role.description}")
+        else:
+            print("No open roles found.")
+    except Exception as e:
+        print(f"Error listing roles: {e}")
+
+
+def delete_role(args: Any) -> None:
+    """Handles the 'company delete-role' command."""
+    company_dao = CompanyDAO()
+    try:
+        company_dao.create_tables()
+        if company_dao.delete_role(args.role_name):
+            print(f"Role '{args.role_name}' deleted.")
+        else:
+            print(f"Error: No open role named '{args.role_name}'.")
+    except Exception as e:
+        print(f"Error deleting role: {e}")
@@ -0,0 +1,167 @@
+"""
+Company Data Access Object (DAO) module for the Personality Analysis System.
+
+This module persists saved company profiles together with a materialized ranking of
+all persons by distance to each profile's target personality. Profiles live in the
+persons database so that triggers on the ``persons`` table can keep every ranking
+current: adding or updating a person rewrites only that person's row in each
+ranking, and reading a profile's top-k walks k entries of an ordered index.
+
+It also stores open roles: names with a description and its resolved target
+personality, but no ranking, so that many thousands of roles cost nothing on person
+writes. Roles are searched from a person's side through a cached spatial index.
+
+Classes:
+    CompanyDAO: SQLite implementation of BaseCompanyDAO.
+"""
+
+import math
+from typing import Iterable, Iterator, List, Optional, Tuple
+import personality_models
+import db_connection
+import schema
+from base_dao import BaseCompanyDAO
+from company import Company
+
+
+class CompanyDAO(BaseCompanyDAO):
+    """Data Access Object for saved company profiles, their rankings and open roles."""
+    def __init__(self, db_name: Optional[str] = None, tenant: Optional[str] = None):
+        # Must be the persons database: rankings are maintained by triggers on persons
+        super().__init__(db_name or db_connection.resolve_db_path('persons.db', tenant))
+
+    def create_tables(self):
+        """Ensures the persons schema, which includes the profile tables, is current."""
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+
+    def _connect(self) -> db_connection.DatabaseConnection:
+        """Opens a read connection, migrating the schema first if it is out of date."""
+        self.create_tables()
+        return db_connection.DatabaseConnection(self.db_name)
+
+    def _write(self, op):
+        """Runs ``op`` through db_connection.run_write once the schema is current."""
+        self.create_tables()
+        return db_connection.run_write(self.db_name, op)
+
+    def get_all(self) -> List[Company]:
+        """Retrieves all saved profiles ordered by name."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT company, description, friendliness, dominance '
+                           'FROM company_profiles ORDER BY company')
+            return [self._to_company(row) for row in cursor.fetchall()]
+
+    def get_profile(self, name: str) -> Optional[Company]:
+        """Retrieves a single saved profile by name."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT company, description, friendliness, dominance '
+                           'FROM company_profiles WHERE company=?', (name,))
+            row = cursor.fetchone()
+            return self._to_company(row) if row else None
+
+    def save_profile(self, company: Company):
+        """Creates or replaces a profile and materializes its full ranking in one transaction."""
+        self._check_target(company)
+        target = company.target
+
+        def save(conn, cursor):
+            cursor.execute('''
+                INSERT INTO company_profiles (company, description, friendliness, dominance)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(company) DO UPDATE SET
+                    description=excluded.description,
+                    friendliness=excluded.friendliness,
+                    dominance=excluded.dominance
+            ''', (company.name, company.description, target.friendliness, target.dominance))
+            cursor.execute('DELETE FROM company_rankings WHERE company=?', (company.name,))
+            cursor.execute('''
+                INSERT INTO company_rankings (company, person, distance_sq)
+                SELECT ?, person,
+                       (friendliness - ?) * (friendliness - ?) + (dominance - ?) * (dominance - ?)
+                FROM persons
+            ''', (company.name, target.friendliness, target.friendliness,
+                  target.dominance, target.dominance))
+
+        self._write(save)
+
+    def delete_profile(self, name: str) -> bool:
+        """Deletes a profile and its ranking. Returns False if it did not exist."""
+        def delete(conn, cursor):
+            cursor.execute('DELETE FROM company_rankings WHERE company=?', (name,))
+            cursor.execute('DELETE FROM company_profiles WHERE company=?', (name,))
+            return cursor.rowcount > 0
+
+        return self._write(delete)
+
+    def get_top(self, name: str, k: int) -> List[Tuple[str, float]]:
+        """Returns the k best (person, distance) pairs of a saved profile's ranking."""
+        with self._connect() as (_, cursor):
+            cursor.execute('''
+                SELECT person, distance_sq FROM company_rankings
+                WHERE company=?
+                ORDER BY distance_sq, person
+                LIMIT ?
+            ''', (name, k))
+            return [(person, math.sqrt(distance_sq)) for person, distance_sq in cursor.fetchall()]
+
+    def count_ranked(self, name: str) -> int:
+        """Returns the number of persons in a saved profile's ranking."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT COUNT(*) FROM company_rankings WHERE company=?', (name,))
+            return cursor.fetchone()[0]
+
+    def save_roles(self, roles: Iterable[Company]) -> int:
+        """Creates or replaces roles in one transaction. Returns the number written."""
+        rows = []
+        for role in roles:
+            self._check_target(role, 'Role')
+            rows.append((role.name, role.description, role.target.friendliness, role.target.dominance))
+
+        def save(conn, cursor):
+            cursor.executemany('''
+                INSERT INTO roles (role, description, friendliness, dominance)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(role) DO UPDATE SET
+                    description=excluded.description,
+                    friendliness=excluded.friendliness,
+                    dominance=excluded.dominance
+            ''', rows)
+
+        self._write(save)
+        return len(rows)
+
+    def delete_role(self, name: str) -> bool:
+        """Deletes a role. Returns False if it did not exist."""
+        def delete(conn, cursor):
+            cursor.execute('DELETE FROM roles WHERE role=?', (name,))
+            return cursor.rowcount > 0
+
+        return self._write(delete)
+
+    def get_roles(self) -> List[Company]:
+        """Retrieves all roles ordered by name."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT role, description, friendliness, dominance FROM roles ORDER BY role')
+            return [self._to_company(row) for row in cursor.fetchall()]
+
+    def iter_role_targets(self, batch_size: int = 1000) -> Iterator[Tuple[str, float, float]]:
+        """Streams (role, friendliness, dominance) rows."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT role, friendliness, dominance FROM roles')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def get_roles_version(self) -> Tuple[str, int]:
+        """Returns a (generation, version) pair that changes whenever any role is written."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT generation, version FROM roles_meta WHERE id = 1')
+            row = cursor.fetchone()
+            return (row[0], row[1]) if row else ('', 0)
+
+    @staticmethod
+    def _to_company(row) -> Company:
+        name, description, friendliness, dominance = row
+        return Company(name, description, personality_models.Personality(friendliness, dominance))
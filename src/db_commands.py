@@ -0,0 +1,94 @@
+"""
+Database maintenance command-line interface module for the Personality Analysis System.
+
+This module contains functions that handle CLI commands for database maintenance:
+online snapshots and restores built on SQLite's incremental backup API, and the
+change feed that replicates writes incrementally between instances.
+
+Functions:
+    snapshot_database: Handles the 'db snapshot' command to back up a live database.
+    restore_database: Handles the 'db restore' command to restore a database from a snapshot.
+    export_changes: Handles the 'db export-changes' command to write changes since a sequence number.
+    apply_changes: Handles the 'db apply-changes' command to replay a change file.
+    prune_changes: Handles the 'db prune-changes' command to trim the change log.
+"""
+
+import sys
+from typing import Any
+from person_dao import PersonDAO
+from trait_dao import TraitDAO
+import backup
+import changefeed
+
+DATABASES = ('persons', 'traits')
+
+
+def _db_name(which: str) -> str:
+    """Maps a logical database name to its file."""
+    return PersonDAO().db_name if which == 'persons' else TraitDAO().db_name
+
+
+def snapshot_database(args: Any) -> None:
+    """Handles the 'db snapshot' command."""
+    db_name = _db_name(args.database)
+    try:
+        info = backup.snapshot(db_name, args.output, compress=True if args.compress else None,
+                               checksum=not args.no_checksum, pages=args.pages)
+    except Exception as e:
+        print(f"Error creating snapshot of '{db_name}': {str(e)}")
+        return
+    print(f"Snapshot of '{db_name}' written to '{info.path}' ({info.size_bytes} bytes"
+          f"{', gzip' if info.compressed else ''}).")
+    if info.sha256:
+        print(f"SHA-256: {info.sha256}")
+
+
+def restore_database(args: Any) -> None:
+    """Handles the 'db restore' command."""
+    db_name = _db_name(args.database)
+    try:
+        backup.restore(args.snapshot, db_name, require_checksum=args.require_checksum, pages=args.pages)
+    except Exception as e:
+        print(f"Error restoring '{db_name}' from '{args.snapshot}': {str(e)}")
+        return
+    print(f"Restored '{db_name}' from '{args.snapshot}'.")
+
+
+def export_changes(args: Any) -> None:
+    """Handles the 'db export-changes' command."""
+    db_name = _db_name(args.database)
+    try:
+        info = changefeed.export_changes(db_name, args.database, args.output, since=args.since)
+    except Exception as e:
+        print(f"Error exporting changes of '{db_name}': {str(e)}", file=sys.stderr)
+        return
+    # Keep stdout clean when the changes themselves go there
+    report = sys.stderr if args.output == '-' else sys.stdout
+    print(f"Exported {info.upserts} upserts and {info.deletes} deletes of '{db_name}' "
+          f"(changes {info.since + 1}-{info.through}) to '{info.path}'.", file=report)
+    print(f"Next export: --since {info.through}", file=report)
+
+
+def apply_changes(args: Any) -> None:
+    """Handles the 'db apply-changes' command."""
+    db_name = _db_name(args.database)
+    try:
+        info = changefeed.apply_changes(db_name, args.database, args.input)
+    except Exception as e:
+        print(f"Error applying changes to '{db_name}': {str(e)}")
+        return
+    print(f"Applied {info.upserts} upserts and {info.deletes} deletes to '{db_name}' "
+          f"(source {info.source}, through change {info.through}).")
+    if info.skipped:
+        print(f"Skipped {info.skipped} changes that were already applied.")
+
+
+def prune_changes(args: Any) -> None:
+    """Handles the 'db prune-changes' command."""
+    db_name = _db_name(args.database)
+    try:
+        deleted = changefeed.prune_changes(db_name, args.database, args.through)
+    except Exception as e:
+        print(f"Error pruning changes of '{db_name}': {str(e)}")
+        return
+    print(f"Deleted {deleted} change log entries of '{db_name}'.")
@@ -2,28 +2,529 @@
 Database connection management module for the Personality Analysis System.
 
 This module provides a context manager for handling SQLite database connections
-with proper resource cleanup and timeout configuration.
+with proper resource cleanup and timeout configuration, plus the write path used
+by the DAOs when several writers share a database file.
+
+Concurrency modes (``configure`` or the ``TRAITS_DB_CONCURRENCY`` environment variable):
+- default: SQLite's rollback journal; writes are retried on lock errors.
+- wal: Write-ahead logging, so readers never block on writers; writes are retried.
+- writer: WAL plus a dedicated writer thread per database file that serializes all
+  writes from this process through a queue.
+
+Storage profiles (``configure(profile=...)``, ``TRAITS_DB_PROFILE`` or ``--profile``) tune
+every connection with the same pragmas; see ``PROFILES``:
+- default: SQLite's defaults.
+- bulk-ingest: large page cache, WAL and no fsync on commit, for rebuildable bulk loads.
+- read-mostly: large page cache and a memory-mapped window, so scans such as
+  ``PersonDAO.get_all`` read mapped pages instead of issuing a read syscall per page.
+- durable: WAL with an fsync on every commit and no memory mapping.
+
+Database location (``configure(db_dir=...)``, ``TRAITS_DB_DIR`` or ``--db-dir``): files are
+created in the current directory by default, or in ``db_dir``. Two special values give
+isolated runs: ``MEMORY`` (':memory:') keeps every database in shared-cache in-memory
+SQLite databases that live until ``close_memory_databases`` or the end of the process,
+and ``TEMP`` (':temp:') uses a fresh temporary directory that is deleted at exit.
+
+Tenancy (``configure(tenant=...)`` or ``TRAITS_TENANT``) partitions per-tenant files
+such as the persons database into ``<tenant_dir>/<tenant>/``; shared files such as the
+trait lexicon are never partitioned. See ``resolve_db_path`` and ``tenancy``.
+
+Query tracing (``configure(slow_query_ms=...)`` or ``TRAITS_SLOW_QUERY_MS``) makes every
+connection time its statements; see ``query_log`` for the slow-query log and aggregates.
 
 Classes:
+    StorageProfile: Pragmas applied to every new connection.
     DatabaseConnection: Context manager that provides database connections and cursors.
+    WriterThread: Dedicated thread that executes queued write operations on one connection.
+
+Functions:
+    configure: Sets process-wide connection options.
+    get_profile: Returns the configured storage profile.
+    resolve_db_path: Maps a database file name to its path for the configured location and tenant.
+    list_tenants: Lists the tenants that have a given database.
+    close_memory_databases: Discards all in-memory databases.
+    enable_connection_reuse: Makes the calling pool thread keep one connection per database.
+    with_retry: Runs an operation, retrying with bounded backoff on lock errors.
+    run_write: Executes a write operation according to the configured concurrency mode.
 """
 
+import atexit
+import os
+import queue
+import random
+import re
+import shutil
 import sqlite3
-from typing import Tuple
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import quote
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+import query_log
 
 # Constants
 DB_TIMEOUT = 5
+CONCURRENCY_MODES = ('default', 'wal', 'writer')
+RETRY_ATTEMPTS = 8
+RETRY_BASE_DELAY = 0.02  # seconds
+RETRY_MAX_DELAY = 1.0  # seconds
+DEFAULT_TENANT_DIR = 'tenants'
+MEMORY = ':memory:'
+TEMP = ':temp:'
+MIB = 1024 * 1024
+_TENANT_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+T = TypeVar('T')
+WriteOperation = Callable[[sqlite3.Connection, sqlite3.Cursor], T]
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """Pragmas applied to every new connection. None leaves SQLite's default."""
+    cache_size: Optional[int] = None  # pages, or KiB when negative
+    mmap_size: Optional[int] = None  # bytes
+    synchronous: Optional[str] = None
+    temp_store: Optional[str] = None
+    journal_mode: Optional[str] = None
+
+
+PROFILES: Dict[str, StorageProfile] = {
+    'default': StorageProfile(),
+    # A crash of the OS can lose recent commits; meant for loads that can be re-run
+    'bulk-ingest': StorageProfile(cache_size=-256 * 1024, mmap_size=256 * MIB, synchronous='OFF',
+                                  temp_store='MEMORY', journal_mode='WAL'),
+    'read-mostly': StorageProfile(cache_size=-64 * 1024, mmap_size=1024 * MIB, synchronous='NORMAL',
+                                  temp_store='MEMORY', journal_mode='WAL'),
+    'durable': StorageProfile(cache_size=-16 * 1024, mmap_size=0, synchronous='FULL',
+                              temp_store='DEFAULT', journal_mode='WAL'),
+}
+
+_settings: Dict[str, Any] = {
+    'concurrency': os.environ.get('TRAITS_DB_CONCURRENCY', 'default'),
+    # None disables tracing; 0 logs every statement
+    'slow_query_ms': (float(os.environ['TRAITS_SLOW_QUERY_MS'])
+                      if os.environ.get('TRAITS_SLOW_QUERY_MS') else None),
+    'tenant': os.environ.get('TRAITS_TENANT') or None,
+    'tenant_dir': os.environ.get('TRAITS_TENANT_DIR', DEFAULT_TENANT_DIR),
+    'db_dir': os.environ.get('TRAITS_DB_DIR') or None,
+    'profile': os.environ.get('TRAITS_DB_PROFILE') or 'default',
+}
+# In MEMORY mode: one open connection per database keeps it alive, keyed by relative path
+_memory: Dict[str, Tuple[str, sqlite3.Connection]] = {}
+_memory_session = {'token': uuid.uuid4().hex[:12]}
+_temp_dir: Dict[str, Optional[str]] = {'path': None}
+_location_lock = threading.Lock()
+_writers: Dict[str, 'WriterThread'] = {}
+# Connections reused by pool threads, keyed by thread id and then database file
+_reused: Dict[int, Dict[str, sqlite3.Connection]] = {}
+_reused_lock = threading.Lock()
+_writers_lock = threading.Lock()
+
+
+def configure(concurrency: str = None, slow_query_ms: Optional[float] = None,
+              disable_tracing: bool = False, tenant: Optional[str] = None,
+              tenant_dir: Optional[str] = None, db_dir: Optional[str] = None,
+              profile: Optional[str] = None):
+    """Sets process-wide connection options. Arguments left as None are unchanged.
+
+    ``db_dir`` sets where databases live: a directory, ``MEMORY``, ``TEMP``, or an empty
+    string for the current directory. Changing it discards any in-memory databases and
+    temporary directory of the previous setting. DAOs resolve their paths when they are
+    created, so configure before creating them.
+
+    ``slow_query_ms`` enables statement tracing for connections opened afterwards and
+    logs statements slower than it; ``disable_tracing`` turns tracing off again.
+    ``tenant`` selects the tenant whose files DAOs open by default; an empty string
+    selects the untenanted files again. ``profile`` names the storage profile applied
+    to connections opened afterwards.
+    """
+    if profile is not None:
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown storage profile '{profile}'. "
+                             f"Use one of: {', '.join(PROFILES)}")
+        _settings['profile'] = profile
+    if db_dir is not None and (db_dir or None) != _settings['db_dir']:
+        close_memory_databases()
+        _remove_temp_dir()
+        _settings['db_dir'] = db_dir or None
+    if tenant is not None:
+        _settings['tenant'] = validate_tenant(tenant) if tenant else None
+    if tenant_dir is not None:
+        _settings['tenant_dir'] = tenant_dir
+    if slow_query_ms is not None:
+        if slow_query_ms < 0:
+            raise ValueError("slow_query_ms cannot be negative")
+        _settings['slow_query_ms'] = float(slow_query_ms)
+    if disable_tracing:
+        _settings['slow_query_ms'] = None
+    if concurrency is not None:
+        if concurrency not in CONCURRENCY_MODES:
+            raise ValueError(f"Unknown concurrency mode '{concurrency}'. "
+                             f"Use one of: {', '.join(CONCURRENCY_MODES)}")
+        if concurrency != 'writer':
+            shutdown_writers()
+        _settings['concurrency'] = concurrency
+
+
+def get_concurrency() -> str:
+    return _settings['concurrency']
+
+
+def get_profile() -> StorageProfile:
+    """Returns the configured storage profile."""
+    name = _settings['profile']
+    if name not in PROFILES:
+        raise ValueError(f"Unknown storage profile '{name}'. Use one of: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def get_tenant() -> Optional[str]:
+    return _settings['tenant']
+
+
+def get_tenant_dir() -> str:
+    return _settings['tenant_dir']
+
+
+def validate_tenant(tenant: str) -> str:
+    """Returns the tenant name if it is safe to use as a directory name."""
+    if not isinstance(tenant, str) or not _TENANT_NAME.match(tenant):
+        raise ValueError(f"Invalid tenant name '{tenant}'. Use letters, digits, '.', '_' or '-' "
+                         f"(at most 64 characters, starting with a letter or digit)")
+    return tenant
+
+
+def get_db_dir() -> Optional[str]:
+    return _settings['db_dir']
+
+
+def resolve_db_path(filename: str, tenant: Optional[str] = None, shared: bool = False) -> str:
+    """
+    Returns the path (or in-memory URI) of a database file.
+
+    Per-tenant files live in ``<tenant_dir>/<tenant>/<filename>``, where the tenant is
+    ``tenant`` or else the configured one; without a tenant, or for ``shared`` files,
+    the plain file name is used. Either is placed under the configured ``db_dir``.
+    Missing directories are created on demand.
+    """
+    tenant = None if shared else (tenant or _settings['tenant'])
+    relative = filename if tenant is None else os.path.join(
+        _settings['tenant_dir'], validate_tenant(tenant), filename)
+    if _settings['db_dir'] == MEMORY:
+        return _memory_database(relative)
+    base = _get_temp_dir() if _settings['db_dir'] == TEMP else _settings['db_dir']
+    path = os.path.join(base, relative) if base else relative
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return path
+
+
+def list_tenants(filename: str) -> List[str]:
+    """Lists the tenants that have a ``filename`` database, sorted by name."""
+    if _settings['db_dir'] == MEMORY:
+        prefix = os.path.join(_settings['tenant_dir'], '')
+        with _location_lock:
+            names = [relative[len(prefix):] for relative in _memory if relative.startswith(prefix)]
+        return sorted(name.split(os.sep)[0] for name in names if name.endswith(os.sep + filename))
+    base = _get_temp_dir() if _settings['db_dir'] == TEMP else _settings['db_dir']
+    tenant_dir = os.path.join(base, _settings['tenant_dir']) if base else _settings['tenant_dir']
+    if not os.path.isdir(tenant_dir):
+        return []
+    return sorted(name for name in os.listdir(tenant_dir)
+                  if os.path.isfile(os.path.join(tenant_dir, name, filename)))
+
+
+def is_uri(db_name: str) -> bool:
+    return db_name.startswith('file:')
+
+
+def _memory_database(relative: str) -> str:
+    with _location_lock:
+        entry = _memory.get(relative)
+        if entry is None:
+            # The session token keeps a recreated database from matching caches of a closed one
+            uri = f"file:{_memory_session['token']}-{quote(relative)}?mode=memory&cache=shared"
+            keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            entry = _memory[relative] = (uri, keeper)
+        return entry[0]
+
+
+def close_memory_databases():
+    """Discards all in-memory databases."""
+    with _location_lock:
+        keepers = [keeper for _, keeper in _memory.values()]
+        _memory.clear()
+        _memory_session['token'] = uuid.uuid4().hex[:12]
+    for keeper in keepers:
+        keeper.close()
+
+
+def _get_temp_dir() -> str:
+    with _location_lock:
+        if _temp_dir['path'] is None:
+            _temp_dir['path'] = tempfile.mkdtemp(prefix='traits-db-')
+        return _temp_dir['path']
+
+
+def _remove_temp_dir():
+    with _location_lock:
+        path, _temp_dir['path'] = _temp_dir['path'], None
+    if path is not None:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+atexit.register(_remove_temp_dir)
+
+
+def get_slow_query_ms() -> Optional[float]:
+    return _settings['slow_query_ms']
+
+
+def _connect(db_name: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    threshold_ms = _settings['slow_query_ms']
+    if threshold_ms is None:
+        conn = sqlite3.connect(db_name, timeout=DB_TIMEOUT, check_same_thread=check_same_thread,
+                               uri=is_uri(db_name))
+    else:
+        conn = sqlite3.connect(db_name, timeout=DB_TIMEOUT, check_same_thread=check_same_thread,
+                               uri=is_uri(db_name), factory=query_log.TracingConnection)
+        conn.threshold_ms = threshold_ms
+    _apply_profile(conn, get_profile(), in_memory=is_uri(db_name))
+    return conn
+
+
+def _apply_profile(conn: sqlite3.Connection, profile: StorageProfile, in_memory: bool = False):
+    # Per-connection settings first; they take effect for this connection only
+    if profile.cache_size is not None:
+        conn.execute(f'PRAGMA cache_size={int(profile.cache_size)}')
+    if profile.mmap_size is not None:
+        conn.execute(f'PRAGMA mmap_size={int(profile.mmap_size)}')
+    if profile.synchronous is not None:
+        conn.execute(f'PRAGMA synchronous={profile.synchronous}')
+    if profile.temp_store is not None:
+        conn.execute(f'PRAGMA temp_store={profile.temp_store}')
+    # The journal mode is stored in the file; the concurrency mode needs WAL regardless
+    # of the profile. In-memory databases always use their own in-memory journal.
+    journal_mode = 'WAL' if _settings['concurrency'] in ('wal', 'writer') else profile.journal_mode
+    if journal_mode is not None and not in_memory:
+        current = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        if current.upper() != journal_mode.upper():
+            conn.execute(f'PRAGMA journal_mode={journal_mode}')
+
+
+def enable_connection_reuse():
+    """Makes DatabaseConnection on the calling thread reuse one connection per database file.
+
+    Meant for long-lived pool threads, which then skip the cost of opening a connection
+    per call. The connections stay open until close_reused_connections().
+    """
+    with _reused_lock:
+        _reused.setdefault(threading.get_ident(), {})
+
+
+def _reused_connection(db_name: str) -> Optional[sqlite3.Connection]:
+    connections = _reused.get(threading.get_ident())
+    if connections is None:
+        return None
+    conn = connections.get(db_name)
+    if conn is None:
+        # Only ever used by this thread, but closed by whichever thread shuts the pool down
+        conn = connections[db_name] = _connect(db_name, check_same_thread=False)
+    return conn
+
+
+def interrupt_thread(thread_id: int):
+    """Aborts the SQL statements running on a thread's reused connections."""
+    with _reused_lock:
+        connections = list(_reused.get(thread_id, {}).values())
+    for conn in connections:
+        conn.interrupt()
+
+
+def close_reused_connections(thread_ids: Optional[Iterable[int]] = None):
+    """
+    Closes reused connections. Call only once the threads using them are idle.
+
+    Args:
+        thread_ids: Only close the connections of these threads (default: of all threads).
+    """
+    with _reused_lock:
+        thread_ids = list(_reused) if thread_ids is None else list(thread_ids)
+        connections = [conn for thread_id in thread_ids for conn in _reused.pop(thread_id, {}).values()]
+    for conn in connections:
+        conn.close()
+
 
 class DatabaseConnection:
     """Context manager for database connections."""
     def __init__(self, db_name: str):
         self.db_name = db_name
-        
+
     def __enter__(self) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
-        self.conn = sqlite3.connect(self.db_name, timeout=DB_TIMEOUT)
+        self.conn = _reused_connection(self.db_name)
+        self._owned = self.conn is None
+        if self._owned:
+            self.conn = _connect(self.db_name)
         self.cursor = self.conn.cursor()
         return self.conn, self.cursor
-        
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.cursor.close()
-        self.conn.close()
\ No newline at end of file
+        if self._owned:
+            self.conn.close()
+        elif self.conn.in_transaction:
+            # Never hand an open transaction to the thread's next caller
+            self.conn.rollback()
+
+
+def is_lock_error(error: Exception) -> bool:
+    """Returns True for SQLite errors caused by another connection holding a lock."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def with_retry(operation: Callable[[], T], attempts: int = RETRY_ATTEMPTS) -> T:
+    """Runs an operation, retrying lock errors with jittered exponential backoff.
+
+    The operation must be safe to repeat, i.e. it either commits or leaves no trace.
+    The last lock error is re-raised once the attempts are exhausted.
+    """
+    for attempt in range(attempts):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if not is_lock_error(e) or attempt == attempts - 1:
+                raise
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt))
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def _run_in_transaction(conn: sqlite3.Connection, operation: WriteOperation) -> T:
+    cursor = conn.cursor()
+    try:
+        result = operation(conn, cursor)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+class WriterThread:
+    """Serializes write operations for one database file on a dedicated thread.
+
+    Operations are queued by any thread and executed in submission order on a single
+    long-lived connection, so writers in this process never contend with each other.
+    """
+    def __init__(self, db_name: str):
+        self.db_name = db_name
+        self._queue: 'queue.Queue' = queue.Queue()
+        self.conn: Optional[sqlite3.Connection] = None  # only used on the writer thread
+        self._thread = threading.Thread(target=self._run, name=f'db-writer:{db_name}', daemon=True)
+        self._thread.start()
+        self.thread_id = self._thread.ident
+
+    def submit(self, operation: WriteOperation) -> 'Future':
+        future: Future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def close(self):
+        """Drains pending operations and stops the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        conn = self.conn = _connect(self.db_name)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                operation, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    # Other processes may still hold the lock, so keep the bounded retry
+                    future.set_result(with_retry(lambda: _run_in_transaction(conn, operation)))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            conn.close()
+
+
+def get_writer(db_name: str) -> WriterThread:
+    with _writers_lock:
+        writer = _writers.get(db_name)
+        if writer is None:
+            writer = _writers[db_name] = WriterThread(db_name)
+        return writer
+
+
+def shutdown_writers():
+    """Flushes and stops all writer threads."""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(shutdown_writers)
+
+
+def begin_immediate(conn: sqlite3.Connection, cursor: sqlite3.Cursor):
+    """Takes the write lock before an operation reads, unless it runs nested in a transaction."""
+    if not conn.in_transaction:
+        cursor.execute('BEGIN IMMEDIATE')
+
+
+def _run_nested(conn: sqlite3.Connection, operation: WriteOperation) -> T:
+    """Runs an operation inside the transaction already open on ``conn``, under a savepoint."""
+    if not conn.in_transaction:
+        return _run_in_transaction(conn, operation)
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SAVEPOINT nested_write')
+        try:
+            return operation(conn, cursor)
+        except Exception:
+            cursor.execute('ROLLBACK TO nested_write')
+            raise
+        finally:
+            cursor.execute('RELEASE nested_write')
+    finally:
+        cursor.close()
+
+
+def run_write(db_name: str, operation: WriteOperation) -> T:
+    """Executes ``operation(conn, cursor)`` as one committed transaction.
+
+    In 'writer' mode the operation runs on the file's writer thread and this call
+    waits for its result; otherwise it runs on a fresh connection. Lock errors are
+    retried with bounded backoff in every mode, and any exception raised by the
+    operation rolls the transaction back and is re-raised to the caller.
+
+    An operation already running on the writer thread may call run_write again for
+    the same file: the nested operation then runs inline, as part of the outer
+    transaction, instead of waiting in the queue behind it forever.
+    """
+    if _settings['concurrency'] == 'writer':
+        writer = get_writer(db_name)
+        if threading.get_ident() == writer.thread_id:
+            return _run_nested(writer.conn, operation)
+        return writer.submit(operation).result()
+
+    def attempt():
+        with DatabaseConnection(db_name) as (conn, _):
+            return _run_in_transaction(conn, operation)
+
+    return with_retry(attempt)
@@ -0,0 +1,121 @@
+"""
+Time-decay module for the Personality Analysis System.
+
+A person's plain personality is the running average of every trait ever observed,
+so an observation from five years ago counts as much as one from yesterday. This
+module maintains an exponentially time-decayed alternative in constant time per
+update, without ever rewriting rows on a schedule.
+
+Each person stores decayed sums (weight, friendliness sum, dominance sum) together
+with the time they were last brought up to date. A new observation decays the sums
+from that time to now and adds itself with weight 1. Since decaying every sum by the
+same factor leaves their ratio unchanged, the decay only needs to be applied again at
+query time, where it is done lazily for a whole batch of persons with numpy. The
+decayed estimate can optionally be shrunk toward a neutral prior (``prior_weight``,
+``company query --decay-prior-weight``), so a person whose observations have all
+gone stale drifts back to neutral instead of keeping an old profile; by default it
+is not.
+
+The stored sums already weigh older observations by the half-life they were written
+with, and that cannot be undone afterwards, so the sums of one database are only
+meaningful for that half-life. Persons DAOs record it on the first decayed write and
+reject a different one, both on later writes and at query time.
+
+Functions:
+    check_recorded_half_life: Rejects a half-life other than the one the sums were built with.
+    decay_factor: Weight multiplier for an observation of a given age.
+    observe: Adds one trait observation to a person's decayed sums.
+    merge: Combines the decayed sums of several profiles of the same person.
+    decayed_personalities: Vectorized decayed estimates for a batch of persons.
+"""
+
+import math
+from typing import Iterable, Optional, Tuple
+import numpy as np
+from personality_models import DecayState, Personality
+
+# Constants
+DEFAULT_HALF_LIFE_DAYS = 180.0
+DEFAULT_PRIOR_WEIGHT = 0.0  # pseudo-observations at the prior; 0 disables shrinkage
+NEUTRAL_PERSONALITY = Personality(0.0, 0.0)
+SECONDS_PER_DAY = 86400.0
+
+
+def _check_half_life(half_life_days: float):
+    if not half_life_days > 0:
+        raise ValueError("Decay half-life must be a positive number of days")
+
+
+def check_recorded_half_life(recorded: Optional[float], half_life_days: float):
+    """Raises ValueError unless ``half_life_days`` is the one the stored sums were built with."""
+    _check_half_life(half_life_days)
+    if recorded is not None and not math.isclose(recorded, half_life_days):
+        raise ValueError(f"Decayed sums were built with a half-life of {recorded:g} days "
+                         f"and cannot be used with {half_life_days:g}")
+
+
+def decay_factor(age_seconds: float, half_life_days: float = DEFAULT_HALF_LIFE_DAYS) -> float:
+    """Weight multiplier for an observation ``age_seconds`` old. Future times count as now."""
+    _check_half_life(half_life_days)
+    return 0.5 ** (max(age_seconds, 0.0) / (half_life_days * SECONDS_PER_DAY))
+
+
+def observe(state: Optional[DecayState], trait: Personality, now: float,
+            half_life_days: float = DEFAULT_HALF_LIFE_DAYS) -> DecayState:
+    """Returns the decayed sums after observing ``trait`` at time ``now``."""
+    if state is None or state.updated_at is None:
+        return DecayState(now, 1.0, trait.friendliness, trait.dominance)
+    # An out-of-order observation is treated as current rather than growing older sums
+    factor = decay_factor(now - state.updated_at, half_life_days)
+    return DecayState(
+        updated_at=max(now, state.updated_at),
+        weight=state.weight * factor + 1.0,
+        friendliness_sum=state.friendliness_sum * factor + trait.friendliness,
+        dominance_sum=state.dominance_sum * factor + trait.dominance,
+    )
+
+
+def merge(states: Iterable[Optional[DecayState]],
+          half_life_days: float = DEFAULT_HALF_LIFE_DAYS) -> DecayState:
+    """Returns the decayed sums of all observations in ``states``, as of the latest of their times."""
+    _check_half_life(half_life_days)
+    states = [state for state in states if state is not None and state.updated_at is not None]
+    if not states:
+        return DecayState()
+    latest = max(state.updated_at for state in states)
+    factors = [decay_factor(latest - state.updated_at, half_life_days) for state in states]
+    return DecayState(
+        updated_at=latest,
+        weight=sum(state.weight * factor for state, factor in zip(states, factors)),
+        friendliness_sum=sum(state.friendliness_sum * factor for state, factor in zip(states, factors)),
+        dominance_sum=sum(state.dominance_sum * factor for state, factor in zip(states, factors)),
+    )
+
+
+def decayed_personalities(updated_at: np.ndarray, weight: np.ndarray, friendliness_sum: np.ndarray,
+                          dominance_sum: np.ndarray, now: float,
+                          half_life_days: float = DEFAULT_HALF_LIFE_DAYS,
+                          prior: Personality = NEUTRAL_PERSONALITY,
+                          prior_weight: float = DEFAULT_PRIOR_WEIGHT) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (friendliness, dominance) arrays of decayed estimates as of ``now``.
+
+    Each estimate is (decayed sum + prior_weight * prior) / (decayed weight + prior_weight).
+    Persons without observations (NaN ``updated_at``, zero weight) get the prior.
+    """
+    _check_half_life(half_life_days)
+    if prior_weight < 0:
+        raise ValueError("prior_weight cannot be negative")
+    age = np.maximum(now - np.nan_to_num(np.asarray(updated_at, dtype=float), nan=now), 0.0)
+    factor = np.exp2(-age / (half_life_days * SECONDS_PER_DAY))
+    total = np.asarray(weight, dtype=float) * factor + prior_weight
+    with np.errstate(invalid='ignore', divide='ignore'):
+        friendliness = (np.asarray(friendliness_sum, dtype=float) * factor
+                        + prior_weight * prior.friendliness) / total
+        dominance = (np.asarray(dominance_sum, dtype=float) * factor
+                     + prior_weight * prior.dominance) / total
+    # Only reachable with prior_weight 0 and no observations
+    empty = total == 0
+    friendliness[empty] = prior.friendliness
+    dominance[empty] = prior.dominance
+    return friendliness, dominance
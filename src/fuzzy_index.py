@@ -0,0 +1,175 @@
+"""
+Fuzzy trait index module for the Personality Analysis System.
+
+This module resolves words from free-text descriptions to canonical trait names,
+tolerating inflections ("friendlier", "leadership") and misspellings ("colaborative").
+Resolution tries, in order:
+
+1. An exact match against the lexicon.
+2. A stem match, using a small suffix-stripping stemmer applied to both sides.
+3. A SymSpell-style lookup: every trait is indexed under all strings obtainable by
+   deleting up to ``max_distance`` characters, so candidates for a word are found by
+   generating the word's own deletes instead of scanning the lexicon. Candidates are
+   then verified with an optimal-string-alignment edit distance.
+
+The allowed edit distance grows with word length, so short common words never match
+fuzzily. Lookups cost a bounded number of dictionary probes regardless of lexicon size.
+Indexes are cached per lexicon version and only rebuilt when the lexicon changes.
+
+Classes:
+    TraitIndex: Precomputed exact, stem and deletion indexes over trait names.
+
+Functions:
+    tokenize: Splits a description into lowercase word tokens.
+    stem: Reduces a word to a crude stem by stripping common English suffixes.
+    edit_distance: Optimal string alignment distance between two words.
+    get_cached_index: Returns a cached TraitIndex, rebuilding it when the lexicon version changes.
+"""
+
+import re
+import threading
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Constants
+DEFAULT_MAX_DISTANCE = 2
+MIN_STEM_LENGTH = 3
+# Shortest word length allowed 1 and 2 edits respectively
+ONE_EDIT_MIN_LENGTH = 6
+TWO_EDIT_MIN_LENGTH = 10
+
+_TOKEN_PATTERN = re.compile(r"[\w'-]+")
+_SUFFIXES = ('ship', 'ness', 'ment', 'ing', 'est', 'ed', 'ly', 'er', 'es', 's')
+_Y_SUFFIXES = (('iest', 'y'), ('ier', 'y'), ('ies', 'y'), ('ily', 'y'))
+
+_cache: Dict[Hashable, Tuple[Hashable, 'TraitIndex']] = {}
+_cache_lock = threading.Lock()
+
+
+def tokenize(description: str) -> List[str]:
+    """Splits a description into lowercase tokens, dropping surrounding punctuation."""
+    tokens = (token.strip("'-") for token in _TOKEN_PATTERN.findall(description.lower()))
+    return [token for token in tokens if token]
+
+
+def stem(word: str) -> str:
+    """Strips common inflectional and derivational suffixes, e.g. leadership -> lead."""
+    for suffix, replacement in _Y_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH - 1:
+            word = word[:-len(suffix)] + replacement
+            break
+    changed = True
+    while changed:
+        changed = False
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+                word = word[:-len(suffix)]
+                changed = True
+                break
+    return word
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Optimal string alignment distance (adjacent transpositions count as one edit).
+
+    If ``limit`` is given, returns ``limit + 1`` as soon as the distance must exceed it.
+    """
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """All strings obtainable from word by deleting up to ``distance`` characters."""
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        results |= frontier
+    return results
+
+
+def allowed_distance(word: str, max_distance: int = DEFAULT_MAX_DISTANCE) -> int:
+    """Maximum edit distance tolerated for a word of this length."""
+    if len(word) >= TWO_EDIT_MIN_LENGTH:
+        return min(2, max_distance)
+    if len(word) >= ONE_EDIT_MIN_LENGTH:
+        return min(1, max_distance)
+    return 0
+
+
+class TraitIndex:
+    """Precomputed lookup structures for resolving words to canonical trait names."""
+    def __init__(self, traits: Iterable[str], max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.traits: Set[str] = set(traits)
+        self._by_stem: Dict[str, str] = {}
+        self._by_delete: Dict[str, List[str]] = {}
+        # Sorted so that ambiguous stems resolve to the same trait on every build
+        for trait in sorted(self.traits, key=lambda t: (len(t), t)):
+            self._by_stem.setdefault(stem(trait), trait)
+            # A match must be within both sides' tolerance, so index only the deletes
+            # this trait can ever need; short traits are exact or stem matches only
+            for variant in _deletes(trait, allowed_distance(trait, max_distance)):
+                self._by_delete.setdefault(variant, []).append(trait)
+
+    def __len__(self) -> int:
+        return len(self.traits)
+
+    def resolve(self, word: str) -> Optional[str]:
+        """Returns the canonical trait a word refers to, or None if nothing is close enough."""
+        if word in self.traits:
+            return word
+        stemmed = self._by_stem.get(stem(word))
+        if stemmed is not None:
+            return stemmed
+
+        limit = allowed_distance(word, self.max_distance)
+        if limit == 0:
+            return None
+        best: Optional[Tuple[int, str]] = None
+        seen: Set[str] = set()
+        for variant in _deletes(word, limit):
+            for trait in self._by_delete.get(variant, ()):
+                if trait in seen:
+                    continue
+                seen.add(trait)
+                trait_limit = min(limit, allowed_distance(trait, self.max_distance))
+                distance = edit_distance(word, trait, trait_limit)
+                if distance <= trait_limit and (best is None or (distance, trait) < best):
+                    best = (distance, trait)
+        return best[1] if best else None
+
+    def analyze(self, description: str) -> Dict[str, float]:
+        """Maps a description to {trait: weight}, resolving each token through the index."""
+        trait_weights = {}
+        for token in tokenize(description):
+            trait = self.resolve(token)
+            if trait is not None:
+                trait_weights[trait] = 1.0  # Assign weight 1.0 for now
+        return trait_weights
+
+
+def get_cached_index(key: Hashable, version: Hashable,
+                     load_traits: Callable[[], Iterable[str]]) -> TraitIndex:
+    """Returns the cached index for ``key``, rebuilding it if ``version`` has changed."""
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    index = TraitIndex(load_traits())
+    with _cache_lock:
+        _cache[key] = (version, index)
+    return index
@@ -0,0 +1,203 @@
+"""
+Trait lexicon import/export module for the Personality Analysis System.
+
+This module reads and writes trait lexicons as CSV or JSON Lines files. Input is
+streamed in fixed-size chunks and each chunk's scores are validated in a single
+vectorized pass, so large lexicons can be loaded without per-row overhead.
+
+Supported formats:
+- csv: ``trait,friendliness,dominance`` rows, with an optional header line
+- jsonl: one ``{"trait": ..., "friendliness": ..., "dominance": ...}`` object per line
+
+Classes:
+    LexiconDiff: Summary of the traits added, changed and removed by an import.
+
+Functions:
+    detect_format: Infers the lexicon format from a file name.
+    read_lexicon: Streams validated (trait, friendliness, dominance) chunks from a file.
+    load_lexicon: Reads a whole lexicon file into a dictionary of Personality objects.
+    write_lexicon: Writes (trait, friendliness, dominance) rows to a file.
+    diff_lexicon: Compares two lexicons and reports added, changed and removed traits.
+"""
+
+import csv
+import json
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from personality_models import Personality
+
+# Constants
+DEFAULT_CHUNK_SIZE = 10000
+MAX_TRAIT_NAME_LENGTH = 50
+SCORE_RANGE = (-10.0, 10.0)
+FORMATS = ('csv', 'jsonl')
+CSV_HEADER = ('trait', 'friendliness', 'dominance')
+
+TraitRow = Tuple[str, float, float]
+
+
+@dataclass
+class LexiconDiff:
+    """Summary of the differences between the stored lexicon and an imported one."""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    # Stored coordinates of the changed traits, before the import
+    previous: Dict[str, Personality] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        return (f"added={len(self.added)}, changed={len(self.changed)}, "
+                f"removed={len(self.removed)}, unchanged={self.unchanged}")
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    """Returns the explicit format if given, otherwise infers it from the file extension."""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported lexicon format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+        return fmt
+    lowered = path.lower()
+    if lowered.endswith('.jsonl') or lowered.endswith('.ndjson'):
+        return 'jsonl'
+    if lowered.endswith('.csv') or path == '-':
+        return 'csv'
+    raise ValueError(f"Cannot infer lexicon format from '{path}'. Use --format csv or --format jsonl.")
+
+
+@contextmanager
+def _open(path: str, mode: str):
+    if path == '-':
+        yield sys.stdin if 'r' in mode else sys.stdout
+    else:
+        with open(path, mode, newline='', encoding='utf-8') as handle:
+            yield handle
+
+
+def _iter_raw_rows(handle, fmt: str) -> Iterator[Tuple[int, object, object, object]]:
+    """Yields (line_number, trait, friendliness, dominance) without validating values."""
+    if fmt == 'csv':
+        for line_number, row in enumerate(csv.reader(handle), start=1):
+            if not row or (len(row) == 1 and not row[0].strip()):
+                continue
+            if line_number == 1 and tuple(cell.strip().lower() for cell in row) == CSV_HEADER:
+                continue
+            if len(row) != 3:
+                raise ValueError(f"Line {line_number}: expected 3 columns, got {len(row)}")
+            yield line_number, row[0], row[1], row[2]
+    else:
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                yield line_number, record['trait'], record['friendliness'], record['dominance']
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                raise ValueError(f"Line {line_number}: invalid lexicon record ({e})")
+
+
+def _to_float_array(values: List[object], line_numbers: List[int], column: str) -> np.ndarray:
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # Only fall back to per-value parsing to locate the offending line
+        for line_number, value in zip(line_numbers, values):
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Line {line_number}: {column} must be numeric, got {value!r}")
+        raise
+
+
+def _validate_chunk(raw_rows: List[Tuple[int, object, object, object]]) -> List[TraitRow]:
+    """Validates one chunk of raw rows; scores are range-checked as whole arrays."""
+    line_numbers = [row[0] for row in raw_rows]
+    names = []
+    for line_number, name, _, _ in raw_rows:
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError(f"Line {line_number}: trait name cannot be empty")
+        name = name.strip().lower()  # Same normalization as TraitDAO.add_trait
+        if len(name) > MAX_TRAIT_NAME_LENGTH:
+            raise ValueError(f"Line {line_number}: trait name cannot exceed {MAX_TRAIT_NAME_LENGTH} characters")
+        names.append(name)
+
+    friendliness = _to_float_array([row[2] for row in raw_rows], line_numbers, 'friendliness')
+    dominance = _to_float_array([row[3] for row in raw_rows], line_numbers, 'dominance')
+
+    low, high = SCORE_RANGE
+    scores = np.stack((friendliness, dominance))
+    invalid = ~np.isfinite(scores).all(axis=0) | ((scores < low) | (scores > high)).any(axis=0)
+    if invalid.any():
+        bad_lines = [line_numbers[i] for i in np.flatnonzero(invalid)[:5]]
+        raise ValueError(f"Personality scores must be between -10 and 10 "
+                         f"({int(invalid.sum())} invalid rows, first at lines {bad_lines})")
+
+    return list(zip(names, friendliness.tolist(), dominance.tolist()))
+
+
+def read_lexicon(path: str, fmt: Optional[str] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[TraitRow]]:
+    """Streams a lexicon file as validated chunks of (trait, friendliness, dominance) rows."""
+    fmt = detect_format(path, fmt)
+    with _open(path, 'r') as handle:
+        chunk = []
+        for raw_row in _iter_raw_rows(handle, fmt):
+            chunk.append(raw_row)
+            if len(chunk) >= chunk_size:
+                yield _validate_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield _validate_chunk(chunk)
+
+
+def load_lexicon(path: str, fmt: Optional[str] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Personality]:
+    """Reads a whole lexicon into a dictionary keyed by normalized trait name."""
+    lexicon: Dict[str, Personality] = {}
+    for chunk in read_lexicon(path, fmt, chunk_size):
+        for name, friendliness, dominance in chunk:
+            if name in lexicon:
+                raise ValueError(f"Trait '{name}' appears more than once in the lexicon")
+            lexicon[name] = Personality(friendliness, dominance)
+    return lexicon
+
+
+def write_lexicon(path: str, rows: Iterable[TraitRow], fmt: Optional[str] = None) -> int:
+    """Writes (trait, friendliness, dominance) rows to a file and returns the row count."""
+    fmt = detect_format(path, fmt)
+    count = 0
+    with _open(path, 'w') as handle:
+        if fmt == 'csv':
+            writer = csv.writer(handle, lineterminator='\n')
+            writer.writerow(CSV_HEADER)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for name, friendliness, dominance in rows:
+                handle.write(json.dumps({'trait': name, 'friendliness': friendliness,
+                                         'dominance': dominance}) + '\n')
+                count += 1
+    return count
+
+
+def diff_lexicon(current: Dict[str, Personality], incoming: Dict[str, Personality]) -> LexiconDiff:
+    """Compares the stored lexicon with an incoming one."""
+    diff = LexiconDiff()
+    for name, personality in incoming.items():
+        existing = current.get(name)
+        if existing is None:
+            diff.added.append(name)
+        elif (existing.friendliness, existing.dominance) != (personality.friendliness, personality.dominance):
+            diff.changed.append(name)
+            diff.previous[name] = existing
+        else:
+            diff.unchanged += 1
+    diff.removed = [name for name in current if name not in incoming]
+    diff.added.sort()
+    diff.changed.sort()
+    diff.removed.sort()
+    return diff
@@ -0,0 +1,315 @@
+"""
+Load generation script for the Personality Analysis System.
+
+This script drives PersonService and CompanyService concurrently against the same
+SQLite files, mixing ``company query`` style reads with ``person add_desc`` style
+writes, and reports how the databases behave under contention. For every reporting
+interval and operation it prints throughput, p50/p95/p99 latency and the rate of
+lock errors (writes whose bounded retries were exhausted, or reads that hit a lock).
+
+By default the databases are created in a fresh temporary directory and seeded with
+the default traits and ``--candidates`` randomly placed persons, so a run never
+touches the working databases. Workers are threads by default, or separate processes
+with ``--processes``, which exercises cross-process locking the way several CLI
+invocations would.
+
+Example:
+    python loadgen.py --workers 8 --read-ratio 0.9 --candidates 50000 --duration 30
+    python loadgen.py --processes --concurrency wal --workers 4
+    python loadgen.py --profile read-mostly --read-ratio 0.95
+
+Functions:
+    seed_databases: Creates and fills the databases used by a run.
+    run_load: Runs the workload and returns all samples.
+    summarize: Aggregates samples into per-operation statistics.
+    main: Parses arguments, runs the load and prints the reports.
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+import db_connection
+import populate_traits_db
+import schema
+from person_dao import PersonDAO
+from trait_dao import TraitDAO
+from services.company_service import CompanyService
+from services.person_service import PersonService
+
+# Constants
+OPERATIONS = ('query', 'add_desc')
+PERCENTILES = (50, 95, 99)
+SAMPLE_BATCH_SIZE = 200
+SAMPLE_FLUSH_SECONDS = 0.2
+TRAITS_PER_DESCRIPTION = 3
+
+
+class Sample(NamedTuple):
+    """One completed operation."""
+    operation: str
+    finished_at: float  # seconds since the run started
+    latency: float  # seconds
+    outcome: str  # 'ok', 'lock' or 'error'
+
+
+@dataclass
+class LoadConfig:
+    """Parameters of one load run."""
+    persons_db: str
+    traits_db: str
+    workers: int = 4
+    duration: float = 10.0
+    read_ratio: float = 0.8
+    top: int = 10
+    use_processes: bool = False
+    concurrency: str = 'default'
+    profile: str = 'default'
+    seed: Optional[int] = None
+
+
+@dataclass
+class OperationStats:
+    """Aggregated results for one operation over a time window."""
+    operation: str
+    count: int
+    throughput: float  # operations per second
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    lock_errors: int
+    other_errors: int
+
+    @property
+    def lock_error_rate(self) -> float:
+        return self.lock_errors / self.count if self.count else 0.0
+
+
+def seed_databases(persons_db: str, traits_db: str, candidates: int, seed: Optional[int] = None):
+    """Creates fresh databases with the default traits and ``candidates`` random persons."""
+    trait_dao = TraitDAO(traits_db)
+    trait_dao.create_tables()
+    trait_dao.add_traits(populate_traits_db.DEFAULT_TRAITS)
+
+    person_dao = PersonDAO(persons_db)
+    person_dao.create_tables()
+    rng = random.Random(seed)
+    now = time.time()
+
+    def rows():
+        for i in range(candidates):
+            friendliness, dominance = rng.uniform(0, 10), rng.uniform(0, 10)
+            # One observation each, made now, for both the plain and the decayed aggregates
+            yield (f'candidate-{i:07d}', friendliness, dominance, now, friendliness, dominance)
+
+    db_connection.run_write(persons_db, lambda conn, cursor: cursor.executemany('''
+        INSERT OR IGNORE INTO persons (person, friendliness, dominance, n_friendliness, n_dominance,
+                                       decay_updated_at, decay_weight, decay_f_sum, decay_d_sum)
+        VALUES (?, ?, ?, 1, 1, ?, 1.0, ?, ?)
+    ''', rows()))
+
+
+def _make_services(config: LoadConfig):
+    person_dao = PersonDAO(config.persons_db)
+    trait_dao = TraitDAO(config.traits_db)
+    return PersonService(person_dao, trait_dao), CompanyService(person_dao, trait_dao)
+
+
+def _worker(config: LoadConfig, worker_id: int, started_at: float, deadline: float,
+            candidates: Sequence[str], samples):
+    """Runs operations until the deadline, sending batches of samples to ``samples``."""
+    db_connection.configure(concurrency=config.concurrency, profile=config.profile)
+    person_service, company_service = _make_services(config)
+    trait_names = [trait for trait, _, _ in populate_traits_db.DEFAULT_TRAITS]
+    rng = random.Random(None if config.seed is None else config.seed + worker_id)
+
+    batch: List[Sample] = []
+    last_flush = time.monotonic()
+    while time.monotonic() < deadline:
+        description = ' and '.join(rng.sample(trait_names, TRAITS_PER_DESCRIPTION))
+        is_read = rng.random() < config.read_ratio
+        start = time.monotonic()
+        try:
+            if is_read:
+                company_service.find_matches_for_description(description, top=config.top)
+            else:
+                person_service.add_description_to_person(rng.choice(candidates), description)
+            outcome = 'ok'
+        except Exception as e:
+            outcome = 'lock' if db_connection.is_lock_error(e) else 'error'
+        end = time.monotonic()
+        batch.append(Sample(OPERATIONS[0] if is_read else OPERATIONS[1],
+                            end - started_at, end - start, outcome))
+        if len(batch) >= SAMPLE_BATCH_SIZE or end - last_flush >= SAMPLE_FLUSH_SECONDS:
+            samples.put(batch)
+            batch, last_flush = [], end
+    samples.put(batch)
+    samples.put(None)  # Done marker
+    if config.use_processes:
+        # Threads share the writer threads, which main() stops once all workers are done
+        db_connection.shutdown_writers()
+
+
+def run_load(config: LoadConfig, interval: Optional[float] = None,
+             report=None) -> List[Sample]:
+    """
+    Runs the workload against already seeded databases and returns every sample.
+
+    Args:
+        config: The run parameters.
+        interval: If given, ``report(window_start, window_end, samples)`` is called with
+            the samples of each interval as the run progresses.
+        report: Interval callback, see ``interval``.
+    """
+    if config.workers < 1:
+        raise ValueError("workers must be at least 1")
+    if not 0.0 <= config.read_ratio <= 1.0:
+        raise ValueError("read_ratio must be between 0 and 1")
+
+    person_dao = PersonDAO(config.persons_db)
+    candidates = [person for person, _, _ in person_dao.iter_coordinates()]
+    if not candidates and config.read_ratio < 1.0:
+        raise ValueError("Write operations need at least one candidate in the persons database")
+
+    started_at = time.monotonic()
+    deadline = started_at + config.duration
+    if config.use_processes:
+        context = multiprocessing.get_context('spawn')
+        samples = context.Queue()
+        workers = [context.Process(target=_worker, args=(config, i, started_at, deadline, candidates, samples))
+                   for i in range(config.workers)]
+    else:
+        samples = queue.Queue()
+        workers = [threading.Thread(target=_worker, args=(config, i, started_at, deadline, candidates, samples))
+                   for i in range(config.workers)]
+    for worker in workers:
+        worker.start()
+
+    collected: List[Sample] = []
+    pending: List[Sample] = []
+    window_start = 0.0
+    running = len(workers)
+    while running:
+        try:
+            batch = samples.get(timeout=0.1)
+        except queue.Empty:
+            batch = []
+        if batch is None:
+            running -= 1
+            continue
+        collected.extend(batch)
+        pending.extend(batch)
+        now = time.monotonic() - started_at
+        window_end = window_start + interval if interval else None
+        # Wait a flush period past the window so its samples have arrived; the last
+        # window also takes operations that finish just after the deadline
+        if report and window_end and window_end < config.duration and now >= window_end + SAMPLE_FLUSH_SECONDS:
+            report(window_start, window_end, [s for s in pending if s.finished_at < window_end])
+            pending = [s for s in pending if s.finished_at >= window_end]
+            window_start = window_end
+    if interval and report and pending:
+        report(window_start, max(s.finished_at for s in pending), pending)
+
+    for worker in workers:
+        worker.join()
+    return collected
+
+
+def summarize(samples: Sequence[Sample], elapsed: float) -> Dict[str, OperationStats]:
+    """Aggregates samples into per-operation statistics over ``elapsed`` seconds."""
+    results = {}
+    for operation in OPERATIONS:
+        selected = [s for s in samples if s.operation == operation]
+        if not selected:
+            continue
+        latencies = np.fromiter((s.latency for s in selected), dtype=float, count=len(selected)) * 1000.0
+        p50, p95, p99 = np.percentile(latencies, PERCENTILES)
+        results[operation] = OperationStats(
+            operation=operation,
+            count=len(selected),
+            throughput=len(selected) / elapsed if elapsed > 0 else 0.0,
+            p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99),
+            lock_errors=sum(1 for s in selected if s.outcome == 'lock'),
+            other_errors=sum(1 for s in selected if s.outcome == 'error'),
+        )
+    return results
+
+
+def _print_window(window_start: float, window_end: float, samples: Sequence[Sample]):
+    for stats in summarize(samples, window_end - window_start).values():
+        print(f"{window_start:7.1f}-{window_end:<7.1f} {stats.operation:<9} {stats.count:>7} "
+              f"{stats.throughput:>9.1f} {stats.p50_ms:>9.2f} {stats.p95_ms:>9.2f} {stats.p99_ms:>9.2f} "
+              f"{stats.lock_error_rate:>8.2%} {stats.other_errors:>6}")
+
+
+HEADER = (f"{'Window s':<15} {'Operation':<9} {'Ops':>7} {'Ops/s':>9} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'Locked':>8} {'Errors':>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent read/write load generator for the trait databases')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent workers (default: 4)')
+    parser.add_argument('--processes', action='store_true', help='Use worker processes instead of threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='Run time in seconds (default: 10)')
+    parser.add_argument('--interval', type=float, default=1.0, help='Report interval in seconds (default: 1)')
+    parser.add_argument('--read-ratio', type=float, default=0.8,
+                        help='Fraction of operations that are company queries (default: 0.8)')
+    parser.add_argument('--candidates', type=int, default=10000, help='Persons to seed (default: 10000)')
+    parser.add_argument('--top', type=int, default=10, help='Matches returned per query (default: 10)')
+    parser.add_argument('--concurrency', choices=db_connection.CONCURRENCY_MODES, default='default',
+                        help='Database concurrency mode used by every worker')
+    parser.add_argument('--profile', choices=list(db_connection.PROFILES), default='default',
+                        help='Storage tuning profile used by every worker')
+    parser.add_argument('--db-dir', help='Directory for the databases (default: a new temporary directory). '
+                                         'Existing databases there are reused without reseeding.')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible runs')
+    args = parser.parse_args()
+
+    db_connection.configure(concurrency=args.concurrency, profile=args.profile)
+    temp_dir = None
+    db_dir = args.db_dir
+    if db_dir is None:
+        temp_dir = tempfile.TemporaryDirectory(prefix='loadgen-')
+        db_dir = temp_dir.name
+    persons_db = os.path.join(db_dir, 'persons.db')
+    traits_db = os.path.join(db_dir, 'traits.db')
+
+    try:
+        if not os.path.exists(persons_db):
+            print(f"Seeding {args.candidates} candidates in '{db_dir}'...")
+            seed_databases(persons_db, traits_db, args.candidates, args.seed)
+        else:
+            schema.ensure_schema(persons_db, schema.PERSONS_MIGRATIONS)
+            schema.ensure_schema(traits_db, schema.TRAITS_MIGRATIONS)
+
+        config = LoadConfig(persons_db, traits_db, workers=args.workers, duration=args.duration,
+                            read_ratio=args.read_ratio, top=args.top, use_processes=args.processes,
+                            concurrency=args.concurrency, profile=args.profile, seed=args.seed)
+        mode = 'processes' if args.processes else 'threads'
+        print(f"Running {args.workers} {mode} for {args.duration}s, "
+              f"{args.read_ratio:.0%} reads, concurrency '{args.concurrency}', profile '{args.profile}'")
+        print(HEADER)
+        start = time.monotonic()
+        samples = run_load(config, interval=args.interval, report=_print_window)
+        elapsed = time.monotonic() - start
+
+        print("\nOverall:")
+        print(HEADER)
+        _print_window(0.0, elapsed, samples)
+    except ValueError as e:
+        print(f"Error: {e}")
+    finally:
+        db_connection.shutdown_writers()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -9,15 +9,29 @@ The module uses subparsers to organize commands into logical groups:
 - trait: Operations for creating and managing personality traits
 - person: Operations for creating and updating person profiles
 - company: Operations for matching candidates to job descriptions
+- analytics: Population summaries such as cohorts in the personality plane
+- plot: Images of the stored data, such as a density heatmap of all persons
+- db: Database maintenance such as online snapshots, restores and change replication
 
 Functions:
     main: Entry point function that sets up CLI argument parsing and routes commands.
 """
 
 import argparse
+import logging
+import analytics_commands
+import backup
+import db_commands
+import db_connection
+import lexicon
+import query_log
 import trait_commands
 import person_commands
 import company_commands
+import plot_commands
+import plotting
+from services import analytics_service
+from person_dao import DEFAULT_ARRAY_CHUNK
 
 
 def main():
@@ -28,12 +42,33 @@ def main():
 Examples:
   python main.py person create "John Doe"
   python main.py person add_desc "John Doe" "friendly and outgoing leader"
-  python main.py company query "TechCorp" "innovative and collaborative team player"
+  python main.py company query "TechCorp" "innovative and collaborative team player" --top 10
   python main.py trait create "creative" 8.0 6.0
+  python main.py trait import lexicon.csv --prune
+  python main.py trait update "creative" 7.5 6.0
         """
     )
     parser.add_argument('--version', action='version', version='Personality Analysis Tool v1.0')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
+    parser.add_argument('--concurrency', choices=db_connection.CONCURRENCY_MODES,
+                        help='Database concurrency mode: default journal, wal, or wal with a single '
+                             'writer thread (default: $TRAITS_DB_CONCURRENCY or "default")')
+    parser.add_argument('--profile', choices=list(db_connection.PROFILES),
+                        help='Storage tuning profile applied to every database connection: page cache, '
+                             'memory mapping, synchronous, temp store and journal mode '
+                             '(default: $TRAITS_DB_PROFILE or "default")')
+    parser.add_argument('--db-dir', metavar='DIR',
+                        help="Directory for the database files, ':memory:' for in-memory databases that "
+                             "last for this run, or ':temp:' for a throwaway temporary directory "
+                             "(default: $TRAITS_DB_DIR, or the current directory)")
+    parser.add_argument('--tenant',
+                        help="Tenant whose candidate database to use; the trait lexicon is shared "
+                             "(default: $TRAITS_TENANT, or the untenanted files)")
+    parser.add_argument('--slow-query-ms', type=float,
+                        help='Log SQL statements slower than this many milliseconds, with their '
+                             'query plans (default: $TRAITS_SLOW_QUERY_MS, or off)')
+    parser.add_argument('--query-stats', action='store_true',
+                        help='Print per-statement timing aggregates after the command (enables tracing)')
 
     subparsers = parser.add_subparsers(title='commands', dest='command', help='Available commands')
 
@@ -48,10 +83,47 @@ Examples:
     trait_create_parser.add_argument('dominance', help='Dominance score (-10 to 10, where -10 is submissive, 10 is dominant)')
     trait_create_parser.set_defaults(func=trait_commands.create_trait)
 
+    # Update a trait and recompute the profiles that observed it
+    trait_update_parser = trait_subparsers.add_parser(
+        'update', help="Change a trait's scores and recompute the persons who observed it")
+    trait_update_parser.add_argument('name', help='Name of an existing trait')
+    trait_update_parser.add_argument('friendliness', help='New friendliness score (-10 to 10)')
+    trait_update_parser.add_argument('dominance', help='New dominance score (-10 to 10)')
+    trait_update_parser.add_argument('--all-tenants', action='store_true',
+                                     help="Also recompute every tenant's persons database")
+    trait_update_parser.set_defaults(func=trait_commands.update_trait)
+
+    # Traits named together in descriptions
+    trait_cooccur_parser = trait_subparsers.add_parser(
+        'cooccur', help='Show which traits descriptions name together, and how often')
+    trait_cooccur_parser.add_argument('name', nargs='?',
+                                      help='Show the traits named with this one (default: the most frequent pairs)')
+    trait_cooccur_parser.add_argument('--top', type=int, default=10, metavar='K',
+                                      help='Number of traits or pairs to show (default: 10)')
+    trait_cooccur_parser.add_argument('--all-tenants', action='store_true',
+                                      help="Also count descriptions in every tenant's persons database")
+    trait_cooccur_parser.set_defaults(func=trait_commands.show_cooccurrences)
+
     # List traits
     trait_list_parser = trait_subparsers.add_parser('list', help='List all available traits')
     trait_list_parser.set_defaults(func=trait_commands.list_traits)
 
+    # Import a trait lexicon
+    trait_import_parser = trait_subparsers.add_parser('import', help='Bulk import traits from a CSV or JSONL lexicon')
+    trait_import_parser.add_argument('path', help='Lexicon file with trait, friendliness and dominance columns ("-" for stdin)')
+    trait_import_parser.add_argument('--format', choices=lexicon.FORMATS, help='File format (default: inferred from extension)')
+    trait_import_parser.add_argument('--prune', action='store_true', help='Remove stored traits that are missing from the file')
+    trait_import_parser.add_argument('--dry-run', action='store_true', help='Report the diff without writing changes')
+    trait_import_parser.add_argument('--all-tenants', action='store_true',
+                                     help="Also recompute changed traits in every tenant's persons database")
+    trait_import_parser.set_defaults(func=trait_commands.import_traits)
+
+    # Export the trait lexicon
+    trait_export_parser = trait_subparsers.add_parser('export', help='Export all traits to a CSV or JSONL lexicon')
+    trait_export_parser.add_argument('path', help='Output file ("-" for stdout)')
+    trait_export_parser.add_argument('--format', choices=lexicon.FORMATS, help='File format (default: inferred from extension)')
+    trait_export_parser.set_defaults(func=trait_commands.export_traits)
+
     # Person commands
     person_parser = subparsers.add_parser('person', help='Person operations')
     person_subparsers = person_parser.add_subparsers(title='person_commands', dest='person_command', help='Person sub-commands')
@@ -59,18 +131,51 @@ Examples:
     # Person creation
     person_create_parser = person_subparsers.add_parser('create', help='Create a new person profile')
     person_create_parser.add_argument('name', help='Full name of the person')
+    person_create_parser.add_argument('--allow-similar', action='store_true',
+                                      help='Create the person even if the name looks like an existing one')
     person_create_parser.set_defaults(func=person_commands.create_person)
 
     # Add description to person
     person_add_desc_parser = person_subparsers.add_parser('add_desc', help='Add personality description to a person')
     person_add_desc_parser.add_argument('name', help='Name of the person')
     person_add_desc_parser.add_argument('description', help='Text description containing personality traits (e.g., "friendly, outgoing leader")')
+    person_add_desc_parser.add_argument('--decay-half-life', type=float, metavar='DAYS',
+                                        help='Half-life of the time-decayed sums this writes to '
+                                             '(default: the recorded one, else 180)')
     person_add_desc_parser.set_defaults(func=person_commands.add_description_to_person)
 
     # List persons
     person_list_parser = person_subparsers.add_parser('list', help='List all person profiles with their personality scores')
     person_list_parser.set_defaults(func=person_commands.list_persons)
 
+    # Bulk enrichment from a file of descriptions
+    person_enrich_parser = person_subparsers.add_parser('enrich', help='Apply a CSV/JSONL file of (person, description) rows in bulk')
+    person_enrich_parser.add_argument('path', help='File with person and description columns ("-" for stdin)')
+    person_enrich_parser.add_argument('--format', choices=lexicon.FORMATS, help='File format (default: inferred from extension)')
+    person_enrich_parser.add_argument('--workers', type=int, help='Processes used to analyze descriptions (default: CPU count)')
+    person_enrich_parser.add_argument('--create-missing', action='store_true', help='Create persons that do not exist yet')
+    person_enrich_parser.add_argument('--allow-similar', action='store_true',
+                                      help='With --create-missing, also create names that look like existing persons')
+    person_enrich_parser.add_argument('--write-behind', action='store_true', help='Group-commit personality updates through a write-behind buffer')
+    person_enrich_parser.add_argument('--decay-half-life', type=float, metavar='DAYS',
+                                      help='Half-life of the time-decayed sums this writes to '
+                                           '(default: the recorded one, else 180)')
+    person_enrich_parser.set_defaults(func=person_commands.enrich_persons)
+
+    # Merge near-duplicate names
+    person_dedupe_parser = person_subparsers.add_parser('dedupe', help='Merge persons stored under near-duplicate names')
+    person_dedupe_parser.add_argument('--dry-run', action='store_true', help='Only show which persons would be merged')
+    person_dedupe_parser.add_argument('--decay-half-life', type=float, metavar='DAYS',
+                                      help='Half-life of the time-decayed sums this writes to '
+                                           '(default: the recorded one, else 180)')
+    person_dedupe_parser.set_defaults(func=person_commands.dedupe_persons)
+
+    # Reverse matching: open roles that fit a person
+    person_roles_parser = person_subparsers.add_parser('roles', help='Find the open roles that fit a person best')
+    person_roles_parser.add_argument('name', help='Name of the person')
+    person_roles_parser.add_argument('--top', type=int, default=10, metavar='K', help='Number of roles to show (default: 10)')
+    person_roles_parser.set_defaults(func=person_commands.show_person_roles)
+
     # Company query command
     company_parser = subparsers.add_parser('company', help='Company operations')
     company_subparsers = company_parser.add_subparsers(title='company_commands', dest='company_command', help='Company sub-commands')
@@ -79,13 +184,143 @@ Examples:
     company_query_parser = company_subparsers.add_parser('query', help='Find candidates matching a job description')
     company_query_parser.add_argument('company_name', help='Name of the company or job position')
     company_query_parser.add_argument('company_description', help='Job description containing desired personality traits (e.g., "innovative, collaborative team player")')
+    company_query_parser.add_argument('--top', type=int, metavar='K',
+                                      help='Only show the K best matches (streams candidates with bounded memory)')
+    company_query_parser.add_argument('--decay-half-life', type=float, metavar='DAYS',
+                                      help='Rank by time-decayed personalities: observations lose half their '
+                                           'weight every DAYS days (must match the half-life the persons '
+                                           'were written with, see "person add_desc --decay-half-life")')
+    company_query_parser.add_argument('--decay-prior-weight', type=float, default=0.0, metavar='W',
+                                      help='With --decay-half-life, add W neutral observations to each '
+                                           'person, so persons not described for a while drift to neutral')
+    company_query_parser.add_argument('--all-tenants', action='store_true',
+                                      help="Rank candidates from every tenant's database, queried in parallel")
+    company_query_parser.add_argument('--percentile', action='store_true',
+                                      help="Show each match's rank among all candidates, e.g. 'top 3%%'")
     company_query_parser.set_defaults(func=company_commands.query_company_trait_match)
 
+    # Save a company profile with a maintained ranking
+    company_save_parser = company_subparsers.add_parser('save', help='Save a company profile and keep its candidate ranking up to date')
+    company_save_parser.add_argument('company_name', help='Name of the company or job position')
+    company_save_parser.add_argument('company_description', help='Job description containing desired personality traits')
+    company_save_parser.set_defaults(func=company_commands.save_company_profile)
+
+    # Read a saved profile's best matches
+    company_top_parser = company_subparsers.add_parser('top', help='Show the best matches of a saved company profile')
+    company_top_parser.add_argument('company_name', help='Name of the saved profile')
+    company_top_parser.add_argument('--top', type=int, default=10, metavar='K', help='Number of matches to show (default: 10)')
+    company_top_parser.add_argument('--percentile', action='store_true',
+                                    help="Show each match's rank among all ranked persons, e.g. 'top 3%%'")
+    company_top_parser.set_defaults(func=company_commands.show_company_top)
+
+    # List saved profiles
+    company_profiles_parser = company_subparsers.add_parser('profiles', help='List saved company profiles')
+    company_profiles_parser.set_defaults(func=company_commands.list_company_profiles)
+
+    # Delete a saved profile
+    company_delete_parser = company_subparsers.add_parser('delete', help='Delete a saved company profile')
+    company_delete_parser.add_argument('company_name', help='Name of the saved profile')
+    company_delete_parser.set_defaults(func=company_commands.delete_company_profile)
+
+    # Open roles, matched from the person's side with 'person roles'
+    company_add_role_parser = company_subparsers.add_parser('add-role', help='Store an open role for reverse matching')
+    company_add_role_parser.add_argument('role_name', help='Name of the role')
+    company_add_role_parser.add_argument('role_description', help='Role description containing desired personality traits')
+    company_add_role_parser.set_defaults(func=company_commands.add_role)
+
+    company_import_roles_parser = company_subparsers.add_parser('import-roles', help='Store open roles from a CSV/JSONL file of (role, description) rows')
+    company_import_roles_parser.add_argument('path', help='File with role and description columns ("-" for stdin)')
+    company_import_roles_parser.add_argument('--format', choices=lexicon.FORMATS, help='File format (default: inferred from extension)')
+    company_import_roles_parser.set_defaults(func=company_commands.import_roles)
+
+    company_roles_parser = company_subparsers.add_parser('roles', help='List open roles')
+    company_roles_parser.set_defaults(func=company_commands.list_roles)
+
+    company_delete_role_parser = company_subparsers.add_parser('delete-role', help='Delete an open role')
+    company_delete_role_parser.add_argument('role_name', help='Name of the role')
+    company_delete_role_parser.set_defaults(func=company_commands.delete_role)
+
+    # Analytics commands
+    analytics_parser = subparsers.add_parser('analytics', help='Population analytics')
+    analytics_subparsers = analytics_parser.add_subparsers(title='analytics_commands', dest='analytics_command', help='Analytics sub-commands')
+
+    # Cohorts
+    analytics_cohorts_parser = analytics_subparsers.add_parser('cohorts', help='Summarize the population as cohorts in the friendliness/dominance plane')
+    analytics_cohorts_parser.add_argument('--method', choices=analytics_service.METHODS, default='kmeans', help='k-means clusters or fixed grid cells (default: kmeans)')
+    analytics_cohorts_parser.add_argument('--clusters', '-k', type=int, default=analytics_service.DEFAULT_CLUSTERS, help=f'Number of k-means cohorts (default: {analytics_service.DEFAULT_CLUSTERS})')
+    analytics_cohorts_parser.add_argument('--cell-size', type=float, default=analytics_service.DEFAULT_CELL_SIZE, help=f'Side of the grid cells (default: {analytics_service.DEFAULT_CELL_SIZE})')
+    analytics_cohorts_parser.add_argument('--chunk-size', type=int, default=DEFAULT_ARRAY_CHUNK, help=f'Persons loaded per chunk (default: {DEFAULT_ARRAY_CHUNK})')
+    analytics_cohorts_parser.add_argument('--seed', type=int, help='Random seed for reproducible k-means cohorts')
+    analytics_cohorts_parser.set_defaults(func=analytics_commands.show_cohorts)
+
+    # Plot commands
+    plot_parser = subparsers.add_parser('plot', help='Render images of the stored data')
+    plot_subparsers = plot_parser.add_subparsers(title='plot_commands', dest='plot_command', help='Plot sub-commands')
+
+    # Population heatmap
+    plot_population_parser = plot_subparsers.add_parser('population', help='Render a density heatmap of all persons (requires matplotlib)')
+    plot_population_parser.add_argument('--output', '-o', default=plotting.DEFAULT_OUTPUT, help=f'PNG file to write (default: {plotting.DEFAULT_OUTPUT})')
+    plot_population_parser.add_argument('--bins', type=int, default=analytics_service.HISTOGRAM_BINS, help=f'Histogram bins per axis (default: {analytics_service.HISTOGRAM_BINS})')
+    plot_population_parser.add_argument('--target', metavar='DESCRIPTION', help='Overlay the target personality of a job description')
+    plot_population_parser.add_argument('--linear', action='store_true', help='Color bins by count instead of log count')
+    plot_population_parser.add_argument('--chunk-size', type=int, default=DEFAULT_ARRAY_CHUNK, help=f'Persons loaded per chunk (default: {DEFAULT_ARRAY_CHUNK})')
+    plot_population_parser.set_defaults(func=plot_commands.plot_population)
+
+    # Database maintenance commands
+    db_parser = subparsers.add_parser('db', help='Database maintenance operations')
+    db_subparsers = db_parser.add_subparsers(title='db_commands', dest='db_command', help='Database sub-commands')
+
+    # Online snapshot
+    db_snapshot_parser = db_subparsers.add_parser('snapshot', help='Back up a live database to a consistent snapshot file')
+    db_snapshot_parser.add_argument('database', choices=db_commands.DATABASES, help='Database to back up')
+    db_snapshot_parser.add_argument('output', help='Snapshot file to write (a .gz suffix enables compression)')
+    db_snapshot_parser.add_argument('--compress', action='store_true', help='Gzip the snapshot regardless of suffix')
+    db_snapshot_parser.add_argument('--no-checksum', action='store_true', help='Do not write a .sha256 file')
+    db_snapshot_parser.add_argument('--pages', type=int, default=backup.DEFAULT_PAGES_PER_STEP,
+                                    help='Pages copied per backup step for databases with a rollback journal')
+    db_snapshot_parser.set_defaults(func=db_commands.snapshot_database)
+
+    # Restore
+    db_restore_parser = db_subparsers.add_parser('restore', help='Restore a database from a snapshot')
+    db_restore_parser.add_argument('database', choices=db_commands.DATABASES, help='Database to restore')
+    db_restore_parser.add_argument('snapshot', help='Snapshot file (.gz snapshots are decompressed)')
+    db_restore_parser.add_argument('--require-checksum', action='store_true', help='Fail if no .sha256 file accompanies the snapshot')
+    db_restore_parser.add_argument('--pages', type=int, default=backup.DEFAULT_PAGES_PER_STEP, help='Pages copied per backup step')
+    db_restore_parser.set_defaults(func=db_commands.restore_database)
+
+    # Incremental replication
+    db_export_changes_parser = db_subparsers.add_parser('export-changes', help='Write the rows changed since a change number, for replay on another instance')
+    db_export_changes_parser.add_argument('database', choices=db_commands.DATABASES, help='Database to export from')
+    db_export_changes_parser.add_argument('output', help='Change file to write ("-" for stdout)')
+    db_export_changes_parser.add_argument('--since', type=int, default=0, metavar='SEQ', help='Export changes after this change number, as printed by the previous export (default: 0, everything)')
+    db_export_changes_parser.set_defaults(func=db_commands.export_changes)
+
+    db_apply_changes_parser = db_subparsers.add_parser('apply-changes', help='Replay a change file; applying it again is harmless')
+    db_apply_changes_parser.add_argument('database', choices=db_commands.DATABASES, help='Database to apply to')
+    db_apply_changes_parser.add_argument('input', help='Change file to read ("-" for stdin)')
+    db_apply_changes_parser.set_defaults(func=db_commands.apply_changes)
+
+    db_prune_changes_parser = db_subparsers.add_parser('prune-changes', help='Delete change log entries every replica has applied')
+    db_prune_changes_parser.add_argument('database', choices=db_commands.DATABASES, help='Database whose change log to trim')
+    db_prune_changes_parser.add_argument('--through', type=int, required=True, metavar='SEQ', help='Delete entries up to and including this change number')
+    db_prune_changes_parser.set_defaults(func=db_commands.prune_changes)
+
     args = parser.parse_args()
+    try:
+        db_connection.configure(concurrency=args.concurrency, slow_query_ms=args.slow_query_ms,
+                                tenant=args.tenant, db_dir=args.db_dir, profile=args.profile)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.query_stats and db_connection.get_slow_query_ms() is None:
+        # Collect aggregates without logging individual statements
+        db_connection.configure(slow_query_ms=float('inf'))
+    logging.basicConfig(format='%(levelname)s %(name)s: %(message)s')
 
     if args.command:
         if hasattr(args, 'func'):
             args.func(args)
+            if args.query_stats:
+                print(query_log.format_query_stats())
         else:
             print("Error: No valid subcommand provided.")
             parser.print_help()
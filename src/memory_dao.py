@@ -0,0 +1,761 @@
+"""
+In-memory storage backend module for the Personality Analysis System.
+
+This module implements the interfaces of base_dao without a database, for
+latency-critical matching: person coordinates, counts and decayed sums live in
+column-wise NumPy arrays indexed through a name -> row hash map, and traits, trait
+counts, co-occurrences, name keys, profiles and roles live in dictionaries. Reads
+never touch the disk, and ranking a saved profile is one vectorized pass over the
+coordinate array instead of a walk over a materialized ranking.
+
+PersonService, CompanyService and the other services run unchanged on these DAOs.
+Semantics follow the SQLite DAOs, with two differences:
+
+- Saved profiles keep no ranking table; ``get_top`` ranks the current coordinates
+  when asked, so rankings are always current without any work on person writes.
+- Data is durable only once snapshotted. ``MemoryBackend.snapshot`` copies the state
+  under the lock, which takes memory-bandwidth time, and encodes and writes it to a
+  temporary file outside the lock, replacing the previous snapshot atomically. With
+  ``snapshot_interval`` a background thread snapshots changed state periodically,
+  so request threads never wait for the disk; a crash loses the writes made since
+  the last snapshot.
+
+Each of the three DAOs is safe to use from several threads. A MemoryBackend gives
+them one shared lock, so a snapshot is consistent across persons, traits and
+profiles.
+
+This is unrelated to ``db_connection.MEMORY``, which keeps SQLite databases in memory
+for isolated test runs.
+
+Classes:
+    MemoryPersonDAO: In-memory implementation of BasePersonDAO.
+    MemoryTraitDAO: In-memory implementation of BaseTraitDAO.
+    MemoryCompanyDAO: In-memory implementation of BaseCompanyDAO.
+    MemoryBackend: The three DAOs of one store, with snapshots to and from disk.
+"""
+
+import atexit
+import json
+import os
+import threading
+import uuid
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+import numpy as np
+import decay as decay_model
+import lexicon
+import name_keys
+import personality_models
+from base_dao import (BaseCompanyDAO, BasePersonDAO, BaseTraitDAO, DEFAULT_ARRAY_CHUNK,
+                      SimilarPersonError)
+from company import Company
+
+# Constants
+SNAPSHOT_FORMAT = 'traits-memory-snapshot'
+SNAPSHOT_VERSION = 1
+INITIAL_CAPACITY = 1024
+_UPDATED_AT, _WEIGHT, _F_SUM, _D_SUM = range(4)
+
+
+def _new_generation() -> str:
+    return uuid.uuid4().hex
+
+
+class MemoryPersonDAO(BasePersonDAO):
+    """Persons in column-wise NumPy arrays, indexed by a name -> row hash map."""
+    def __init__(self, lock: Optional[threading.RLock] = None, label: Optional[str] = None):
+        """
+        Args:
+            lock: Lock guarding this DAO; a MemoryBackend shares one between its DAOs.
+            label: Unique name of the store, used as ``db_name`` for the index caches.
+        """
+        super().__init__(label or f'memory:{_new_generation()}')
+        self._lock = lock or threading.RLock()
+        self.changes = 0  # incremented on every write, for snapshot bookkeeping
+        self._company_dao = MemoryCompanyDAO(self, self._lock, self.db_name)
+        self._clear()
+
+    def _clear(self):
+        self._names: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._coordinates = np.zeros((INITIAL_CAPACITY, 2))       # friendliness, dominance
+        self._counts = np.zeros((INITIAL_CAPACITY, 2), dtype=np.int64)  # n_friendliness, n_dominance
+        self._decay = np.zeros((INITIAL_CAPACITY, 4))             # updated_at (NaN if None), weight, sums
+        self._traits: Dict[str, Counter] = {}                     # person -> trait -> observations
+        self._observers: Dict[str, Set[str]] = {}                 # trait -> persons, like person_traits' index
+        self._pairs: Dict[str, Counter] = {}                      # trait -> other -> descriptions
+        self._keys: Optional[Dict[str, Set[str]]] = None          # name key -> persons, built on first use
+        self._decay_half_life: Optional[float] = None             # like decay_meta
+
+    def create_tables(self):
+        """Nothing to create: the store exists with the DAO."""
+
+    def get_company_dao(self) -> 'MemoryCompanyDAO':
+        """Returns the company DAO that ranks this DAO's persons."""
+        return self._company_dao
+
+    def reset_database(self):
+        """Deletes all persons, their counts, and the saved profiles and roles."""
+        with self._lock:
+            self._clear()
+            self._company_dao._clear()
+            self.changes += 1
+
+    # Reads
+
+    def _person(self, row: int) -> Dict:
+        return {'person': self._names[row],
+                'friendliness': float(self._coordinates[row, 0]),
+                'dominance': float(self._coordinates[row, 1]),
+                'n_friendliness': int(self._counts[row, 0]),
+                'n_dominance': int(self._counts[row, 1])}
+
+    def get_all(self) -> List[Dict]:
+        """Retrieves all persons."""
+        with self._lock:
+            return [self._person(row) for row in range(len(self._names))]
+
+    def get_person(self, name: str) -> Optional[Dict]:
+        """Retrieves a single person by name, including their time-decayed sums."""
+        with self._lock:
+            row = self._rows.get(name)
+            if row is None:
+                return None
+            person = self._person(row)
+            updated_at, weight, f_sum, d_sum = self._decay[row].tolist()
+            person.update(decay_updated_at=None if np.isnan(updated_at) else updated_at,
+                          decay_weight=weight, decay_f_sum=f_sum, decay_d_sum=d_sum)
+            return person
+
+    def _copy_columns(self) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """Copies the current persons, so iterators read a consistent state without holding the lock."""
+        with self._lock:
+            size = len(self._names)
+            return (list(self._names), self._coordinates[:size].copy(), self._counts[:size].copy(),
+                    self._decay[:size].copy())
+
+    def iter_coordinates(self, batch_size: int = 1000) -> Iterator[Tuple[str, float, float]]:
+        """Streams (person, friendliness, dominance) rows."""
+        names, coordinates, _, _ = self._copy_columns()
+        yield from zip(names, coordinates[:, 0].tolist(), coordinates[:, 1].tolist())
+
+    def coordinate_summary(self) -> Dict:
+        """Returns the number of persons, how many are unobserved, and the bounds of the observed ones."""
+        _, coordinates, counts, _ = self._copy_columns()
+        observed = coordinates[counts.any(axis=1)]
+        bounds = ((float(observed[:, 0].min()), float(observed[:, 0].max()),
+                   float(observed[:, 1].min()), float(observed[:, 1].max()))
+                  if len(observed) else (None, None, None, None))
+        return dict(zip(('total', 'unobserved', 'min_friendliness', 'max_friendliness',
+                         'min_dominance', 'max_dominance'),
+                        (len(coordinates), len(coordinates) - len(observed), *bounds)))
+
+    def iter_coordinate_arrays(self, chunk_size: int = DEFAULT_ARRAY_CHUNK,
+                               observed_only: bool = True) -> Iterator[np.ndarray]:
+        """Streams (friendliness, dominance) coordinates as float arrays of shape (n, 2)."""
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        _, coordinates, counts, _ = self._copy_columns()
+        if observed_only:
+            coordinates = coordinates[counts.any(axis=1)]
+        for start in range(0, len(coordinates), chunk_size):
+            yield coordinates[start:start + chunk_size]
+
+    def iter_decay_batches(self, batch_size: int = 1000) -> Iterator[List[Tuple[str, Optional[float], float, float, float]]]:
+        """Streams batches of (person, decay_updated_at, decay_weight, decay_f_sum, decay_d_sum) rows."""
+        names, _, _, decay = self._copy_columns()
+        updated_at = [None if np.isnan(value) else value for value in decay[:, _UPDATED_AT].tolist()]
+        rows = list(zip(names, updated_at, *(decay[:, column].tolist() for column in (_WEIGHT, _F_SUM, _D_SUM))))
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+    def get_decay_half_life(self) -> Optional[float]:
+        """Returns the half-life the decayed sums are built with, or None before the first decayed write."""
+        with self._lock:
+            return self._decay_half_life
+
+    def record_decay_half_life(self, half_life_days: float):
+        """Records the half-life of decayed writes; raises ValueError if another one is recorded."""
+        with self._lock:
+            decay_model.check_recorded_half_life(self._decay_half_life, half_life_days)
+            if self._decay_half_life is None:
+                self._decay_half_life = float(half_life_days)
+                self.changes += 1
+
+    def get_trait_counts(self, name: str) -> Dict[str, int]:
+        """Returns how many times each trait has been observed for a person."""
+        with self._lock:
+            return dict(sorted(self._traits.get(name, {}).items()))
+
+    def get_cooccurring(self, trait: str, top: Optional[int] = None) -> Tuple[int, List[Tuple[str, int]]]:
+        """Returns how many descriptions named ``trait`` and the traits named with it most often."""
+        with self._lock:
+            partners = dict(self._pairs.get(trait, {}))
+        descriptions = partners.pop(trait, 0)
+        return descriptions, sorted(partners.items(), key=lambda pair: (-pair[1], pair[0]))[:top]
+
+    def get_top_pairs(self, top: Optional[int] = None) -> List[Tuple[str, str, int]]:
+        """Returns the (trait, other, descriptions) pairs named together most often, each pair once."""
+        with self._lock:
+            pairs = [(trait, other, count) for trait, partners in self._pairs.items()
+                     for other, count in partners.items() if trait < other]
+        return sorted(pairs, key=lambda pair: (-pair[2], pair[0], pair[1]))[:top]
+
+    # Writes
+
+    def _insert(self, name: str):
+        row = len(self._names)
+        if row == len(self._coordinates):
+            # Amortized O(1) appends: capacity doubles when full
+            self._coordinates = np.concatenate([self._coordinates, np.zeros_like(self._coordinates)])
+            self._counts = np.concatenate([self._counts, np.zeros_like(self._counts)])
+            self._decay = np.concatenate([self._decay, np.zeros_like(self._decay)])
+        self._names.append(name)
+        self._rows[name] = row
+        self._coordinates[row] = 0.0
+        self._counts[row] = 0
+        self._decay[row] = (np.nan, 0.0, 0.0, 0.0)
+        if self._keys is not None:
+            for key in name_keys.name_keys(name):
+                self._keys.setdefault(key, set()).add(name)
+
+    def _name_keys(self) -> Dict[str, Set[str]]:
+        """The name key index; built when first needed, so loading and pure matching never pay for it."""
+        if self._keys is None:
+            keys: Dict[str, Set[str]] = {}
+            for name in self._names:
+                for key in name_keys.name_keys(name):
+                    keys.setdefault(key, set()).add(name)
+            self._keys = keys
+        return self._keys
+
+    def _delete(self, name: str):
+        """Removes a person by moving the last row into its place."""
+        row, last = self._rows.pop(name), len(self._names) - 1
+        if row != last:
+            moved = self._names[last]
+            self._names[row] = moved
+            self._rows[moved] = row
+            self._coordinates[row] = self._coordinates[last]
+            self._counts[row] = self._counts[last]
+            self._decay[row] = self._decay[last]
+        self._names.pop()
+        for trait in self._traits.pop(name, {}):
+            self._observers[trait].discard(name)
+        if self._keys is not None:
+            for key in name_keys.name_keys(name):
+                self._keys[key].discard(name)
+                if not self._keys[key]:
+                    del self._keys[key]
+
+    def _similar_names(self, name: str) -> List[str]:
+        """Stored names that look like ``name``, found through its blocking keys."""
+        index, candidates = self._name_keys(), set()
+        for key in name_keys.name_keys(name):
+            candidates.update(index.get(key, ()))
+        candidates.discard(name)
+        return sorted(person for person in candidates if name_keys.is_similar(name, person))
+
+    def add_person(self, name: str, allow_similar: bool = False):
+        """Adds a new person with default personality values; see PersonDAO.add_person."""
+        name = self._validate_name(name)
+        with self._lock:
+            if name in self._rows:
+                raise ValueError(f"Person '{name}' already exists.")
+            similar = [] if allow_similar else self._similar_names(name)
+            if similar:
+                raise SimilarPersonError(name, similar)
+            self._insert(name)
+            self.changes += 1
+
+    def add_persons(self, names: Iterable[str], allow_similar: bool = False) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Adds persons, skipping existing names; see PersonDAO.add_persons."""
+        names = list(dict.fromkeys(self._validate_name(name) for name in names))
+        added, held_back = [], {}
+        with self._lock:
+            for name in names:
+                if name in self._rows:
+                    continue
+                similar = [] if allow_similar else self._similar_names(name)
+                if similar:
+                    held_back[name] = similar
+                    continue
+                self._insert(name)
+                added.append(name)
+            self.changes += 1
+        return added, held_back
+
+    def update_personalities(self, updates: Iterable[Tuple]):
+        """Applies (name, personality, n_friendliness, n_dominance[, decay[, traits[, pairs]]]) updates at once."""
+        updates = list(updates)
+        with self._lock:
+            for name, personality, n_friendliness, n_dominance, *rest in updates:
+                decay, traits, pairs = (list(rest) + [None, None, None])[:3]
+                for (trait, other), count in (pairs or {}).items():
+                    self._pairs.setdefault(trait, Counter())[other] += count
+                row = self._rows.get(name)
+                if row is None:
+                    # Like an UPDATE that matches no row
+                    continue
+                self._coordinates[row] = (personality.friendliness, personality.dominance)
+                self._counts[row] = (n_friendliness, n_dominance)
+                if decay is not None and decay.updated_at is not None:
+                    self._decay[row] = (decay.updated_at, decay.weight, decay.friendliness_sum,
+                                        decay.dominance_sum)
+                if traits:
+                    self._traits.setdefault(name, Counter()).update(traits)
+                    for trait in traits:
+                        self._observers.setdefault(trait, set()).add(name)
+            self.changes += 1
+
+    def modify_person(self, name: str, modify: Callable[[Dict], Tuple]):
+        """Reads a person and writes ``modify(person)`` back under the lock; see BasePersonDAO."""
+        with self._lock:
+            person = self.get_person(name)
+            if person is None:
+                raise ValueError(f"Person '{name}' not found.")
+            self.update_personalities([(name, *modify(person))])
+
+    def apply_trait_deltas(self, deltas: Dict[str, Tuple[float, float]]) -> int:
+        """
+        Moves every person who observed a changed trait by that trait's share of the change.
+
+        Same arithmetic as PersonDAO.apply_trait_deltas; the persons to shift come from
+        the trait -> persons map, so only affected rows are touched.
+        """
+        items = [(trait, float(df), float(dd)) for trait, (df, dd) in deltas.items() if df or dd]
+        with self._lock:
+            shifts: Dict[int, List[float]] = {}
+            for trait, df, dd in items:
+                for person in self._observers.get(trait, ()):
+                    observations = self._traits[person][trait]
+                    shift = shifts.setdefault(self._rows[person], [0.0, 0.0])
+                    shift[0] += observations * df
+                    shift[1] += observations * dd
+            rows = np.array([row for row in shifts if self._counts[row].all()], dtype=np.intp)
+            if not len(rows):
+                return 0
+            shift = np.array([shifts[row] for row in rows.tolist()]) / self._counts[rows]
+            self._coordinates[rows] += shift
+            self._decay[rows, _F_SUM] += self._decay[rows, _WEIGHT] * shift[:, 0]
+            self._decay[rows, _D_SUM] += self._decay[rows, _WEIGHT] * shift[:, 1]
+            self.changes += 1
+            return len(rows)
+
+    def find_duplicate_groups(self) -> List[List[str]]:
+        """Returns groups of stored names that likely belong to the same person; see PersonDAO."""
+        with self._lock:
+            blocks = [sorted(names) for names in self._name_keys().values() if len(names) > 1]
+        return self._group_similar(blocks)
+
+    def merge_persons(self, keep: str, duplicates: Sequence[str],
+                      half_life_days: float = decay_model.DEFAULT_HALF_LIFE_DAYS) -> Dict:
+        """Merges duplicate profiles into ``keep`` and deletes them; see PersonDAO.merge_persons."""
+        duplicates = [name for name in dict.fromkeys(duplicates) if name != keep]
+        names = [keep, *duplicates]
+        with self._lock:
+            missing = [name for name in names if name not in self._rows]
+            if missing:
+                raise ValueError(f"Person(s) not found: {', '.join(missing)}")
+            profiles = []
+            for name in names:
+                person = self.get_person(name)
+                profiles.append((person['friendliness'], person['dominance'], person['n_friendliness'],
+                                 person['n_dominance'], personality_models.DecayState(
+                                     person['decay_updated_at'], person['decay_weight'],
+                                     person['decay_f_sum'], person['decay_d_sum'])))
+            personality, n_friendliness, n_dominance, decay = self._merge_profiles(profiles, half_life_days)
+            traits = Counter()
+            for name in duplicates:
+                traits.update(self._traits.get(name, {}))
+                self._delete(name)
+            self.update_personalities([(keep, personality, n_friendliness, n_dominance, decay, traits)])
+            return self.get_person(keep)
+
+    # Snapshots
+
+    def _export(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        """Copies the state as JSON-ready metadata and arrays. Called with the lock held."""
+        size = len(self._names)
+        encoded = [name.encode('utf-8') for name in self._names]
+        trait_names = sorted(self._observers)
+        trait_ids = {trait: i for i, trait in enumerate(trait_names)}
+        observations = [(self._rows[person], trait_ids[trait], count)
+                        for person, traits in self._traits.items() for trait, count in traits.items()]
+        meta = {'traits_observed': trait_names,
+                'decay_half_life_days': self._decay_half_life,
+                'pairs': [[trait, other, count] for trait, partners in self._pairs.items()
+                          for other, count in partners.items()]}
+        arrays = {
+            'person_names': np.frombuffer(b''.join(encoded), dtype=np.uint8).copy(),
+            'person_name_ends': np.cumsum([len(name) for name in encoded], dtype=np.int64),
+            'person_coordinates': self._coordinates[:size].copy(),
+            'person_counts': self._counts[:size].copy(),
+            'person_decay': self._decay[:size].copy(),
+            'person_traits': np.array(observations, dtype=np.int64).reshape(-1, 3),
+        }
+        return meta, arrays
+
+    def _load(self, meta: Dict, arrays: Dict[str, np.ndarray]):
+        """Replaces the state with a snapshot's. Called with the lock held."""
+        self._clear()
+        blob, ends = arrays['person_names'].tobytes(), arrays['person_name_ends'].tolist()
+        for start, end in zip([0] + ends[:-1], ends):
+            self._insert(blob[start:end].decode('utf-8'))
+        size = len(self._names)
+        self._coordinates[:size] = arrays['person_coordinates']
+        self._counts[:size] = arrays['person_counts']
+        self._decay[:size] = arrays['person_decay']
+        trait_names = meta['traits_observed']
+        for row, trait_id, count in arrays['person_traits'].tolist():
+            person, trait = self._names[row], trait_names[trait_id]
+            self._traits.setdefault(person, Counter())[trait] = count
+            self._observers.setdefault(trait, set()).add(person)
+        for trait, other, count in meta['pairs']:
+            self._pairs.setdefault(trait, Counter())[other] = count
+        self._decay_half_life = meta.get('decay_half_life_days')
+
+
+class MemoryTraitDAO(BaseTraitDAO):
+    """The trait lexicon in a dictionary."""
+    def __init__(self, lock: Optional[threading.RLock] = None, label: Optional[str] = None):
+        super().__init__(label or f'memory:{_new_generation()}')
+        self._lock = lock or threading.RLock()
+        self.changes = 0
+        self._traits: Dict[str, personality_models.Personality] = {}
+        self._generation = _new_generation()
+
+    def create_tables(self):
+        """Nothing to create: the store exists with the DAO."""
+
+    def get_all(self) -> Dict[str, personality_models.Personality]:
+        """Retrieves all traits as a dictionary keyed by trait name."""
+        with self._lock:
+            return dict(self._traits)
+
+    def get_trait(self, name: str) -> Optional[personality_models.Personality]:
+        """Retrieves a single trait by name."""
+        with self._lock:
+            return self._traits.get(name)
+
+    def add_trait(self, name: str, personality: personality_models.Personality):
+        """Adds a new trait."""
+        name = self._validate_trait(name, personality)
+        with self._lock:
+            if name in self._traits:
+                raise ValueError(f"Trait '{name}' already exists.")
+            self._traits[name] = personality_models.Personality(personality.friendliness, personality.dominance)
+            self.changes += 1
+
+    def update_trait(self, name: str,
+                     personality: personality_models.Personality) -> Optional[personality_models.Personality]:
+        """Updates an existing trait and returns its previous coordinates, or None if it does not exist."""
+        with self._lock:
+            previous = self._traits.get(name)
+            if previous is not None:
+                self._traits[name] = personality_models.Personality(personality.friendliness,
+                                                                    personality.dominance)
+                self.changes += 1
+            return previous
+
+    def add_traits(self, rows: Iterable[Tuple[str, float, float]]):
+        """Adds (trait, friendliness, dominance) rows, skipping existing traits."""
+        rows = list(rows)
+        with self._lock:
+            for name, friendliness, dominance in rows:
+                self._traits.setdefault(name, personality_models.Personality(friendliness, dominance))
+            self.changes += 1
+
+    def import_traits(self, traits: Dict[str, personality_models.Personality],
+                      prune: bool = False, dry_run: bool = False) -> lexicon.LexiconDiff:
+        """Upserts a whole lexicon at once and returns what changed; see TraitDAO.import_traits."""
+        with self._lock:
+            diff = lexicon.diff_lexicon(self._traits, traits)
+            if dry_run:
+                return diff
+            for name in diff.added + diff.changed:
+                self._traits[name] = traits[name]
+            if prune:
+                for name in diff.removed:
+                    del self._traits[name]
+            self.changes += 1
+            return diff
+
+    def iter_traits(self, batch_size: int = 1000) -> Iterator[Tuple[str, float, float]]:
+        """Streams (trait, friendliness, dominance) rows ordered by name."""
+        with self._lock:
+            rows = sorted((name, trait.friendliness, trait.dominance) for name, trait in self._traits.items())
+        yield from rows
+
+    def get_lexicon_version(self) -> Tuple[str, int]:
+        """Returns a (generation, version) pair that changes whenever any trait is written."""
+        with self._lock:
+            return self._generation, self.changes
+
+    def reset_database(self):
+        """Deletes all traits."""
+        with self._lock:
+            self._traits.clear()
+            self._generation = _new_generation()
+            self.changes += 1
+
+    def _export(self) -> Dict:
+        return {'traits': [[name, trait.friendliness, trait.dominance] for name, trait in self._traits.items()]}
+
+    def _load(self, meta: Dict):
+        self._traits = {name: personality_models.Personality(friendliness, dominance)
+                        for name, friendliness, dominance in meta['traits']}
+        self._generation = _new_generation()
+
+
+class MemoryCompanyDAO(BaseCompanyDAO):
+    """Saved profiles and open roles in dictionaries, ranked against a MemoryPersonDAO's arrays."""
+    def __init__(self, person_dao: MemoryPersonDAO, lock: threading.RLock, label: str):
+        super().__init__(label)
+        self._person_dao = person_dao
+        self._lock = lock
+        self._clear()
+
+    def _clear(self):
+        self._profiles: Dict[str, Company] = {}
+        self._roles: Dict[str, Company] = {}
+        self._roles_generation = _new_generation()
+        self._roles_version = 0
+
+    def create_tables(self):
+        """Nothing to create: the store exists with the DAO."""
+
+    def get_all(self) -> List[Company]:
+        """Retrieves all saved profiles ordered by name."""
+        with self._lock:
+            return [self._profiles[name] for name in sorted(self._profiles)]
+
+    def get_profile(self, name: str) -> Optional[Company]:
+        """Retrieves a single saved profile by name."""
+        with self._lock:
+            return self._profiles.get(name)
+
+    def save_profile(self, company: Company):
+        """Creates or replaces a profile. Its ranking is computed when read, so it is always current."""
+        self._check_target(company)
+        with self._lock:
+            self._profiles[company.name] = company
+            self._person_dao.changes += 1
+
+    def delete_profile(self, name: str) -> bool:
+        """Deletes a profile. Returns False if it did not exist."""
+        with self._lock:
+            self._person_dao.changes += 1
+            return self._profiles.pop(name, None) is not None
+
+    def get_top(self, name: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Returns the k best (person, distance) pairs of a saved profile, ties broken by name.
+
+        Squared distances to every person are computed in one vectorized pass and the
+        k smallest are selected with a partial sort, so the cost is O(n + k log k).
+        """
+        with self._lock:
+            profile = self._profiles.get(name)
+            names = self._person_dao._names
+            if profile is None or k < 1 or not names:
+                return []
+            target = profile.target
+            coordinates = self._person_dao._coordinates[:len(names)]
+            distance_sq = ((coordinates[:, 0] - target.friendliness) ** 2
+                           + (coordinates[:, 1] - target.dominance) ** 2)
+            k = min(k, len(names))
+            kth = np.partition(distance_sq, k - 1)[k - 1]
+            # Every person tied with the k-th, so ties are broken by name as in SQL
+            rows = np.flatnonzero(distance_sq <= kth)
+            candidates = sorted(zip(distance_sq[rows].tolist(), (names[row] for row in rows.tolist())))
+        return [(person, float(np.sqrt(value))) for value, person in candidates[:k]]
+
+    def count_ranked(self, name: str) -> int:
+        """Returns the number of persons in a saved profile's ranking."""
+        with self._lock:
+            return len(self._person_dao._names) if name in self._profiles else 0
+
+    def save_roles(self, roles: Iterable[Company]) -> int:
+        """Creates or replaces roles at once. Returns the number written."""
+        roles = list(roles)
+        for role in roles:
+            self._check_target(role, 'Role')
+        with self._lock:
+            for role in roles:
+                self._roles[role.name] = role
+            self._roles_version += 1
+            self._person_dao.changes += 1
+        return len(roles)
+
+    def delete_role(self, name: str) -> bool:
+        """Deletes a role. Returns False if it did not exist."""
+        with self._lock:
+            if self._roles.pop(name, None) is None:
+                return False
+            self._roles_version += 1
+            self._person_dao.changes += 1
+            return True
+
+    def get_roles(self) -> List[Company]:
+        """Retrieves all roles ordered by name."""
+        with self._lock:
+            return [self._roles[name] for name in sorted(self._roles)]
+
+    def iter_role_targets(self, batch_size: int = 1000) -> Iterator[Tuple[str, float, float]]:
+        """Streams (role, friendliness, dominance) rows."""
+        with self._lock:
+            rows = [(role.name, role.target.friendliness, role.target.dominance) for role in self._roles.values()]
+        yield from rows
+
+    def get_roles_version(self) -> Tuple[str, int]:
+        """Returns a (generation, version) pair that changes whenever any role is written."""
+        with self._lock:
+            return self._roles_generation, self._roles_version
+
+    def _export(self) -> Dict:
+        def rows(companies: Dict[str, Company]) -> List:
+            return [[c.name, c.description, c.target.friendliness, c.target.dominance] for c in companies.values()]
+        return {'profiles': rows(self._profiles), 'roles': rows(self._roles)}
+
+    def _load(self, meta: Dict):
+        self._clear()
+        for key, target in (('profiles', self._profiles), ('roles', self._roles)):
+            for name, description, friendliness, dominance in meta[key]:
+                target[name] = Company(name, description, personality_models.Personality(friendliness, dominance))
+
+
+class MemoryBackend:
+    """
+    One in-memory store: a person, trait and company DAO sharing a lock, with snapshots.
+
+    Pass ``backend.persons``, ``backend.traits`` and ``backend.companies`` wherever the
+    SQLite DAOs are used, e.g. ``CompanyService(backend.persons, backend.traits)``.
+    """
+    def __init__(self, snapshot_path: Optional[str] = None, snapshot_interval: Optional[float] = None):
+        """
+        Initializes the store, loading ``snapshot_path`` if it exists.
+
+        Args:
+            snapshot_path: Default file for snapshot() and close().
+            snapshot_interval: If given, changed state is snapshotted to ``snapshot_path``
+                every this many seconds by a background thread.
+        """
+        if snapshot_interval is not None:
+            if snapshot_path is None:
+                raise ValueError("snapshot_interval requires a snapshot_path")
+            if snapshot_interval <= 0:
+                raise ValueError("snapshot_interval must be positive")
+        label = f'memory:{_new_generation()}'
+        self._lock = threading.RLock()
+        self.persons = MemoryPersonDAO(self._lock, label)
+        self.traits = MemoryTraitDAO(self._lock, label)
+        self.companies = self.persons.get_company_dao()
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.last_error: Optional[Exception] = None
+        self._snapshotted_changes = self._changes()
+        self._write_lock = threading.Lock()  # one snapshot file write at a time
+        self._stop = threading.Event()
+        self._closed = False
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+        self._snapshotter = None
+        if snapshot_interval is not None:
+            self._snapshotter = threading.Thread(target=self._run_snapshotter, name='memory-snapshots',
+                                                 daemon=True)
+            self._snapshotter.start()
+        atexit.register(self.close)
+
+    def __enter__(self) -> 'MemoryBackend':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _changes(self) -> int:
+        return self.persons.changes + self.traits.changes
+
+    def snapshot(self, path: Optional[str] = None) -> str:
+        """
+        Writes the whole store to a snapshot file and returns its path.
+
+        The lock is held only while the state is copied; encoding and writing happen
+        outside it. The file is written next to its destination and renamed over it,
+        so a crash never leaves a partial snapshot behind.
+        """
+        path = path or self.snapshot_path
+        if path is None:
+            raise ValueError("No snapshot path given")
+        with self._lock:
+            changes = self._changes()
+            person_meta, arrays = self.persons._export()
+            meta = {'format': SNAPSHOT_FORMAT, 'version': SNAPSHOT_VERSION,
+                    **person_meta, **self.traits._export(), **self.companies._export()}
+        arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = os.path.join(directory, f'.{os.path.basename(path)}.{uuid.uuid4().hex}.tmp')
+        with self._write_lock:
+            try:
+                with open(temporary, 'wb') as handle:
+                    np.savez(handle, **arrays)
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                os.replace(temporary, path)
+            finally:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+        if path == self.snapshot_path:
+            self._snapshotted_changes = max(self._snapshotted_changes, changes)
+        return path
+
+    def load(self, path: str):
+        """
+        Replaces the whole store with a snapshot's contents.
+
+        Raises:
+            ValueError: If the file is not a snapshot of a supported version.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        try:
+            meta = json.loads(arrays.pop('meta').tobytes().decode('utf-8'))
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Not a memory snapshot: {e}")
+        if meta.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError("Not a memory snapshot: missing header")
+        if meta.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported memory snapshot version {meta.get('version')}")
+        with self._lock:
+            self.persons._load(meta, arrays)
+            self.traits._load(meta)
+            self.companies._load(meta)
+            # The indexes cached under this store's label must be rebuilt
+            self.persons.changes += 1
+            self.traits.changes += 1
+            self._snapshotted_changes = self._changes()
+
+    def close(self):
+        """Stops background snapshots and writes a last one if anything changed."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+        atexit.unregister(self.close)
+        if self.snapshot_path is not None and self._changes() != self._snapshotted_changes:
+            self.snapshot()
+
+    def _run_snapshotter(self):
+        while not self._stop.wait(self.snapshot_interval):
+            if self._changes() == self._snapshotted_changes:
+                continue
+            try:
+                self.snapshot()
+                self.last_error = None
+            except Exception as e:
+                # The state stays in memory; the next interval retries
+                self.last_error = e
+                print(f"Warning: memory snapshot failed, will retry: {e}")
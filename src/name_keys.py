@@ -0,0 +1,92 @@
+"""
+Name blocking keys module for the Personality Analysis System.
+
+This module finds likely duplicate person names, such as "Jon Doe" and "John  Doe",
+without comparing a name against every stored one. Each name is reduced to a few
+blocking keys, which the persons database indexes (``person_name_keys``):
+
+- ``n:`` the normalized name: accents, case, punctuation, spacing and word order removed
+- ``p:`` the phonetic name: the Soundex code of every word, in sorted order (words
+  with digits or without Latin letters are kept as they are)
+
+Names that share a key form a small block, so the candidates for a new name are found
+with one index lookup per key. Only candidates are then compared exactly: names match
+when their normalized forms are equal or within the edit distance that
+``fuzzy_index`` tolerates for words of that length.
+
+Functions:
+    normalize_name: Reduces a name to lowercase ASCII words in sorted order.
+    soundex: American Soundex code of a word.
+    name_keys: Blocking keys of a name.
+    is_similar: Whether two names are likely the same person.
+    is_similar_normalized: is_similar for names that are already normalized.
+"""
+
+import unicodedata
+from typing import List
+import fuzzy_index
+
+# Constants
+NORMALIZED_PREFIX = 'n:'
+PHONETIC_PREFIX = 'p:'
+SOUNDEX_LENGTH = 4
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'), **dict.fromkeys('dt', '3'),
+    'l': '4', **dict.fromkeys('mn', '5'), 'r': '6',
+}
+
+
+def normalize_name(name: str) -> str:
+    """Reduces a name to lowercase words without accents or punctuation, sorted, e.g. 'Doe, Jöhn' -> 'doe john'."""
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    words = (''.join(char for char in token if char.isalnum()) for token in fuzzy_index.tokenize(stripped))
+    return ' '.join(sorted(word for word in words if word))
+
+
+def soundex(word: str) -> str:
+    """Returns the American Soundex code of a word, e.g. 'john' -> 'J500', or '' if it has no letters a-z."""
+    letters = [char for char in word.lower() if 'a' <= char <= 'z']
+    if not letters:
+        return ''
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0])
+    for char in letters[1:]:
+        digit = _SOUNDEX_CODES.get(char)
+        if digit and digit != previous:
+            code += digit
+            if len(code) == SOUNDEX_LENGTH:
+                break
+        # h and w do not separate letters with the same code; vowels do
+        if char not in 'hw':
+            previous = digit
+    return code.ljust(SOUNDEX_LENGTH, '0')
+
+
+def name_keys(name: str) -> List[str]:
+    """Returns the blocking keys of a name; empty if it has no letters or digits."""
+    normalized = normalize_name(name)
+    if not normalized:
+        return []
+    keys = [NORMALIZED_PREFIX + normalized]
+    # Words with digits keep their spelling, so 'P001' and 'P002' do not share a block
+    codes = [(soundex(word) if word.isalpha() else '') or word for word in normalized.split(' ')]
+    keys.append(PHONETIC_PREFIX + ' '.join(sorted(codes)))
+    return keys
+
+
+def is_similar(a: str, b: str) -> bool:
+    """Whether two names are likely the same person: equal once normalized, or a small typo apart."""
+    return is_similar_normalized(normalize_name(a), normalize_name(b))
+
+
+def is_similar_normalized(a: str, b: str) -> bool:
+    """is_similar for names already reduced by normalize_name."""
+    if not a or not b:
+        return False
+    if a == b:
+        return True
+    a, b = a.replace(' ', ''), b.replace(' ', '')
+    limit = fuzzy_index.allowed_distance(min(a, b, key=len))
+    return limit > 0 and fuzzy_index.edit_distance(a, b, limit) <= limit
@@ -9,12 +9,22 @@ Functions:
     create_person: Handles the 'person create' command to create new person profiles.
     add_description_to_person: Handles the 'person add_desc' command to update personality traits.
     list_persons: Handles the 'person list' command to display all person profiles.
+    enrich_persons: Handles the 'person enrich' command to apply a file of descriptions in bulk.
+    show_person_roles: Handles the 'person roles' command to find the open roles that fit a person best.
+    dedupe_persons: Handles the 'person dedupe' command to merge persons stored under near-duplicate names.
+    read_description_rows: Reads (name, description) pairs from a CSV or JSONL file.
 """
 
-from typing import Any
-from person_dao import PersonDAO
+import csv
+import json
+import sys
+from typing import Any, List, Tuple
+from person_dao import PersonDAO, SimilarPersonError
 from trait_dao import TraitDAO
+from services.company_service import CompanyService
 from services.person_service import PersonService
+from write_buffer import BufferedPersonDAO
+import lexicon
 
 def create_person(args: Any) -> None:
     """Handles the 'person create' command."""
@@ -25,12 +35,15 @@ def create_person(args: Any) -> None:
 
     # DAO instantiation happens here for now
     person_dao = PersonDAO()
-    # Table creation might be better handled centrally
+    # Schema check is cached per process; migrations only run when the version is behind
     person_dao.create_tables()
     try:
         # Basic validation might occur in DAO or service later
-        person_dao.add_person(args.name.strip())
+        person_dao.add_person(args.name.strip(), allow_similar=args.allow_similar)
         print(f"Person '{args.name}' created successfully.")
+    except SimilarPersonError as e:
+        print(f"Error creating person '{args.name}': {str(e)}")
+        print("Use --allow-similar to create it anyway.")
     except Exception as e:  # Catch potential DB errors (e.g., UNIQUE constraint)
         print(f"Error creating person '{args.name}': {str(e)}")
 
@@ -47,7 +60,7 @@ def add_description_to_person(args: Any) -> None:
     # Instantiate DAOs and Service
     person_dao = PersonDAO()
     trait_dao = TraitDAO()
-    person_service = PersonService(person_dao, trait_dao)
+    person_service = PersonService(person_dao, trait_dao, getattr(args, 'decay_half_life', None))
 
     try:
         # Use the service layer for proper business logic handling
@@ -75,8 +88,118 @@ def list_persons(args: Any) -> None:
                 # Handle missing personality data gracefully
                 friendliness = person.get('friendliness', 0.0)
                 dominance = person.get('dominance', 0.0)
-                print(f"- {person['name']} (F:{friendliness:.2f}, D:{dominance:.2f})")
+                print(f"- {person['person']} (F:{friendliness:.2f}, D:{dominance:.2f})")
         else:
             print("No persons found.")
     except Exception as e:
-        print(f"Error listing persons: {str(e)}")
\ No newline at end of file
+        print(f"Error listing persons: {str(e)}")
+
+
+def read_description_rows(path: str, fmt: str) -> List[Tuple[str, str]]:
+    """Reads (person or role, description) pairs from a CSV or JSONL file ("-" for stdin)."""
+    handle = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        rows = []
+        if fmt == 'csv':
+            for line_number, row in enumerate(csv.reader(handle), start=1):
+                if not row:
+                    continue
+                if line_number == 1 and [cell.strip().lower() for cell in row] in (['person', 'description'],
+                                                                                     ['name', 'description'],
+                                                                                     ['role', 'description']):
+                    continue
+                if len(row) != 2:
+                    raise ValueError(f"Line {line_number}: expected 2 columns, got {len(row)}")
+                if not row[0].strip():
+                    raise ValueError(f"Line {line_number}: missing person name")
+                rows.append((row[0], row[1]))
+        else:
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    name = record.get('person', record.get('name', record.get('role')))
+                    description = record['description']
+                except (json.JSONDecodeError, KeyError, AttributeError) as e:
+                    raise ValueError(f"Line {line_number}: invalid record ({e})")
+                if not isinstance(name, str) or not name.strip():
+                    raise ValueError(f"Line {line_number}: missing person name")
+                rows.append((name, description))
+        return rows
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def enrich_persons(args: Any) -> None:
+    """Handles the 'person enrich' command."""
+    try:
+        rows = read_description_rows(args.path, lexicon.detect_format(args.path, args.format))
+    except (OSError, ValueError) as e:
+        print(f"Error reading descriptions from '{args.path}': {str(e)}")
+        return
+
+    person_dao = PersonDAO()
+    person_dao.create_tables()
+    try:
+        if args.create_missing:
+            names = [name.strip() for name, _ in rows]
+            _, held_back = person_dao.add_persons(names, allow_similar=args.allow_similar)
+            if held_back:
+                print("Not created, similar to existing persons (use --allow-similar to create them):")
+                for name, matches in held_back.items():
+                    print(f"- {name} ~ {', '.join(matches)}")
+
+        half_life = getattr(args, 'decay_half_life', None)
+        if args.write_behind:
+            with BufferedPersonDAO(person_dao) as buffered_dao:
+                results = PersonService(buffered_dao, TraitDAO(), half_life).add_descriptions(
+                    rows, workers=args.workers)
+        else:
+            results = PersonService(person_dao, TraitDAO(), half_life).add_descriptions(rows, workers=args.workers)
+    except Exception as e:
+        print(f"An unexpected error occurred during enrichment: {str(e)}")
+        return
+
+    failures = [(name, outcome) for name, outcome in results if isinstance(outcome, Exception)]
+    print(f"Processed {len(results)} descriptions: {len(results) - len(failures)} applied, {len(failures)} failed.")
+    for name, error in failures:
+        print(f"- {name}: {error}")
+
+
+def dedupe_persons(args: Any) -> None:
+    """Handles the 'person dedupe' command."""
+    person_dao = PersonDAO()
+    person_dao.create_tables()
+    try:
+        plan = PersonService(person_dao, TraitDAO(), getattr(args, 'decay_half_life', None)
+                             ).dedupe(dry_run=args.dry_run)
+    except Exception as e:
+        print(f"An unexpected error occurred while merging duplicates: {str(e)}")
+        return
+    if not plan:
+        print("No near-duplicate names found.")
+        return
+    merged = sum(len(duplicates) for _, duplicates in plan)
+    print(f"{'Would merge' if args.dry_run else 'Merged'} {merged} person(s) into {len(plan)}:")
+    for keep, duplicates in plan:
+        print(f"- {keep} <- {', '.join(duplicates)}")
+
+
+def show_person_roles(args: Any) -> None:
+    """Handles the 'person roles' command."""
+    company_service = CompanyService(PersonDAO(), TraitDAO())
+    try:
+        company_service.person_dao.create_tables()
+        roles = company_service.find_roles_for_person(args.name.strip(), args.top)
+        if not roles:
+            print("No open roles found. Add some with 'company add-role' or 'company import-roles'.")
+            return
+        print(f"\nOpen roles ranked by personality fit for '{args.name}':")
+        for role_name, distance in roles:
+            print(f"- {role_name}, Distance: {distance:.2f}")
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+    except Exception as e:
+        print(f"An unexpected error occurred while matching roles: {str(e)}")
@@ -2,119 +2,497 @@
 Person Data Access Object (DAO) module for the Personality Analysis System.
 
 This module provides database access operations for person-related data, including
-CRUD operations and database schema management. It implements the Data Access Object
-pattern with a base DAO class for common functionality.
+CRUD operations and database schema management. It implements the SQLite backend of
+the person interface defined in base_dao.
 
 Classes:
-    BaseDAO: Abstract base class defining the interface for all DAO operations.
-    PersonDAO: Concrete implementation for person database operations.
+    PersonDAO: SQLite implementation of BasePersonDAO.
+
+Functions:
+    cooccurrences: Counts the trait pairs named together by one description.
 """
 
 import sqlite3
-from abc import ABC, abstractmethod
-from typing import Tuple, List, Dict, Optional
+from collections import Counter
+from typing import Callable, Tuple, List, Dict, Optional, Iterable, Iterator, Sequence
+import numpy as np
+import decay as decay_model
 import personality_models
 import db_connection
+import name_keys
+import schema
+from base_dao import (BasePersonDAO, DEFAULT_ARRAY_CHUNK, SimilarPersonError,  # noqa: F401 (re-exported)
+                      TraitPairCounts)
+from company_dao import CompanyDAO
 
 # Constants
 DB_TIMEOUT = 5
+NAME_QUEUE_BATCH = 10_000
+# Persons that have had at least one trait applied
+_OBSERVED = '(n_friendliness > 0 OR n_dominance > 0)'
 
+# Decay columns are only written when a DecayState is given
+_UPDATE_PERSON_SQL = '''
+    UPDATE persons
+    SET friendliness=?, dominance=?, n_friendliness=?, n_dominance=?,
+        decay_updated_at=COALESCE(?, decay_updated_at),
+        decay_weight=COALESCE(?, decay_weight),
+        decay_f_sum=COALESCE(?, decay_f_sum),
+        decay_d_sum=COALESCE(?, decay_d_sum)
+    WHERE person=?
+'''
 
-class BaseDAO(ABC):
-    """Abstract base class for Database Access Objects."""
-    def __init__(self, db_name: str):
-        self.db_name = db_name
+_ADD_TRAIT_OBSERVATIONS_SQL = '''
+    INSERT INTO person_traits (person, trait, observations) VALUES (?, ?, ?)
+    ON CONFLICT(person, trait) DO UPDATE SET observations = observations + excluded.observations
+'''
+
+_ADD_TRAIT_PAIRS_SQL = '''
+    INSERT INTO trait_pairs (trait, other, descriptions) VALUES (?, ?, ?)
+    ON CONFLICT(trait, other) DO UPDATE SET descriptions = descriptions + excluded.descriptions
+'''
+
+def cooccurrences(traits: Iterable[str]) -> TraitPairCounts:
+    """
+    Counts the trait pairs named together by one description, for ``trait_pairs``.
+
+    Every ordered pair of distinct traits counts once, and so does every (t, t), which
+    counts the description itself. Counts of several descriptions can be added up.
+    """
+    names = sorted(set(traits))
+    return Counter((trait, other) for trait in names for other in names)
+
+
+def _index_queued_names(cursor) -> int:
+    """Adds blocking keys for every queued name (see schema migration 9). Returns how many."""
+    indexed = 0
+    while True:
+        cursor.execute('SELECT person FROM person_name_queue LIMIT ?', (NAME_QUEUE_BATCH,))
+        names = [row[0] for row in cursor.fetchall()]
+        if not names:
+            return indexed
+        cursor.executemany('INSERT OR IGNORE INTO person_name_keys (key, person) VALUES (?, ?)',
+                           [(key, name) for name in names for key in name_keys.name_keys(name)])
+        cursor.executemany('DELETE FROM person_name_queue WHERE person = ?', [(name,) for name in names])
+        indexed += len(names)
+
+
+def _select_person(cursor, name: str) -> Optional[Dict]:
+    """The persons row of ``name`` with its decayed sums, as a dict, or None."""
+    cursor.execute('''
+        SELECT person, friendliness, dominance, n_friendliness, n_dominance,
+               decay_updated_at, decay_weight, decay_f_sum, decay_d_sum
+        FROM persons WHERE person=?
+    ''', (name,))
+    row = cursor.fetchone()
+    if row:
+        columns = [description[0] for description in cursor.description]
+        return dict(zip(columns, row))
+    return None
 
-    @abstractmethod
-    def create_tables(self):
-        pass
 
-    @abstractmethod
-    def get_all(self):
-        pass
+def _similar_names(cursor, name: str) -> List[str]:
+    """Stored names that look like ``name``, found through its blocking keys."""
+    keys = name_keys.name_keys(name)
+    if not keys:
+        return []
+    cursor.execute(f'''
+        SELECT DISTINCT person FROM person_name_keys
+        WHERE key IN ({', '.join('?' * len(keys))}) AND person != ?
+    ''', (*keys, name))
+    return sorted(person for (person,) in cursor.fetchall() if name_keys.is_similar(name, person))
 
-class PersonDAO(BaseDAO):
-    """Data Access Object for Person-related database operations."""
-    def __init__(self):
-        super().__init__('persons.db')
-        # Removed TraitDAO import and instantiation
+
+class PersonDAO(BasePersonDAO):
+    """Data Access Object for Person-related database operations, stored in SQLite."""
+    def __init__(self, db_name: Optional[str] = None, tenant: Optional[str] = None):
+        """
+        Args:
+            db_name: Explicit database path. Defaults to the persons database of
+                ``tenant``, or of the configured tenant (see db_connection.resolve_db_path).
+            tenant: Tenant whose persons database to use when db_name is not given.
+        """
+        super().__init__(db_name or db_connection.resolve_db_path('persons.db', tenant))
 
     def create_tables(self):
-        """Creates the persons table and indexes if they don't exist."""
-        with db_connection.DatabaseConnection(self.db_name) as (conn, cursor):
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS persons (
-                    person TEXT PRIMARY KEY,
-                    friendliness REAL DEFAULT 0.0,
-                    dominance REAL DEFAULT 0.0,
-                    n_friendliness INTEGER DEFAULT 0,
-                    n_dominance INTEGER DEFAULT 0
-                )
-            ''')
-            # Add indexes for better query performance
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_friendliness ON persons(friendliness)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_dominance ON persons(dominance)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_person_name ON persons(person)')
-            conn.commit()
+        """Ensures the persons schema is current (checked once per process)."""
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+
+    def _connect(self) -> db_connection.DatabaseConnection:
+        """Opens a read connection, migrating the schema first if it is out of date."""
+        self.create_tables()
+        return db_connection.DatabaseConnection(self.db_name)
+
+    def _write(self, op):
+        """Runs ``op`` through db_connection.run_write once the schema is current."""
+        self.create_tables()
+        return db_connection.run_write(self.db_name, op)
 
     def get_all(self) -> List[Dict]:
         """Retrieves all persons from the database."""
-        with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
+        with self._connect() as (_, cursor):
             cursor.execute('SELECT person, friendliness, dominance, n_friendliness, n_dominance FROM persons')
             columns = [description[0] for description in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
+    def iter_coordinates(self, batch_size: int = 1000) -> Iterator[Tuple[str, float, float]]:
+        """Streams (person, friendliness, dominance) rows without materializing the table."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT person, friendliness, dominance FROM persons')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def coordinate_summary(self) -> Dict:
+        """Returns the number of persons, how many are unobserved, and the bounds of the observed ones."""
+        with self._connect() as (_, cursor):
+            cursor.execute(f'''
+                SELECT COUNT(*), COALESCE(SUM(NOT {_OBSERVED}), 0),
+                       MIN(CASE WHEN {_OBSERVED} THEN friendliness END),
+                       MAX(CASE WHEN {_OBSERVED} THEN friendliness END),
+                       MIN(CASE WHEN {_OBSERVED} THEN dominance END),
+                       MAX(CASE WHEN {_OBSERVED} THEN dominance END)
+                FROM persons
+            ''')
+            columns = ('total', 'unobserved', 'min_friendliness', 'max_friendliness',
+                       'min_dominance', 'max_dominance')
+            return dict(zip(columns, cursor.fetchone()))
+
+    def iter_coordinate_arrays(self, chunk_size: int = DEFAULT_ARRAY_CHUNK,
+                               observed_only: bool = True) -> Iterator[np.ndarray]:
+        """
+        Streams (friendliness, dominance) coordinates as float arrays of shape (n, 2).
+
+        At most ``chunk_size`` rows are held at a time, so callers can aggregate tables
+        of any size in bounded memory. ``observed_only`` skips persons that have never
+        had a trait applied, whose coordinates are only the (0, 0) default.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        where = f' WHERE {_OBSERVED}' if observed_only else ''
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT friendliness, dominance FROM persons' + where)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield np.array(rows, dtype=float)
+
+    def iter_decay_batches(self, batch_size: int = 1000) -> Iterator[List[Tuple[str, Optional[float], float, float, float]]]:
+        """Streams batches of (person, decay_updated_at, decay_weight, decay_f_sum, decay_d_sum) rows."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT person, decay_updated_at, decay_weight, decay_f_sum, decay_d_sum FROM persons')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
     def get_person(self, name: str) -> Optional[Dict]:
-        """Retrieves a single person by name."""
-        with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
-            cursor.execute('SELECT person, friendliness, dominance, n_friendliness, n_dominance FROM persons WHERE person=?', (name,))
+        """Retrieves a single person by name, including their time-decayed sums."""
+        with self._connect() as (_, cursor):
+            return _select_person(cursor, name)
+
+    def update_personalities(self, updates: Iterable[Tuple]):
+        """Applies (name, personality, n_friendliness, n_dominance[, decay[, traits[, pairs]]]) updates in one transaction."""
+        rows, observations, pair_counts = [], [], Counter()
+        for name, personality, n_friendliness, n_dominance, *rest in updates:
+            decay, traits, pairs = (list(rest) + [None, None, None])[:3]
+            rows.append(self._update_row(name, personality, n_friendliness, n_dominance, decay))
+            observations.extend((name, trait, count) for trait, count in (traits or {}).items())
+            pair_counts.update(pairs or {})
+        pair_rows = [(trait, other, count) for (trait, other), count in pair_counts.items()]
+
+        def update(conn, cursor):
+            cursor.executemany(_UPDATE_PERSON_SQL, rows)
+            if observations:
+                cursor.executemany(_ADD_TRAIT_OBSERVATIONS_SQL, observations)
+            if pair_rows:
+                cursor.executemany(_ADD_TRAIT_PAIRS_SQL, pair_rows)
+
+        self._write(update)
+
+    def modify_person(self, name: str, modify: Callable[[Dict], Tuple]):
+        """Reads a person and writes ``modify(person)`` back in one transaction; see BasePersonDAO."""
+        def apply(conn, cursor):
+            # Take the write lock before reading so no concurrent update is lost
+            db_connection.begin_immediate(conn, cursor)
+            person = _select_person(cursor, name)
+            if person is None:
+                raise ValueError(f"Person '{name}' not found.")
+            personality, n_friendliness, n_dominance, *rest = modify(person)
+            decay, traits, pairs = (list(rest) + [None, None, None])[:3]
+            cursor.execute(_UPDATE_PERSON_SQL, self._update_row(
+                name, personality, n_friendliness, n_dominance, decay))
+            if traits:
+                cursor.executemany(_ADD_TRAIT_OBSERVATIONS_SQL,
+                                   [(name, trait, count) for trait, count in traits.items()])
+            if pairs:
+                cursor.executemany(_ADD_TRAIT_PAIRS_SQL,
+                                   [(trait, other, count) for (trait, other), count in pairs.items()])
+
+        self._write(apply)
+
+    @staticmethod
+    def _update_row(name, personality, n_friendliness, n_dominance, decay=None) -> Tuple:
+        decay_values = ((None, None, None, None) if decay is None else
+                        (decay.updated_at, decay.weight, decay.friendliness_sum, decay.dominance_sum))
+        return (personality.friendliness, personality.dominance, n_friendliness, n_dominance,
+                *decay_values, name)
+
+    def get_decay_half_life(self) -> Optional[float]:
+        """Returns the half-life the decayed sums are built with, or None before the first decayed write."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT half_life_days FROM decay_meta WHERE id = 1')
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def record_decay_half_life(self, half_life_days: float):
+        """Records the half-life of decayed writes; raises ValueError if another one is recorded."""
+        def record(conn, cursor):
+            db_connection.begin_immediate(conn, cursor)
+            cursor.execute('SELECT half_life_days FROM decay_meta WHERE id = 1')
+            row = cursor.fetchone()
+            decay_model.check_recorded_half_life(row[0] if row else None, half_life_days)
+            if row is None:
+                cursor.execute('INSERT INTO decay_meta (id, half_life_days) VALUES (1, ?)', (half_life_days,))
+
+        self._write(record)
+
+    def get_trait_counts(self, name: str) -> Dict[str, int]:
+        """Returns how many times each trait has been observed for a person."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT trait, observations FROM person_traits WHERE person=? ORDER BY trait', (name,))
+            return dict(cursor.fetchall())
+
+    def get_cooccurring(self, trait: str, top: Optional[int] = None) -> Tuple[int, List[Tuple[str, int]]]:
+        """
+        Returns how many descriptions named ``trait`` and the traits named with it most often.
+
+        Returns:
+            (descriptions naming the trait, [(other_trait, descriptions naming both)]),
+            the pairs sorted by count descending, then name.
+        """
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT descriptions FROM trait_pairs WHERE trait=? AND other=?', (trait, trait))
             row = cursor.fetchone()
-            if row:
-                columns = [description[0] for description in cursor.description]
-                return dict(zip(columns, row))
-            return None
-
-    def update_personality(self, name: str, personality: personality_models.Personality,
-                         n_friendliness: int, n_dominance: int):
-        """Updates the personality scores and counts for a given person."""
-        with db_connection.DatabaseConnection(self.db_name) as (conn, cursor):
+            cursor.execute('''
+                SELECT other, descriptions FROM trait_pairs
+                WHERE trait=? AND other != trait
+                ORDER BY descriptions DESC, other
+                LIMIT ?
+            ''', (trait, -1 if top is None else top))
+            return (row[0] if row else 0), cursor.fetchall()
+
+    def get_top_pairs(self, top: Optional[int] = None) -> List[Tuple[str, str, int]]:
+        """Returns the (trait, other, descriptions) pairs named together most often, each pair once."""
+        with self._connect() as (_, cursor):
+            cursor.execute('''
+                SELECT trait, other, descriptions FROM trait_pairs
+                WHERE trait < other
+                ORDER BY descriptions DESC, trait, other
+                LIMIT ?
+            ''', (-1 if top is None else top,))
+            return cursor.fetchall()
+
+    def apply_trait_deltas(self, deltas: Dict[str, Tuple[float, float]]) -> int:
+        """
+        Moves every person who observed a changed trait by that trait's share of the change.
+
+        A person's score is the mean of their observations, so when a trait observed
+        ``c`` of ``n`` times moves by ``delta``, the mean moves by ``c * delta / n``. The
+        shifts of all changed traits are summed per person in one grouped join over the
+        trait index of ``person_traits`` and written with a single set-based UPDATE, so
+        only affected persons are read or written. Decayed sums are shifted by the same
+        fraction of their weight, which assumes the trait's observations are spread
+        over time like the person's others.
+
+        Args:
+            deltas: {trait: (friendliness change, dominance change)}.
+
+        Returns:
+            The number of persons updated.
+        """
+        items = [(trait, float(df), float(dd)) for trait, (df, dd) in deltas.items() if df or dd]
+
+        def apply(conn, cursor):
+            cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS trait_deltas (
+                    trait TEXT PRIMARY KEY, df REAL NOT NULL, dd REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('DELETE FROM temp.trait_deltas')
+            cursor.executemany('INSERT INTO temp.trait_deltas (trait, df, dd) VALUES (?, ?, ?)', items)
             cursor.execute('''
                 UPDATE persons
-                SET friendliness=?, dominance=?, n_friendliness=?, n_dominance=?
-                WHERE person=?
-            ''', (personality.friendliness, personality.dominance,
-                 n_friendliness, n_dominance, name))
-            conn.commit()
+                SET friendliness = friendliness + shift.df / n_friendliness,
+                    dominance = dominance + shift.dd / n_dominance,
+                    decay_f_sum = decay_f_sum + decay_weight * shift.df / n_friendliness,
+                    decay_d_sum = decay_d_sum + decay_weight * shift.dd / n_dominance
+                FROM (
+                    SELECT pt.person, SUM(pt.observations * d.df) AS df, SUM(pt.observations * d.dd) AS dd
+                    FROM temp.trait_deltas AS d JOIN person_traits AS pt ON pt.trait = d.trait
+                    GROUP BY pt.person
+                ) AS shift
+                WHERE persons.person = shift.person AND n_friendliness > 0 AND n_dominance > 0
+            ''')
+            updated = cursor.rowcount
+            cursor.execute('DELETE FROM temp.trait_deltas')
+            return updated
+
+        return self._write(apply) if items else 0
+
+    def get_company_dao(self) -> CompanyDAO:
+        """Returns the CompanyDAO of this database, whose rankings are kept current by its triggers."""
+        return CompanyDAO(self.db_name)
 
     def reset_database(self):
-        """Drops and recreates the persons table."""
-        with db_connection.DatabaseConnection(self.db_name) as (conn, cursor):
-            cursor.execute("DROP TABLE IF EXISTS persons")
-            conn.commit()
+        """Drops and recreates the persons schema."""
+        schema.reset_schema(self.db_name)
         self.create_tables() # Recreate the tables
 
-    def add_person(self, name: str):
-        """Adds a new person to the database with default personality values."""
-        # Input validation
-        if not isinstance(name, str):
-            raise TypeError("Person name must be a string")
-        if not name.strip():
-            raise ValueError("Person name cannot be empty")
-
-        name = name.strip()
-        if len(name) > 100:  # Reasonable limit
-            raise ValueError("Person name cannot exceed 100 characters")
-
-        with db_connection.DatabaseConnection(self.db_name) as (conn, cursor):
-            try:
-                cursor.execute(
-                    # Ensure default values are set correctly if not provided
-                    'INSERT INTO persons (person, friendliness, dominance, n_friendliness, n_dominance) VALUES (?, 0.0, 0.0, 0, 0)',
-                    (name,)
-                )
-                conn.commit()
-            except sqlite3.IntegrityError:
-                # Handle cases where the person might already exist
-                raise ValueError(f"Person '{name}' already exists.")
+    def add_person(self, name: str, allow_similar: bool = False):
+        """
+        Adds a new person to the database with default personality values.
+
+        Unless ``allow_similar`` is set, a name that looks like an existing person's
+        ("Jon Doe" next to "John Doe") is rejected with SimilarPersonError. Candidates
+        come from the blocking key index (see name_keys.py), so the check costs a few
+        index lookups however many persons are stored.
+        """
+        name = self._validate_name(name)
+
+        def insert(conn, cursor):
+            if cursor.execute('SELECT 1 FROM persons WHERE person=?', (name,)).fetchone():
+                raise sqlite3.IntegrityError(name)
+            similar = self._insert_unless_similar(cursor, name, allow_similar)
+            # A rejected name is reported after commit, which keeps any names indexed meanwhile
+            return similar
+
+        try:
+            similar = self._write(insert)
+        except sqlite3.IntegrityError:
+            # Handle cases where the person might already exist
+            raise ValueError(f"Person '{name}' already exists.")
+        if similar:
+            raise SimilarPersonError(name, similar)
+
+    def add_persons(self, names: Iterable[str], allow_similar: bool = False) -> Tuple[List[str], Dict[str, List[str]]]:
+        """
+        Adds persons in one transaction, skipping names that already exist.
+
+        Unless ``allow_similar`` is set, names that look like a stored person's, or like
+        a name added earlier in the same call, are not added.
+
+        Returns:
+            (names added, {name not added: the similar names it was held back for})
+        """
+        names = list(dict.fromkeys(self._validate_name(name) for name in names))
+
+        def insert(conn, cursor):
+            added, held_back = [], {}
+            for name in names:
+                if cursor.execute('SELECT 1 FROM persons WHERE person=?', (name,)).fetchone():
+                    continue
+                similar = self._insert_unless_similar(cursor, name, allow_similar)
+                if similar:
+                    held_back[name] = similar
+                else:
+                    added.append(name)
+            return added, held_back
+
+        return self._write(insert)
+
+    @staticmethod
+    def _insert_unless_similar(cursor, name: str, allow_similar: bool) -> List[str]:
+        """Inserts a new person unless it looks like a stored one. Returns the similar names."""
+        # Names written by other means since the last check are indexed first
+        _index_queued_names(cursor)
+        similar = [] if allow_similar else _similar_names(cursor, name)
+        if similar:
+            return similar
+        cursor.execute(
+            # Ensure default values are set correctly if not provided
+            'INSERT INTO persons (person, friendliness, dominance, n_friendliness, n_dominance) VALUES (?, 0.0, 0.0, 0, 0)',
+            (name,)
+        )
+        _index_queued_names(cursor)
+        return []
+
+    def find_duplicate_groups(self) -> List[List[str]]:
+        """
+        Returns groups of stored names that likely belong to the same person.
+
+        Only names that share a blocking key are compared, one block at a time, while
+        the key index is streamed in key order. Similar pairs are joined into groups,
+        so "Jon Doe", "John Doe" and "John  Doe" form one group.
+        """
+        self._write(lambda conn, cursor: _index_queued_names(cursor))
+
+        def blocks() -> Iterator[List[str]]:
+            with self._connect() as (_, cursor):
+                cursor.execute('SELECT key, person FROM person_name_keys ORDER BY key, person')
+                block_key, block = None, []
+                while True:
+                    rows = cursor.fetchmany(NAME_QUEUE_BATCH)
+                    if not rows:
+                        break
+                    for key, person in rows:
+                        if key != block_key:
+                            yield block
+                            block_key, block = key, []
+                        block.append(person)
+                yield block
+
+        return self._group_similar(blocks())
+
+    def merge_persons(self, keep: str, duplicates: Sequence[str],
+                      half_life_days: float = decay_model.DEFAULT_HALF_LIFE_DAYS) -> Dict:
+        """
+        Merges duplicate profiles into ``keep`` and deletes them, in one transaction.
+
+        Profiles are combined by _merge_profiles and trait counts are added up. Saved
+        rankings and the change log follow through the usual triggers.
+
+        Returns:
+            The merged person, as returned by get_person.
+
+        Raises:
+            ValueError: If any of the persons does not exist.
+        """
+        duplicates = [name for name in dict.fromkeys(duplicates) if name != keep]
+        names = [keep, *duplicates]
+        placeholders = ', '.join('?' * len(duplicates))
+
+        def merge(conn, cursor):
+            # Take the write lock before reading so no observation is lost
+            db_connection.begin_immediate(conn, cursor)
+            cursor.execute(f'''
+                SELECT person, friendliness, dominance, n_friendliness, n_dominance,
+                       decay_updated_at, decay_weight, decay_f_sum, decay_d_sum
+                FROM persons WHERE person IN ({', '.join('?' * len(names))})
+            ''', names)
+            rows = {row[0]: row for row in cursor.fetchall()}
+            missing = [name for name in names if name not in rows]
+            if missing:
+                raise ValueError(f"Person(s) not found: {', '.join(missing)}")
+            personality, n_friendliness, n_dominance, decay = self._merge_profiles(
+                [(*rows[name][1:5], personality_models.DecayState(*rows[name][5:])) for name in names],
+                half_life_days)
+            cursor.execute(_UPDATE_PERSON_SQL, self._update_row(
+                keep, personality, n_friendliness, n_dominance, decay if decay.updated_at is not None else None))
+            if duplicates:
+                cursor.execute(f'''
+                    INSERT INTO person_traits (person, trait, observations)
+                    SELECT ?, trait, SUM(observations) FROM person_traits
+                    WHERE person IN ({placeholders}) GROUP BY trait
+                    ON CONFLICT(person, trait) DO UPDATE SET observations = observations + excluded.observations
+                ''', (keep, *duplicates))
+                cursor.execute(f'DELETE FROM persons WHERE person IN ({placeholders})', duplicates)
+
+        self._write(merge)
+        return self.get_person(keep)
 
     # Removed add_trait_to_person method - logic moved to PersonService
\ No newline at end of file
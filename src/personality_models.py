@@ -8,9 +8,11 @@ immutable data representation.
 Classes:
     Personality: Represents a personality profile with friendliness and dominance scores.
     PersonStats: Stores personality statistics and metadata for a person.
+    DecayState: Time-decayed observation sums for a person.
 """
 
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class Personality:
@@ -29,4 +31,17 @@ class PersonStats:
     name: str
     personality: Personality
     n_friendliness: int = 0
-    n_dominance: int = 0
\ No newline at end of file
+    n_dominance: int = 0
+
+@dataclass
+class DecayState:
+    """Time-decayed observation sums for a person.
+
+    The sums are decayed as of ``updated_at`` (seconds since the epoch); weights of
+    older observations shrink by half every half-life. ``updated_at`` is None for a
+    person without observations.
+    """
+    updated_at: Optional[float] = None
+    weight: float = 0.0
+    friendliness_sum: float = 0.0
+    dominance_sum: float = 0.0
@@ -0,0 +1,46 @@
+"""
+Plot command-line interface module for the Personality Analysis System.
+
+This module contains functions that handle CLI commands rendering images of the
+stored data.
+
+Functions:
+    plot_population: Handles the 'plot population' command to render a density heatmap of all persons.
+"""
+
+import time
+from typing import Any
+from person_dao import PersonDAO
+from trait_dao import TraitDAO
+from services.analytics_service import AnalyticsService
+from services.company_service import CompanyService
+import plotting
+
+
+def plot_population(args: Any) -> None:
+    """Handles the 'plot population' command."""
+    person_dao = PersonDAO()
+    person_dao.create_tables()
+    start = time.perf_counter()
+    target = None
+    try:
+        if args.target:
+            target = CompanyService(person_dao, TraitDAO()).target_for_description(args.target)
+            if target is None:
+                print("Error: No valid traits found in the target description.")
+                return
+        histogram = AnalyticsService(person_dao, chunk_size=args.chunk_size).population_histogram(bins=args.bins)
+        path = plotting.render_population(histogram, args.output, target=target,
+                                          target_label=f"Target: {args.target}" if args.target else None,
+                                          log_scale=not args.linear)
+    except ImportError:
+        print("Error: Plotting requires matplotlib. Install it with 'pip install matplotlib'.")
+        return
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return
+    except Exception as e:
+        print(f"Error plotting population: {str(e)}")
+        return
+    print(f"Population heatmap of {histogram.total - histogram.unobserved} persons written to '{path}' "
+          f"({time.perf_counter() - start:.2f}s).")
@@ -0,0 +1,89 @@
+"""
+Plotting module for the Personality Analysis System.
+
+This module renders the candidate population in the friendliness/dominance plane.
+Persons are never plotted one by one: the population is first streamed into a fixed
+2-D histogram (see ``AnalyticsService.population_histogram``), and only that grid is
+drawn as a heatmap. Memory and render time therefore depend on the number of bins,
+not on the number of persons.
+
+matplotlib is an optional dependency, imported only when a plot is rendered, with
+the non-interactive Agg canvas so no display is needed.
+
+Functions:
+    render_population: Draws a population histogram as a heatmap PNG.
+"""
+
+import os
+from typing import Optional
+import numpy as np
+from personality_models import Personality
+from services.analytics_service import PopulationHistogram
+
+# Constants
+DEFAULT_OUTPUT = os.path.join('img', 'population.png')
+DEFAULT_DPI = 150
+FIGURE_SIZE = (7.0, 6.0)  # inches
+COLORMAP = 'viridis'
+
+
+def render_population(histogram: PopulationHistogram, path: str = DEFAULT_OUTPUT,
+                      target: Optional[Personality] = None, target_label: Optional[str] = None,
+                      log_scale: bool = True, title: Optional[str] = None, dpi: int = DEFAULT_DPI) -> str:
+    """
+    Draws a population histogram as a heatmap and writes it to a PNG file.
+
+    Args:
+        histogram: The streamed population histogram.
+        path: Output file; missing directories are created.
+        target: Optional target personality, drawn as a marker over the heatmap.
+        target_label: Legend text for the target.
+        log_scale: Color bins by log count, so sparse regions stay visible next to dense ones.
+        title: Plot title. Defaults to a summary of the population.
+        dpi: Output resolution.
+
+    Returns:
+        The path written.
+
+    Raises:
+        ImportError: If matplotlib is not installed.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.colors import LogNorm, Normalize
+    from matplotlib.figure import Figure
+
+    counts = histogram.counts
+    peak = int(counts.max()) if counts.size else 0
+    # Empty bins stay transparent instead of taking the lowest color
+    image = np.ma.masked_equal(counts.T, 0)
+    norm = LogNorm(vmin=1, vmax=max(peak, 1)) if log_scale else Normalize(vmin=0, vmax=max(peak, 1))
+    extent = (histogram.friendliness_edges[0], histogram.friendliness_edges[-1],
+              histogram.dominance_edges[0], histogram.dominance_edges[-1])
+
+    figure = Figure(figsize=FIGURE_SIZE)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    mesh = axes.imshow(image, origin='lower', extent=extent, aspect='auto', cmap=COLORMAP,
+                       norm=norm, interpolation='nearest')
+    figure.colorbar(mesh, ax=axes, label='Persons per bin' + (' (log scale)' if log_scale else ''))
+
+    if target is not None:
+        axes.scatter([target.friendliness], [target.dominance], marker='X', s=160, c='red',
+                     edgecolors='white', linewidths=1.5, zorder=3,
+                     label=target_label or f'Target (F:{target.friendliness:.2f}, D:{target.dominance:.2f})')
+        axes.legend(loc='upper left')
+        # Keep a target outside the populated area in view
+        margin = 0.05 * max(extent[1] - extent[0], extent[3] - extent[2])
+        axes.set_xlim(min(extent[0], target.friendliness - margin), max(extent[1], target.friendliness + margin))
+        axes.set_ylim(min(extent[2], target.dominance - margin), max(extent[3], target.dominance + margin))
+
+    observed = histogram.total - histogram.unobserved
+    axes.set_title(title or f'{observed:,} persons with traits ({histogram.unobserved:,} without)')
+    axes.set_xlabel('Friendliness')
+    axes.set_ylabel('Dominance')
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    figure.savefig(path, dpi=dpi)
+    return path
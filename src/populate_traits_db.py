@@ -5,57 +5,41 @@ This module provides functionality to populate the traits database with a compre
 set of default personality traits. Each trait includes friendliness and dominance scores
 that form the foundation of the personality analysis system.
 
-The module creates the traits table schema and inserts predefined traits including:
+The module ensures the traits schema exists and inserts predefined traits in a single
+transaction. Larger lexicons should be loaded with ``trait import`` instead. The defaults include:
 - friendly, helpful, collaborative, outgoing, enthusiastic
 - quiet, reserved, dominant, assertive, leader
 - strict, agile, innovative
 
 Functions:
-    populate_traits_db: Creates the traits table and populates it with default data.
+    populate_traits_db: Ensures the traits table exists and populates it with default data.
 """
 
-import sqlite3
-from db_connection import DB_TIMEOUT
+from trait_dao import TraitDAO
+
+# Default lexicon as (trait, friendliness, dominance) rows
+DEFAULT_TRAITS = [
+    ('friendly', 7.0, 6.0),
+    ('helpful', 6.0, 4.0),
+    ('collaborative', 8.0, 5.0),
+    ('outgoing', 9.0, 5.0),
+    ('enthusiastic', 8.5, 4.0),
+    ('quiet', 3.0, 2.0),
+    ('reserved', 2.0, 3.0),
+    ('dominant', 6.0, 8.0), # Corrected friendliness for 'dominant' trait
+    ('assertive', 7.5, 7.5),
+    ('leader', 9.0, 9.0),
+    ('strict', 2.0, 8.0), # Added 'strict' trait
+    ('agile', 8.0, 7.0), # Added 'agile' trait
+    ('innovative', 9.0, 6.0), # Added 'innovative' trait
+]
 
 def populate_traits_db():
     """Populate the traits database with default values."""
-    conn = sqlite3.connect('traits.db', timeout=DB_TIMEOUT)
-    cursor = conn.cursor()
-
-    # Create traits table if it doesn't exist
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS traits (
-            trait TEXT PRIMARY KEY,
-            friendliness REAL,
-            dominance REAL
-        )
-    """)
-
-    # Insert default traits
-    traits = [
-        ('friendly', 7.0, 6.0),
-        ('helpful', 6.0, 4.0),
-        ('collaborative', 8.0, 5.0),
-        ('outgoing', 9.0, 5.0),
-        ('enthusiastic', 8.5, 4.0),
-        ('quiet', 3.0, 2.0),
-        ('reserved', 2.0, 3.0),
-        ('dominant', 6.0, 8.0), # Corrected friendliness for 'dominant' trait
-        ('assertive', 7.5, 7.5),
-        ('leader', 9.0, 9.0),
-        ('strict', 2.0, 8.0), # Added 'strict' trait
-        ('agile', 8.0, 7.0), # Added 'agile' trait
-        ('innovative', 9.0, 6.0), # Added 'innovative' trait
-    ]
-    for trait in traits:
-        try:
-            cursor.execute("INSERT INTO traits VALUES (?, ?, ?)", trait)
-        except sqlite3.IntegrityError:
-            # Ignore integrity errors, likely due to duplicate entries from previous runs
-            pass
-
-    conn.commit()
-    conn.close()
+    trait_dao = TraitDAO()
+    trait_dao.create_tables()
+    # Existing traits are left untouched, so re-running is safe
+    trait_dao.add_traits(DEFAULT_TRAITS)
     print("Successfully populated traits database with default values.")
 
 if __name__ == '__main__':
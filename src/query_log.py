@@ -0,0 +1,224 @@
+"""
+Query tracing module for the Personality Analysis System.
+
+This module times every SQL statement issued on a traced connection. Statements that
+take longer than a threshold are logged through the ``query_log`` logger at WARNING
+level, with their parameters redacted and their ``EXPLAIN QUERY PLAN`` output, so that
+full table scans show up before they become a problem. Timings are also aggregated per
+statement text and can be read with ``query_stats``.
+
+A statement's time covers its execution and the fetches of its rows, so a slow
+``SELECT`` is caught even when most of the work happens while iterating the cursor.
+
+Classes:
+    QueryStats: Aggregated timings for one statement.
+    TracingConnection: sqlite3 connection whose cursors are traced.
+    TracingCursor: sqlite3 cursor that times statements and their fetches.
+
+Functions:
+    query_stats: Returns a snapshot of the per-statement aggregates.
+    reset_query_stats: Clears the aggregates.
+    format_query_stats: Renders the aggregates as a text table, slowest first.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger('query_log')
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+# Statements EXPLAIN QUERY PLAN can describe
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH')
+
+
+@dataclass
+class QueryStats:
+    """Aggregated timings for one statement."""
+    statement: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    slow_count: int = 0
+    full_scan: bool = False
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+
+_stats: Dict[str, QueryStats] = {}
+_stats_lock = threading.Lock()
+
+
+def normalize(sql: str) -> str:
+    """Collapses whitespace and replaces inline literals, so one statement shape is one key."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _redact(parameters) -> str:
+    if not parameters:
+        return 'none'
+    return f'{len(parameters)} redacted'
+
+
+def query_stats() -> List[QueryStats]:
+    """Returns a copy of the per-statement aggregates, slowest total first."""
+    with _stats_lock:
+        stats = [replace(entry) for entry in _stats.values()]
+    return sorted(stats, key=lambda entry: entry.total_ms, reverse=True)
+
+
+def reset_query_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def format_query_stats(limit: Optional[int] = None) -> str:
+    """Renders the aggregates as a text table, slowest total first."""
+    stats = query_stats()[:limit]
+    if not stats:
+        return "No queries recorded."
+    lines = [f"{'Count':>7} {'Total ms':>10} {'Mean ms':>9} {'Max ms':>9} {'Slow':>5}  Statement"]
+    for entry in stats:
+        scan = ' [full scan]' if entry.full_scan else ''
+        lines.append(f"{entry.count:>7} {entry.total_ms:>10.2f} {entry.mean_ms:>9.3f} "
+                     f"{entry.max_ms:>9.3f} {entry.slow_count:>5}  {entry.statement}{scan}")
+    return '\n'.join(lines)
+
+
+def _is_full_scan(plan: Sequence[str]) -> bool:
+    # 'SCAN t' reads the whole table; 'SCAN t USING [COVERING] INDEX' still walks a
+    # whole index. Constant rows and subquery scans are not table scans.
+    return any(line.startswith('SCAN ') and 'CONSTANT ROW' not in line and 'SUBQUERY' not in line
+               for line in plan)
+
+
+class TracingCursor(sqlite3.Cursor):
+    """Cursor that times each statement, including the fetches of its rows."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._statement: Optional[str] = None
+        self._key = ''
+        self._parameters = None
+        self._elapsed_ms = 0.0
+        self._logged = False
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._begin(sql, parameters, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        # Keep the first row for EXPLAIN, without consuming a generator twice
+        rows = iter(seq_of_parameters)
+        first = next(rows, None)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, () if first is None else _chain(first, rows))
+        finally:
+            self._begin(sql, first or (), start)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed(lambda: super(TracingCursor, self).fetchmany(
+            self.arraysize if size is None else size))
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+    def __next__(self):
+        return self._timed(super().__next__)
+
+    def _begin(self, sql, parameters, start):
+        self._statement = sql
+        self._key = normalize(sql)
+        self._parameters = parameters
+        self._elapsed_ms = 0.0
+        self._logged = False
+        self._record(start, new_execution=True)
+
+    def _timed(self, fetch):
+        start = time.perf_counter()
+        try:
+            return fetch()
+        finally:
+            if self._statement is not None:
+                self._record(start)
+
+    def _record(self, start, new_execution=False):
+        """Adds elapsed time to the current statement and its aggregate, logging it once it is slow."""
+        delta_ms = (time.perf_counter() - start) * 1000.0
+        self._elapsed_ms += delta_ms
+        slow = not self._logged and self._elapsed_ms >= self.connection.threshold_ms
+        with _stats_lock:
+            entry = _stats.get(self._key)
+            if entry is None:
+                entry = _stats[self._key] = QueryStats(self._key)
+            if new_execution:
+                entry.count += 1
+            entry.total_ms += delta_ms
+            entry.max_ms = max(entry.max_ms, self._elapsed_ms)
+            if slow:
+                entry.slow_count += 1
+        if slow:
+            self._logged = True
+            self._log_slow()
+
+    def _explain(self) -> List[str]:
+        if not self._statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return []
+        try:
+            # A plain cursor, so the EXPLAIN is neither traced nor disturbs this cursor's rows
+            plan_cursor = sqlite3.Cursor(self.connection)
+            try:
+                rows = plan_cursor.execute('EXPLAIN QUERY PLAN ' + self._statement,
+                                           self._parameters).fetchall()
+            finally:
+                plan_cursor.close()
+        except sqlite3.Error:
+            return []
+        return [row[3] for row in rows]
+
+    def _log_slow(self):
+        plan = self._explain()
+        if _is_full_scan(plan):
+            with _stats_lock:
+                _stats[self._key].full_scan = True
+        logger.warning("Slow query (%.2f ms, params: %s): %s%s", self._elapsed_ms,
+                       _redact(self._parameters), self._key,
+                       ''.join(f'\n    {line}' for line in plan))
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+class TracingConnection(sqlite3.Connection):
+    """Connection whose cursors, including those behind execute(), are TracingCursors.
+
+    Statements slower than ``threshold_ms`` are logged; set it after connecting.
+    """
+    threshold_ms: float = 0.0
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
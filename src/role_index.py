@@ -0,0 +1,87 @@
+"""
+Role index module for the Personality Analysis System.
+
+This module answers reverse matching queries, "which open roles fit this person
+best?", without re-analyzing any role description. Every role is stored with the
+target personality its description resolved to, and this module keeps those targets
+in a k-d tree, so the k nearest roles to a person's coordinates are found in
+O(k log n) instead of by scanning all roles.
+
+Ties are broken by role name: after the k-d tree has found the k-th smallest
+distance, every role at that distance is fetched with a radius query, so the same
+roles are returned regardless of their order in the tree.
+
+Indexes are cached per roles version and only rebuilt when a role changes.
+
+Classes:
+    RoleIndex: k-d tree over the target personalities of the stored roles.
+
+Functions:
+    get_cached_index: Returns a cached RoleIndex, rebuilding it when the roles version changes.
+"""
+
+import threading
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+import numpy as np
+from scipy.spatial import cKDTree
+from personality_models import Personality
+
+# Constants
+# Relative slack when collecting roles tied with the k-th nearest
+TIE_TOLERANCE = 1e-9
+
+RoleRow = Tuple[str, float, float]
+
+_cache: Dict[Hashable, Tuple[Hashable, 'RoleIndex']] = {}
+_cache_lock = threading.Lock()
+
+
+class RoleIndex:
+    """k-d tree over (friendliness, dominance) role targets."""
+    def __init__(self, rows: Iterable[RoleRow]):
+        """
+        Args:
+            rows: (role, friendliness, dominance) rows.
+        """
+        names, coordinates = [], []
+        for name, friendliness, dominance in rows:
+            names.append(name)
+            coordinates.append((friendliness, dominance))
+        self._names = names
+        self._tree = cKDTree(np.array(coordinates, dtype=float).reshape(-1, 2)) if names else None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def nearest(self, personality: Personality, k: int) -> List[Tuple[str, float]]:
+        """
+        Returns the ``k`` roles closest to a personality as (role, distance) pairs,
+        sorted by distance with ties broken by role name.
+        """
+        if not isinstance(k, int) or k < 1:
+            raise ValueError("k must be a positive integer")
+        if self._tree is None:
+            return []
+        point = (personality.friendliness, personality.dominance)
+        k = min(k, len(self._names))
+        distances, _ = self._tree.query(point, k=k)
+        kth = float(np.atleast_1d(distances)[-1])
+        # Everything within the k-th distance, including roles tied with it
+        indices = self._tree.query_ball_point(point, kth * (1.0 + TIE_TOLERANCE) + TIE_TOLERANCE)
+        candidates = np.array(indices, dtype=np.intp)
+        found = np.hypot(*(self._tree.data[candidates] - point).T)
+        ranked = sorted(zip(found.tolist(), (self._names[i] for i in candidates)))
+        return [(name, dist) for dist, name in ranked[:k]]
+
+
+def get_cached_index(key: Hashable, version: Hashable,
+                     load_roles: Callable[[], Iterable[RoleRow]]) -> RoleIndex:
+    """Returns the cached index for ``key``, rebuilding it if ``version`` has changed."""
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    index = RoleIndex(load_roles())
+    with _cache_lock:
+        _cache[key] = (version, index)
+    return index
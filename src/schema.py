@@ -0,0 +1,427 @@
+"""
+Schema management module for the Personality Analysis System.
+
+This module owns the DDL for every database file used by the system and applies it
+through versioned migrations. The applied version is recorded in SQLite's
+``PRAGMA user_version`` header field, so bringing a database up to date costs a
+single header read once the schema is current. Each database file is checked at
+most once per process; later calls are answered from an in-process cache.
+
+Constants:
+    PERSONS_MIGRATIONS: Ordered migrations for the persons database.
+    TRAITS_MIGRATIONS: Ordered migrations for the traits database.
+
+Functions:
+    ensure_schema: Applies any pending migrations to a database file, once per process.
+    reset_schema: Drops all tables in a database file and forgets its cached version.
+    invalidate: Forgets the cached schema check for a database file.
+"""
+
+import threading
+from typing import Dict, List, Sequence, Tuple, Union
+import db_connection
+
+# A migration is a target version and the statements that bring the previous version to it.
+Migration = Tuple[int, Sequence[str]]
+
+
+def _row_key(key: Union[str, Tuple[str, ...]], row: str = '') -> str:
+    """SQL for the logged key of a row: the column itself, or a JSON array for a tuple of columns."""
+    if isinstance(key, str):
+        return f'{row}{key}'
+    return f"json_array({', '.join(row + column for column in key)})"
+
+
+def _change_capture(table: str, key: Union[str, Tuple[str, ...]], columns: Sequence[str]) -> Tuple[str, ...]:
+    """
+    Statements that record every write to ``table`` in ``change_log`` (see changefeed.py).
+
+    Only the key and the kind of change are logged; exports read the current row, so
+    a key written many times is shipped once. Updates that change nothing are not
+    logged, so replaying another instance's changes does not echo them back. Rows that
+    already exist are logged as upserts, so the first export is a full copy. A tuple
+    ``key`` names several key columns, whose values are logged as a JSON array.
+    """
+    key_columns = (key,) if isinstance(key, str) else key
+    changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in (*key_columns, *columns))
+    key_changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in key_columns)
+    old_key, new_key = _row_key(key, 'OLD.'), _row_key(key, 'NEW.')
+    return (
+        '''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('upsert', 'delete'))
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS change_log_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            source TEXT NOT NULL
+        )
+        ''',
+        "INSERT OR IGNORE INTO change_log_meta (id, source) VALUES (1, lower(hex(randomblob(8))))",
+        '''
+        CREATE TABLE IF NOT EXISTS replication_state (
+            source TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            applied_at REAL NOT NULL
+        )
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO change_log (table_name, row_key, op) VALUES ('{table}', {new_key}, 'upsert');
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_update AFTER UPDATE ON {table}
+        WHEN {changed}
+        BEGIN
+            INSERT INTO change_log (table_name, row_key, op)
+            SELECT '{table}', {old_key}, 'delete' WHERE {key_changed};
+            INSERT INTO change_log (table_name, row_key, op) VALUES ('{table}', {new_key}, 'upsert');
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_delete AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO change_log (table_name, row_key, op) VALUES ('{table}', {old_key}, 'delete');
+        END
+        ''',
+        f"INSERT INTO change_log (table_name, row_key, op) SELECT '{table}', {_row_key(key)}, 'upsert' FROM {table}",
+    )
+
+
+PERSONS_MIGRATIONS: List[Migration] = [
+    (1, (
+        '''
+        CREATE TABLE IF NOT EXISTS persons (
+            person TEXT PRIMARY KEY,
+            friendliness REAL DEFAULT 0.0,
+            dominance REAL DEFAULT 0.0,
+            n_friendliness INTEGER DEFAULT 0,
+            n_dominance INTEGER DEFAULT 0
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_friendliness ON persons(friendliness)',
+        'CREATE INDEX IF NOT EXISTS idx_dominance ON persons(dominance)',
+    )),
+    # The primary key already provides an index on person; the explicit one only
+    # added write amplification on every insert.
+    (2, (
+        'DROP INDEX IF EXISTS idx_person_name',
+    )),
+    # Saved company profiles and their materialized rankings. The triggers keep each
+    # ranking current as persons are added or change, touching one row per profile.
+    # Squared distances are stored so no SQL math functions are needed.
+    (3, (
+        '''
+        CREATE TABLE IF NOT EXISTS company_profiles (
+            company TEXT PRIMARY KEY,
+            description TEXT,
+            friendliness REAL NOT NULL,
+            dominance REAL NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS company_rankings (
+            company TEXT NOT NULL,
+            person TEXT NOT NULL,
+            distance_sq REAL NOT NULL,
+            PRIMARY KEY (company, person)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_company_rankings_distance ON company_rankings(company, distance_sq)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_persons_rank_insert AFTER INSERT ON persons
+        BEGIN
+            INSERT OR REPLACE INTO company_rankings (company, person, distance_sq)
+            SELECT company, NEW.person,
+                   (NEW.friendliness - friendliness) * (NEW.friendliness - friendliness)
+                   + (NEW.dominance - dominance) * (NEW.dominance - dominance)
+            FROM company_profiles;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_persons_rank_update AFTER UPDATE OF friendliness, dominance ON persons
+        BEGIN
+            INSERT OR REPLACE INTO company_rankings (company, person, distance_sq)
+            SELECT company, NEW.person,
+                   (NEW.friendliness - friendliness) * (NEW.friendliness - friendliness)
+                   + (NEW.dominance - dominance) * (NEW.dominance - dominance)
+            FROM company_profiles;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_persons_rank_delete AFTER DELETE ON persons
+        BEGIN
+            DELETE FROM company_rankings
+            WHERE company IN (SELECT company FROM company_profiles) AND person = OLD.person;
+        END
+        ''',
+    )),
+    # Exponentially time-decayed observation sums (see decay.py). Existing persons
+    # start with their current average, as if it had been observed at migration time.
+    (4, (
+        'ALTER TABLE persons ADD COLUMN decay_updated_at REAL',
+        'ALTER TABLE persons ADD COLUMN decay_weight REAL NOT NULL DEFAULT 0.0',
+        'ALTER TABLE persons ADD COLUMN decay_f_sum REAL NOT NULL DEFAULT 0.0',
+        'ALTER TABLE persons ADD COLUMN decay_d_sum REAL NOT NULL DEFAULT 0.0',
+        '''
+        UPDATE persons
+        SET decay_updated_at = CAST(strftime('%s', 'now') AS REAL),
+            decay_weight = n_friendliness,
+            decay_f_sum = friendliness * n_friendliness,
+            decay_d_sum = dominance * n_friendliness
+        WHERE n_friendliness > 0
+        ''',
+    )),
+    # Open roles for reverse matching. Unlike saved profiles they keep no ranking, so
+    # tens of thousands of roles add nothing to person writes. The version counter
+    # tells the in-process spatial index of roles when to rebuild (see role_index.py).
+    (5, (
+        '''
+        CREATE TABLE IF NOT EXISTS roles (
+            role TEXT PRIMARY KEY,
+            description TEXT,
+            friendliness REAL NOT NULL,
+            dominance REAL NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS roles_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation TEXT NOT NULL,
+            version INTEGER NOT NULL
+        )
+        ''',
+        "INSERT OR IGNORE INTO roles_meta (id, generation, version) VALUES (1, lower(hex(randomblob(8))), 0)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_roles_version_insert AFTER INSERT ON roles
+        BEGIN
+            UPDATE roles_meta SET version = version + 1 WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_roles_version_update AFTER UPDATE ON roles
+        BEGIN
+            UPDATE roles_meta SET version = version + 1 WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_roles_version_delete AFTER DELETE ON roles
+        BEGIN
+            UPDATE roles_meta SET version = version + 1 WHERE id = 1;
+        END
+        ''',
+    )),
+    # Change capture for replication between instances
+    (6, _change_capture('persons', 'person', (
+        'friendliness', 'dominance', 'n_friendliness', 'n_dominance',
+        'decay_updated_at', 'decay_weight', 'decay_f_sum', 'decay_d_sum'))),
+    # Sparse person x trait observation counts, so a trait whose coordinates change
+    # can be folded into the running means of exactly the persons who observed it
+    # (see PersonDAO.apply_trait_deltas). Observations made before this migration are
+    # not attributed to any trait and keep their original coordinates.
+    (7, (
+        '''
+        CREATE TABLE IF NOT EXISTS person_traits (
+            person TEXT NOT NULL,
+            trait TEXT NOT NULL,
+            observations INTEGER NOT NULL,
+            PRIMARY KEY (person, trait)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_person_traits_trait ON person_traits(trait)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_persons_traits_delete AFTER DELETE ON persons
+        BEGIN
+            DELETE FROM person_traits WHERE person = OLD.person;
+        END
+        ''',
+    )),
+    # Sparse trait co-occurrence counts: the number of descriptions that named both
+    # traits, kept in both orders so the partners of a trait are one index range,
+    # and with (t, t) counting the descriptions that named t. Descriptions applied
+    # before this migration were not kept and are not counted.
+    (8, (
+        '''
+        CREATE TABLE IF NOT EXISTS trait_pairs (
+            trait TEXT NOT NULL,
+            other TEXT NOT NULL,
+            descriptions INTEGER NOT NULL,
+            PRIMARY KEY (trait, other)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_trait_pairs_trait_count ON trait_pairs(trait, descriptions)',
+        'CREATE INDEX IF NOT EXISTS idx_trait_pairs_count ON trait_pairs(descriptions)',
+    )),
+    # Blocking keys for near-duplicate names (see name_keys.py). Keys are computed in
+    # Python, so the insert trigger only queues new names; PersonDAO indexes the queue
+    # in the same transaction as its own inserts, and catches up on names written by
+    # anything else (replication, or this migration) before its next check.
+    (9, (
+        '''
+        CREATE TABLE IF NOT EXISTS person_name_keys (
+            key TEXT NOT NULL,
+            person TEXT NOT NULL,
+            PRIMARY KEY (key, person)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_person_name_keys_person ON person_name_keys(person)',
+        'CREATE TABLE IF NOT EXISTS person_name_queue (person TEXT PRIMARY KEY) WITHOUT ROWID',
+        'INSERT OR IGNORE INTO person_name_queue (person) SELECT person FROM persons',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_persons_name_insert AFTER INSERT ON persons
+        BEGIN
+            INSERT OR IGNORE INTO person_name_queue (person) VALUES (NEW.person);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_persons_name_delete AFTER DELETE ON persons
+        BEGIN
+            DELETE FROM person_name_keys WHERE person = OLD.person;
+            DELETE FROM person_name_queue WHERE person = OLD.person;
+        END
+        ''',
+    )),
+    # The half-life the decayed sums are built with (see decay.py), recorded by the
+    # first decayed write. Sums backfilled by migration 4 are undecayed and fit any.
+    (10, (
+        '''
+        CREATE TABLE IF NOT EXISTS decay_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            half_life_days REAL NOT NULL
+        )
+        ''',
+    )),
+    # Change capture for the tables that cannot be derived from replicated persons
+    # rows. Name keys need none: replicated inserts queue names like any other.
+    (11, (
+        *_change_capture('person_traits', ('person', 'trait'), ('observations',)),
+        *_change_capture('trait_pairs', ('trait', 'other'), ('descriptions',)),
+        *_change_capture('decay_meta', ('id',), ('half_life_days',)),
+    )),
+]
+
+TRAITS_MIGRATIONS: List[Migration] = [
+    (1, (
+        '''
+        CREATE TABLE IF NOT EXISTS traits (
+            trait TEXT PRIMARY KEY,
+            friendliness REAL,
+            dominance REAL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_trait_friendliness ON traits(friendliness)',
+        'CREATE INDEX IF NOT EXISTS idx_trait_dominance ON traits(dominance)',
+    )),
+    # Redundant with the primary key index on trait.
+    (2, (
+        'DROP INDEX IF EXISTS idx_trait_name',
+    )),
+    # Lexicon version counter, bumped by triggers on every traits write, so derived
+    # structures such as the fuzzy trait index know when to rebuild. The random
+    # generation distinguishes a recreated lexicon whose counter happens to match.
+    (3, (
+        '''
+        CREATE TABLE IF NOT EXISTS lexicon_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation TEXT NOT NULL,
+            version INTEGER NOT NULL
+        )
+        ''',
+        "INSERT OR IGNORE INTO lexicon_meta (id, generation, version) VALUES (1, lower(hex(randomblob(8))), 0)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_traits_version_insert AFTER INSERT ON traits
+        BEGIN
+            UPDATE lexicon_meta SET version = version + 1 WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_traits_version_update AFTER UPDATE ON traits
+        BEGIN
+            UPDATE lexicon_meta SET version = version + 1 WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_traits_version_delete AFTER DELETE ON traits
+        BEGIN
+            UPDATE lexicon_meta SET version = version + 1 WHERE id = 1;
+        END
+        ''',
+    )),
+    # Change capture for replication between instances
+    (4, _change_capture('traits', 'trait', ('friendliness', 'dominance'))),
+]
+
+_checked_versions: Dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def ensure_schema(db_name: str, migrations: Sequence[Migration]) -> int:
+    """Brings a database file up to the latest migration and returns its version.
+
+    The first call for a given file reads ``PRAGMA user_version`` and applies any
+    newer migrations in a single transaction. Subsequent calls in the same process
+    return immediately without touching the database.
+    """
+    target_version = migrations[-1][0] if migrations else 0
+    cached = _checked_versions.get(db_name)
+    if cached is not None and cached >= target_version:
+        return cached
+
+    with _lock:
+        cached = _checked_versions.get(db_name)
+        if cached is not None and cached >= target_version:
+            return cached
+
+        with db_connection.DatabaseConnection(db_name) as (_, cursor):
+            cursor.execute('PRAGMA user_version')
+            current_version = cursor.fetchone()[0]
+
+        if any(version > current_version for version, _ in migrations):
+            def migrate(conn, cursor):
+                db_connection.begin_immediate(conn, cursor)
+                # Re-read under the write lock in case another process migrated first
+                cursor.execute('PRAGMA user_version')
+                version_now = cursor.fetchone()[0]
+                for version, statements in migrations:
+                    if version <= version_now:
+                        continue
+                    for statement in statements:
+                        cursor.execute(statement)
+                    version_now = version
+                cursor.execute(f'PRAGMA user_version = {int(version_now)}')
+                return version_now
+
+            current_version = db_connection.run_write(db_name, migrate)
+
+        _checked_versions[db_name] = current_version
+        return current_version
+
+
+def reset_schema(db_name: str):
+    """Drops every table in a database file and resets its schema version to 0."""
+    with _lock:
+        def drop_all(conn, cursor):
+            db_connection.begin_immediate(conn, cursor)
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+            tables = [row[0] for row in cursor.fetchall()]
+            for table in tables:
+                cursor.execute(f'DROP TABLE IF EXISTS "{table}"')
+            cursor.execute('PRAGMA user_version = 0')
+
+        db_connection.run_write(db_name, drop_all)
+        _checked_versions.pop(db_name, None)
+
+
+def invalidate(db_name: str = None):
+    """Forgets cached schema checks for one database file, or for all of them."""
+    with _lock:
+        if db_name is None:
+            _checked_versions.clear()
+        else:
+            _checked_versions.pop(db_name, None)
@@ -0,0 +1,295 @@
+"""
+Analytics service module for the Personality Analysis System.
+
+This module contains the business logic for summarizing the candidate population in
+the friendliness/dominance plane: quadrant counts, density and cohorts found by
+k-means or by fixed grid cells.
+
+Every statistic is computed from chunks of coordinates streamed by
+``PersonDAO.iter_coordinate_arrays``, so memory stays bounded by the chunk size no
+matter how many persons are stored. k-means needs only two passes over the table:
+
+1. A fine 2-D histogram of all persons is accumulated chunk by chunk.
+2. Weighted k-means runs on the non-empty histogram cells, which number at most
+   ``HISTOGRAM_BINS ** 2`` however large the table is.
+3. A second pass assigns every person to the nearest centroid and accumulates exact
+   per-cohort counts, means and spreads, which are what is reported.
+
+Persons that have never had a trait applied are left out of the statistics and only
+counted, since their (0, 0) default would form a spurious cohort.
+
+Classes:
+    Cohort: Statistics of one cohort.
+    PopulationHistogram: Streamed 2-D histogram of the observed persons.
+    CohortReport: Result of a cohort analysis.
+    AnalyticsService: Computes population statistics from a PersonDAO.
+
+The service provides functionality to:
+- Stream a 2-D histogram of person coordinates in bounded memory
+- Count persons per quadrant around the middle of the trait scale
+- Find cohorts with chunked, vectorized k-means or with grid binning
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import lexicon
+from person_dao import PersonDAO, DEFAULT_ARRAY_CHUNK
+
+# Constants
+METHODS = ('kmeans', 'grid')
+SCALE_MIDPOINT = sum(lexicon.SCORE_RANGE) / 2  # center of the trait score scale
+HISTOGRAM_BINS = 256
+DEFAULT_CLUSTERS = 5
+DEFAULT_CELL_SIZE = 2.5
+DEFAULT_MAX_ITERATIONS = 100
+CONVERGENCE_TOLERANCE = 1e-6
+# Quadrant names, indexed by (friendliness >= midpoint) * 2 + (dominance >= midpoint)
+QUADRANTS = ('unfriendly-submissive', 'unfriendly-dominant', 'friendly-submissive', 'friendly-dominant')
+
+
+@dataclass
+class Cohort:
+    """Statistics of one cohort."""
+    label: str
+    count: int
+    share: float  # of the observed persons
+    friendliness: float  # centroid
+    dominance: float
+    friendliness_std: float
+    dominance_std: float
+    rms_radius: float  # root mean squared distance to the centroid
+    density: float  # persons per unit area of the cohort's grid cell; NaN for k-means
+
+
+@dataclass
+class PopulationHistogram:
+    """Streamed 2-D histogram of the observed persons."""
+    counts: np.ndarray  # shape (len(friendliness_edges) - 1, len(dominance_edges) - 1)
+    friendliness_edges: np.ndarray
+    dominance_edges: np.ndarray
+    total: int
+    unobserved: int
+    quadrants: Dict[str, int]
+
+    def bin_centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the (friendliness, dominance) centers of every bin, in ``counts`` order."""
+        f_centers = (self.friendliness_edges[:-1] + self.friendliness_edges[1:]) / 2.0
+        d_centers = (self.dominance_edges[:-1] + self.dominance_edges[1:]) / 2.0
+        f_grid, d_grid = np.meshgrid(f_centers, d_centers, indexing='ij')
+        return f_grid.ravel(), d_grid.ravel()
+
+
+@dataclass
+class CohortReport:
+    """Result of a cohort analysis."""
+    method: str
+    total: int  # all persons
+    unobserved: int  # persons without any trait, left out of the statistics
+    quadrants: Dict[str, int] = field(default_factory=dict)
+    cohorts: List[Cohort] = field(default_factory=list)
+    inertia: float = 0.0  # sum of squared distances to the cohort centroids
+
+    @property
+    def observed(self) -> int:
+        return self.total - self.unobserved
+
+
+class AnalyticsService:
+    """Computes population statistics from the persons of a PersonDAO."""
+
+    def __init__(self, person_dao: PersonDAO, chunk_size: int = DEFAULT_ARRAY_CHUNK):
+        """
+        Args:
+            person_dao: An instance of PersonDAO.
+            chunk_size: Persons loaded per chunk; bounds the memory used by every pass.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.person_dao = person_dao
+        self.chunk_size = chunk_size
+
+    def population_histogram(self, bins: int = HISTOGRAM_BINS,
+                             bounds: Optional[Tuple[float, float, float, float]] = None) -> PopulationHistogram:
+        """
+        Streams a ``bins`` x ``bins`` histogram of the observed persons.
+
+        Args:
+            bins: Bins per axis.
+            bounds: (min_friendliness, max_friendliness, min_dominance, max_dominance).
+                Defaults to the bounds of the stored persons; persons outside are ignored.
+        """
+        if bins < 1:
+            raise ValueError("bins must be at least 1")
+        summary = self.person_dao.coordinate_summary()
+        if bounds is None:
+            bounds = _padded_bounds(summary)
+        f_edges = np.linspace(bounds[0], bounds[1], bins + 1)
+        d_edges = np.linspace(bounds[2], bounds[3], bins + 1)
+        counts = np.zeros((bins, bins), dtype=np.int64)
+        quadrants = np.zeros(len(QUADRANTS), dtype=np.int64)
+        for chunk in self.person_dao.iter_coordinate_arrays(self.chunk_size):
+            chunk_counts, _, _ = np.histogram2d(chunk[:, 0], chunk[:, 1], bins=(f_edges, d_edges))
+            counts += chunk_counts.astype(np.int64)
+            quadrant = (chunk[:, 0] >= SCALE_MIDPOINT) * 2 + (chunk[:, 1] >= SCALE_MIDPOINT)
+            quadrants += np.bincount(quadrant, minlength=len(QUADRANTS))
+        return PopulationHistogram(counts, f_edges, d_edges, summary['total'], summary['unobserved'],
+                                   {name: int(total) for name, total in zip(QUADRANTS, quadrants)})
+
+    def cohorts(self, method: str = 'kmeans', clusters: int = DEFAULT_CLUSTERS,
+                cell_size: float = DEFAULT_CELL_SIZE, seed: Optional[int] = None,
+                max_iterations: int = DEFAULT_MAX_ITERATIONS) -> CohortReport:
+        """
+        Groups the observed persons into cohorts.
+
+        Args:
+            method: 'kmeans' for ``clusters`` cohorts found by k-means, or 'grid' for one
+                cohort per non-empty square cell of side ``cell_size``.
+            clusters: Number of k-means cohorts. Fewer are returned if the persons
+                occupy fewer distinct histogram cells.
+            cell_size: Side of the grid cells.
+            seed: Random seed for the k-means initialization.
+            max_iterations: Upper bound on k-means iterations.
+
+        Returns:
+            A CohortReport whose cohorts are sorted by size, largest first.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown cohort method '{method}'. Use one of: {', '.join(METHODS)}")
+        if method == 'kmeans' and clusters < 1:
+            raise ValueError("clusters must be at least 1")
+        if method == 'grid' and not cell_size > 0:
+            raise ValueError("cell_size must be positive")
+
+        histogram = self.population_histogram()
+        report = CohortReport(method, histogram.total, histogram.unobserved,
+                              quadrants=histogram.quadrants)
+        if report.observed == 0:
+            return report
+
+        if method == 'kmeans':
+            f_centers, d_centers = histogram.bin_centers()
+            weights = histogram.counts.ravel().astype(float)
+            occupied = weights > 0
+            points = np.column_stack((f_centers[occupied], d_centers[occupied]))
+            centroids = _weighted_kmeans(points, weights[occupied], min(clusters, len(points)),
+                                         np.random.default_rng(seed), max_iterations)
+            labels = [f'cluster {i + 1}' for i in range(len(centroids))]
+            report.cohorts, report.inertia = self._assign_to_centroids(centroids, labels, report.observed)
+        else:
+            report.cohorts, report.inertia = self._grid_cells(histogram, cell_size, report.observed)
+        report.cohorts.sort(key=lambda cohort: (-cohort.count, cohort.label))
+        return report
+
+    def _assign_to_centroids(self, centroids: np.ndarray, labels: List[str],
+                             observed: int) -> Tuple[List[Cohort], float]:
+        """Streams every person to its nearest centroid and accumulates exact cohort statistics."""
+        k = len(centroids)
+        counts = np.zeros(k)
+        sums = np.zeros((k, 2))
+        squares = np.zeros((k, 2))
+        for chunk in self.person_dao.iter_coordinate_arrays(self.chunk_size):
+            squared = ((chunk[:, np.newaxis, :] - centroids[np.newaxis, :, :]) ** 2).sum(axis=2)
+            nearest = squared.argmin(axis=1)
+            _accumulate(nearest, chunk, counts, sums, squares)
+        cohorts, inertia = _cohort_stats(labels, counts, sums, squares, observed,
+                                         np.full(k, np.nan))
+        return cohorts, inertia
+
+    def _grid_cells(self, histogram: PopulationHistogram, cell_size: float,
+                    observed: int) -> Tuple[List[Cohort], float]:
+        """Streams every person into a square cell and accumulates per-cell statistics."""
+        # Cells are aligned to multiples of cell_size and cover the histogram's bounds
+        f_origin = np.floor(histogram.friendliness_edges[0] / cell_size) * cell_size
+        d_origin = np.floor(histogram.dominance_edges[0] / cell_size) * cell_size
+        rows = int(np.floor((histogram.friendliness_edges[-1] - f_origin) / cell_size)) + 1
+        columns = int(np.floor((histogram.dominance_edges[-1] - d_origin) / cell_size)) + 1
+        counts = np.zeros(rows * columns)
+        sums = np.zeros((rows * columns, 2))
+        squares = np.zeros((rows * columns, 2))
+        for chunk in self.person_dao.iter_coordinate_arrays(self.chunk_size):
+            row = np.clip(((chunk[:, 0] - f_origin) // cell_size).astype(np.int64), 0, rows - 1)
+            column = np.clip(((chunk[:, 1] - d_origin) // cell_size).astype(np.int64), 0, columns - 1)
+            _accumulate(row * columns + column, chunk, counts, sums, squares)
+
+        occupied = np.flatnonzero(counts)
+        labels = []
+        for cell in occupied:
+            f_low = f_origin + (cell // columns) * cell_size
+            d_low = d_origin + (cell % columns) * cell_size
+            labels.append(f'F {f_low:g}-{f_low + cell_size:g}, D {d_low:g}-{d_low + cell_size:g}')
+        return _cohort_stats(labels, counts[occupied], sums[occupied], squares[occupied], observed,
+                             counts[occupied] / (cell_size * cell_size))
+
+
+def _padded_bounds(summary: Dict) -> Tuple[float, float, float, float]:
+    """Bounds of the observed persons, widened so that a single value still spans a bin."""
+    if summary['min_friendliness'] is None:
+        return (0.0, 1.0, 0.0, 1.0)
+    f_low, f_high = summary['min_friendliness'], summary['max_friendliness']
+    d_low, d_high = summary['min_dominance'], summary['max_dominance']
+    f_pad = 0.5 if f_high == f_low else 0.0
+    d_pad = 0.5 if d_high == d_low else 0.0
+    # histogram2d includes the right edge of the last bin, so the maxima are counted
+    return (f_low - f_pad, f_high + f_pad, d_low - d_pad, d_high + d_pad)
+
+
+def _accumulate(labels: np.ndarray, chunk: np.ndarray, counts: np.ndarray,
+                sums: np.ndarray, squares: np.ndarray):
+    size = len(counts)
+    counts += np.bincount(labels, minlength=size)
+    for axis in (0, 1):
+        sums[:, axis] += np.bincount(labels, weights=chunk[:, axis], minlength=size)
+        squares[:, axis] += np.bincount(labels, weights=chunk[:, axis] ** 2, minlength=size)
+
+
+def _cohort_stats(labels: List[str], counts: np.ndarray, sums: np.ndarray, squares: np.ndarray,
+                  observed: int, densities: np.ndarray) -> Tuple[List[Cohort], float]:
+    """Turns accumulated counts, sums and sums of squares into cohorts and their total inertia."""
+    cohorts = []
+    inertia = 0.0
+    for i, label in enumerate(labels):
+        count = counts[i]
+        if count == 0:
+            continue
+        mean = sums[i] / count
+        # Var = E[x^2] - E[x]^2, clipped against rounding below zero
+        variance = np.maximum(squares[i] / count - mean ** 2, 0.0)
+        inertia += float(variance.sum() * count)
+        cohorts.append(Cohort(
+            label=label, count=int(count), share=float(count / observed),
+            friendliness=float(mean[0]), dominance=float(mean[1]),
+            friendliness_std=float(np.sqrt(variance[0])), dominance_std=float(np.sqrt(variance[1])),
+            rms_radius=float(np.sqrt(variance.sum())), density=float(densities[i]),
+        ))
+    return cohorts, inertia
+
+
+def _weighted_kmeans(points: np.ndarray, weights: np.ndarray, k: int,
+                     rng: np.random.Generator, max_iterations: int) -> np.ndarray:
+    """Lloyd's algorithm on weighted points with k-means++ seeding. Returns (k, 2) centroids."""
+    # k-means++: each next centroid is drawn with probability proportional to weight x squared distance
+    centroids = [points[rng.choice(len(points), p=weights / weights.sum())]]
+    nearest = ((points - centroids[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        probabilities = weights * nearest
+        if probabilities.sum() == 0:
+            break
+        centroids.append(points[rng.choice(len(points), p=probabilities / probabilities.sum())])
+        nearest = np.minimum(nearest, ((points - centroids[-1]) ** 2).sum(axis=1))
+    centroids = np.array(centroids)
+
+    for _ in range(max_iterations):
+        squared = ((points[:, np.newaxis, :] - centroids[np.newaxis, :, :]) ** 2).sum(axis=2)
+        labels = squared.argmin(axis=1)
+        totals = np.bincount(labels, weights=weights, minlength=len(centroids))
+        updated = centroids.copy()
+        occupied = totals > 0
+        for axis in (0, 1):
+            sums = np.bincount(labels, weights=weights * points[:, axis], minlength=len(centroids))
+            updated[occupied, axis] = sums[occupied] / totals[occupied]
+        shift = np.abs(updated - centroids).max()
+        centroids = updated
+        if shift < CONVERGENCE_TOLERANCE:
+            break
+    return centroids
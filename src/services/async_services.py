@@ -0,0 +1,210 @@
+"""
+Asyncio service module for the Personality Analysis System.
+
+This module provides awaitable counterparts of the DAO and service methods, so the
+system can be embedded in asyncio applications without blocking the event loop on
+SQLite I/O. Calls run on a dedicated, bounded thread pool whose threads each keep
+one reused connection per database file.
+
+- Concurrency limit: at most ``max_pending`` calls may be queued or running at once;
+  further callers wait on a semaphore instead of growing the pool's queue without
+  bound, so one burst of matching requests cannot starve unrelated ones.
+- Cancellation: cancelling an awaiting task (directly or through ``timeout``) drops the
+  call if it has not started, and interrupts its running SQL statement if it has. An
+  interrupted write is rolled back.
+
+Classes:
+    AsyncExecutor: Bounded thread pool that runs blocking calls for coroutines.
+    AsyncPersonDAO: Awaitable PersonDAO methods.
+    AsyncTraitDAO: Awaitable TraitDAO methods.
+    AsyncPersonService: Awaitable PersonService methods.
+    AsyncCompanyService: Awaitable CompanyService methods.
+"""
+
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+import db_connection
+import decay
+from personality_models import DecayState, Personality
+from person_dao import PersonDAO
+from trait_dao import TraitDAO
+from services.company_service import CompanyService
+from services.person_service import PersonService
+
+# Constants
+DEFAULT_MAX_WORKERS = 4
+
+T = TypeVar('T')
+
+
+class _Call:
+    """Tracks which thread is running a call, so cancellation can interrupt it."""
+    def __init__(self, function: Callable[[], T]):
+        self.function = function
+        self.cancelled = False
+        self.thread_id: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def run(self) -> T:
+        with self.lock:
+            if self.cancelled:
+                raise asyncio.CancelledError()
+            self.thread_id = threading.get_ident()
+        try:
+            return self.function()
+        finally:
+            with self.lock:
+                self.thread_id = None
+
+    def cancel(self):
+        # Holding the lock guarantees the thread is still inside this call
+        with self.lock:
+            self.cancelled = True
+            if self.thread_id is not None:
+                db_connection.interrupt_thread(self.thread_id)
+
+
+class AsyncExecutor:
+    """Bounded thread pool that runs blocking DAO and service calls for coroutines."""
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, max_pending: Optional[int] = None):
+        """
+        Args:
+            max_workers: Number of pool threads, i.e. calls running at the same time.
+            max_pending: Calls allowed to be queued or running before callers wait
+                (default: 2 * max_workers).
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_pending is not None and max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.max_pending = max_pending or 2 * max_workers
+        self._thread_ids: List[int] = []
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-async',
+                                        initializer=self._start_thread)
+        # asyncio primitives belong to one event loop
+        self._semaphores: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+    def _start_thread(self):
+        db_connection.enable_connection_reuse()
+        self._thread_ids.append(threading.get_ident())
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_pending)
+        return semaphore
+
+    async def run(self, function: Callable[..., T], *args, timeout: Optional[float] = None, **kwargs) -> T:
+        """
+        Runs ``function(*args, **kwargs)`` on the pool and returns its result.
+
+        Raises:
+            asyncio.TimeoutError: If ``timeout`` seconds pass first; the call is cancelled.
+        """
+        async with self._semaphore():
+            call = _Call(functools.partial(function, *args, **kwargs))
+            future = asyncio.get_running_loop().run_in_executor(self._pool, call.run)
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                call.cancel()
+                future.cancel()
+                raise
+
+    def close(self):
+        """Waits for running calls, stops the threads and closes their connections, but no one else's."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        db_connection.close_reused_connections(self._thread_ids)
+        self._thread_ids.clear()
+
+    async def aclose(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self) -> 'AsyncExecutor':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
+class AsyncPersonDAO:
+    """Awaitable PersonDAO methods."""
+    def __init__(self, person_dao: PersonDAO, executor: AsyncExecutor):
+        self.person_dao = person_dao
+        self.executor = executor
+
+    async def get_person(self, name: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        return await self.executor.run(self.person_dao.get_person, name, timeout=timeout)
+
+    async def get_all(self, timeout: Optional[float] = None) -> List[Dict]:
+        return await self.executor.run(self.person_dao.get_all, timeout=timeout)
+
+    async def add_person(self, name: str, allow_similar: bool = False, timeout: Optional[float] = None):
+        return await self.executor.run(self.person_dao.add_person, name, allow_similar=allow_similar,
+                                       timeout=timeout)
+
+    async def update_personality(self, name: str, personality: Personality, n_friendliness: int,
+                                 n_dominance: int, decay: Optional[DecayState] = None,
+                                 traits: Optional[Dict[str, int]] = None,
+                                 pairs: Optional[Dict[Tuple[str, str], int]] = None,
+                                 timeout: Optional[float] = None):
+        return await self.executor.run(self.person_dao.update_personality, name, personality,
+                                       n_friendliness, n_dominance, decay=decay, traits=traits,
+                                       pairs=pairs, timeout=timeout)
+
+
+class AsyncTraitDAO:
+    """Awaitable TraitDAO methods."""
+    def __init__(self, trait_dao: TraitDAO, executor: AsyncExecutor):
+        self.trait_dao = trait_dao
+        self.executor = executor
+
+    async def get_trait(self, name: str, timeout: Optional[float] = None) -> Optional[Personality]:
+        return await self.executor.run(self.trait_dao.get_trait, name, timeout=timeout)
+
+    async def get_all(self, timeout: Optional[float] = None) -> Dict[str, Personality]:
+        return await self.executor.run(self.trait_dao.get_all, timeout=timeout)
+
+
+class AsyncPersonService:
+    """Awaitable PersonService methods."""
+    def __init__(self, person_service: PersonService, executor: AsyncExecutor):
+        self.person_service = person_service
+        self.executor = executor
+
+    async def add_description_to_person(self, person_name: str, description: str,
+                                        timeout: Optional[float] = None) -> List[str]:
+        return await self.executor.run(self.person_service.add_description_to_person,
+                                       person_name, description, timeout=timeout)
+
+    async def add_trait_to_person(self, person_name: str, trait_name: str,
+                                  timeout: Optional[float] = None):
+        return await self.executor.run(self.person_service.add_trait_to_person,
+                                       person_name, trait_name, timeout=timeout)
+
+
+class AsyncCompanyService:
+    """Awaitable CompanyService methods."""
+    def __init__(self, company_service: CompanyService, executor: AsyncExecutor):
+        self.company_service = company_service
+        self.executor = executor
+
+    async def find_matches_for_description(self, description: str, top: Optional[int] = None,
+                                           decay_half_life_days: Optional[float] = None,
+                                           percentiles: bool = False,
+                                           decay_prior_weight: float = decay.DEFAULT_PRIOR_WEIGHT,
+                                           timeout: Optional[float] = None) -> List[Tuple]:
+        return await self.executor.run(self.company_service.find_matches_for_description,
+                                       description, top=top, decay_half_life_days=decay_half_life_days,
+                                       percentiles=percentiles, decay_prior_weight=decay_prior_weight,
+                                       timeout=timeout)
+
+    async def get_profile_matches(self, name: str, top: int, percentiles: bool = False,
+                                  timeout: Optional[float] = None) -> List[Tuple]:
+        return await self.executor.run(self.company_service.get_profile_matches, name, top,
+                                       percentiles=percentiles, timeout=timeout)
@@ -8,63 +8,244 @@ It implements the core matching algorithm using Euclidean distance calculations.
 Classes:
     CompanyService: Handles company matching operations and personality analysis.
 
+Functions:
+    percentile_ranks: Converts the best distances of a population into top-percent ranks.
+
 The service provides functionality to:
 - Analyze job descriptions to extract target personality requirements
 - Calculate personality compatibility using weighted averaging
 - Rank candidates based on Euclidean distance from target personality
+- Stream the k best candidates in bounded memory for top-k queries
+- Optionally rank by time-decayed personalities, computed lazily per batch
+- Save company profiles whose rankings are maintained incrementally
+- Report each match's percentile rank among all candidates, from the ranking pass itself
+- Store open roles with precomputed targets and find the best roles for a person
 - Provide detailed matching scores and explanations
 """
 
+import heapq
+import math
+import time
+import numpy as np
+import decay
 from personality_models import Personality
+from company import Company
+from company_dao import CompanyDAO
 from person_dao import PersonDAO
 from trait_dao import TraitDAO
 from scipy.spatial import distance
-from typing import Dict, List, Tuple, Optional # Added Optional
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Optional # Added Optional
 
 class CompanyService:
     """Handles business logic related to company operations, like matching."""
 
-    def __init__(self, person_dao: PersonDAO, trait_dao: TraitDAO):
+    def __init__(self, person_dao: PersonDAO, trait_dao: TraitDAO,
+                 company_dao: Optional[CompanyDAO] = None):
         """
         Initializes the CompanyService with data access objects.
 
         Args:
             person_dao: An instance of PersonDAO.
             trait_dao: An instance of TraitDAO.
+            company_dao: An instance of CompanyDAO. Defaults to the person DAO's own
+                (see get_company_dao), which is where saved rankings must live.
         """
         self.person_dao = person_dao
         self.trait_dao = trait_dao
+        self.company_dao = company_dao if company_dao is not None else person_dao.get_company_dao()
+
+    def save_profile(self, name: str, description: str) -> Company:
+        """
+        Saves a company profile and materializes its ranking of all persons.
+
+        Later person inserts and personality updates keep the ranking current
+        without re-ranking, so reading the profile's top matches stays cheap.
+
+        Raises:
+            ValueError: If the description contains no known traits.
+        """
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("Company name must be a non-empty string.")
+        if not isinstance(description, str):
+            raise TypeError("Description must be a string")
+
+        target_personality = self._analyze_description_to_personality(description)
+        if target_personality is None:
+            raise ValueError("No valid traits found in description to form a target personality.")
+
+        company = Company(name.strip(), description, target_personality)
+        self.company_dao.create_tables()
+        self.company_dao.save_profile(company)
+        return company
+
+    def get_profile_matches(self, name: str, top: int, percentiles: bool = False) -> List[Tuple]:
+        """
+        Returns the ``top`` best (person_name, distance) matches of a saved profile.
+
+        With ``percentiles``, each match also carries its percentile rank among all
+        ranked persons, (person_name, distance, percentile); see percentile_ranks. The
+        materialized ranking is already sorted, so this only adds a count over its index.
+
+        Raises:
+            ValueError: If no profile with that name has been saved.
+        """
+        if not isinstance(top, int) or top < 1:
+            raise ValueError("top must be a positive integer")
+        self.company_dao.create_tables()
+        if self.company_dao.get_profile(name) is None:
+            raise ValueError(f"No saved profile named '{name}'.")
+        ranked = self.company_dao.get_top(name, top)
+        if not percentiles:
+            return ranked
+        return _with_percentiles(ranked, self.company_dao.count_ranked(name))
+
+    def save_roles(self, roles: Iterable[Tuple[str, str]]) -> Tuple[int, List[str]]:
+        """
+        Stores (role_name, description) pairs as open roles with their target personalities.
+
+        Each description is analyzed once here, against a single read of the lexicon, so
+        reverse matching never has to look at description text again. Roles whose
+        descriptions name no known traits are skipped.
+
+        Returns:
+            (number of roles saved, names of the skipped roles)
+        """
+        index = self.trait_dao.get_trait_index()
+        lexicon = self.trait_dao.get_all()
+        companies, skipped = [], []
+        for name, description in roles:
+            if not isinstance(name, str) or not name.strip():
+                raise ValueError("Role name must be a non-empty string.")
+            if not isinstance(description, str):
+                raise TypeError("Description must be a string")
+            weights = index.analyze(description)
+            traits = {trait: lexicon[trait] for trait in weights if trait in lexicon}
+            if not traits:
+                skipped.append(name.strip())
+                continue
+            companies.append(Company(name.strip(), description, self._weighted_average(traits, weights)))
+        self.company_dao.create_tables()
+        return self.company_dao.save_roles(companies), skipped
+
+    def find_roles_for_person(self, name: str, top: int) -> List[Tuple[str, float]]:
+        """
+        Returns the ``top`` open roles closest to a person as (role_name, distance) pairs.
+
+        The roles' targets were resolved when they were saved, so this is a nearest
+        neighbour search from the person's coordinates in the cached role index.
 
-    def find_matches_for_description(self, description: str) -> List[Tuple[str, float]]:
+        Raises:
+            ValueError: If the person does not exist.
+        """
+        if not isinstance(top, int) or top < 1:
+            raise ValueError("top must be a positive integer")
+        person = self.person_dao.get_person(name)
+        if person is None:
+            raise ValueError(f"Person '{name}' not found.")
+        personality = Personality(float(person['friendliness'] or 0.0), float(person['dominance'] or 0.0))
+        return self.company_dao.get_role_index().nearest(personality, top)
+
+    def find_matches_for_description(self, description: str,
+                                     top: Optional[int] = None,
+                                     decay_half_life_days: Optional[float] = None,
+                                     now: Optional[float] = None,
+                                     percentiles: bool = False,
+                                     decay_prior_weight: float = decay.DEFAULT_PRIOR_WEIGHT) -> List[Tuple]:
         """
         Finds people matching a personality description and returns a ranked list.
 
         Args:
             description: The textual description of the desired personality.
+            top: If given, only the ``top`` closest persons are returned. Candidates are
+                then streamed from the database through a bounded heap, which takes
+                O(n log k) time and O(k) memory.
+            decay_half_life_days: If given, persons are ranked by their time-decayed
+                personality as of ``now`` (default: the current time) instead of their
+                all-time average; see decay.py. It must be the half-life the persons'
+                decayed sums were written with, or ValueError is raised.
+            now: Reference time in seconds since the epoch for decayed ranking.
+            percentiles: Also return each person's percentile rank among all
+                candidates; see percentile_ranks.
+            decay_prior_weight: Pseudo-observations of a neutral personality added to
+                each decayed estimate, so persons whose observations are old drift
+                toward neutral as of ``now``. Requires ``decay_half_life_days``.
 
         Returns:
             A list of tuples, where each tuple contains (person_name, distance),
-            sorted by distance (ascending). Returns empty list if no matches or
-            if description yields no valid target personality.
+            or (person_name, distance, percentile) with ``percentiles``, sorted by
+            distance (ascending) with ties broken by name. Returns empty list if no
+            matches or if description yields no valid target personality.
         """
         if not isinstance(description, str):
             raise TypeError("Description must be a string")
+        if top is not None and (not isinstance(top, int) or top < 1):
+            raise ValueError("top must be a positive integer")
 
-        target_personality = self._analyze_description_to_personality(description)
+        target_personality = self.target_for_description(description)
         if target_personality is None:
              print("Warning: No valid traits found in description to form a target personality.")
              return []
 
+        return self.rank_candidates(target_personality, top, decay_half_life_days, now, percentiles,
+                                    decay_prior_weight)
+
+    def target_for_description(self, description: str) -> Optional[Personality]:
+        """Returns the target personality a description asks for, or None if it names no known traits."""
+        return self._analyze_description_to_personality(description)
+
+    def rank_candidates(self, target_personality: Personality, top: Optional[int] = None,
+                        decay_half_life_days: Optional[float] = None,
+                        now: Optional[float] = None, percentiles: bool = False,
+                        decay_prior_weight: float = decay.DEFAULT_PRIOR_WEIGHT) -> List[Tuple]:
+        """
+        Ranks this service's persons by distance to a target, ascending with ties broken by name.
+
+        With ``percentiles``, (person_name, distance, percentile) tuples are returned.
+        """
+        ranked, population = self.rank_with_population(target_personality, top, decay_half_life_days, now,
+                                                       decay_prior_weight)
+        return _with_percentiles(ranked, population) if percentiles else ranked
+
+    def rank_with_population(self, target_personality: Personality, top: Optional[int] = None,
+                             decay_half_life_days: Optional[float] = None,
+                             now: Optional[float] = None,
+                             decay_prior_weight: float = decay.DEFAULT_PRIOR_WEIGHT
+                             ) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        Ranks persons like rank_candidates and also returns how many were ranked.
+
+        The population is counted while the candidates stream through the ranking,
+        so together with the sorted result it gives exact percentile ranks without a
+        second pass.
+
+        Returns:
+            (ranked (person_name, distance) pairs, number of candidates ranked)
+        """
+        if decay_prior_weight < 0:
+            raise ValueError("decay_prior_weight cannot be negative")
+        if decay_prior_weight and decay_half_life_days is None:
+            raise ValueError("decay_prior_weight requires decay_half_life_days")
+        if decay_half_life_days is not None:
+            decay.check_recorded_half_life(self.person_dao.get_decay_half_life(), decay_half_life_days)
+            counter = _Counter(self._iter_decayed_distances(target_personality, decay_half_life_days,
+                                                            time.time() if now is None else now,
+                                                            decay_prior_weight))
+            key = lambda x: (x[1], x[0])
+            ranked = heapq.nsmallest(top, counter, key=key) if top is not None else sorted(counter, key=key)
+            return ranked, counter.count
+        if top is not None:
+            return self._find_top_matches(target_personality, top)
+
         person_dicts = self.person_dao.get_all()
         if not person_dicts:
-            return [] # No persons in the database
+            return [], 0 # No persons in the database
 
         distances = []
         for person_dict in person_dicts:
             # Ensure required keys exist and handle potential None values gracefully
             friendliness = person_dict.get('friendliness', 0.0)
             dominance = person_dict.get('dominance', 0.0)
-            name = person_dict.get('name')
+            name = person_dict.get('person')
 
             if name is None:
                 print(f"Warning: Skipping person record with missing name: {person_dict}")
@@ -77,10 +258,31 @@ class CompanyService:
             dist = self._calculate_distance(person_personality, target_personality)
             distances.append((name, dist))
 
-        # Sort by distance (ascending)
-        distances.sort(key=lambda x: x[1])
+        # Sort by distance (ascending), then name for a deterministic order
+        distances.sort(key=lambda x: (x[1], x[0]))
 
-        return distances
+        return distances, len(distances)
+
+    def _find_top_matches(self, target: Personality, top: int) -> Tuple[List[Tuple[str, float]], int]:
+        """Streams candidates from the DAO, keeps only the ``top`` closest and counts them all."""
+        target_f = target.friendliness
+        target_d = target.dominance
+        candidates = _Counter(
+            (name, math.hypot(float(friendliness or 0.0) - target_f, float(dominance or 0.0) - target_d))
+            for name, friendliness, dominance in self.person_dao.iter_coordinates()
+        )
+        return heapq.nsmallest(top, candidates, key=lambda x: (x[1], x[0])), candidates.count
+
+    def _iter_decayed_distances(self, target: Personality, half_life_days: float, now: float,
+                                prior_weight: float):
+        """Yields (name, distance) using decayed personalities computed one batch at a time."""
+        for batch in self.person_dao.iter_decay_batches():
+            names, updated_at, weight, f_sum, d_sum = zip(*batch)
+            friendliness, dominance = decay.decayed_personalities(
+                np.array(updated_at, dtype=float), weight, f_sum, d_sum, now, half_life_days,
+                prior_weight=prior_weight)
+            distances = np.hypot(friendliness - target.friendliness, dominance - target.dominance)
+            yield from zip(names, distances.tolist())
 
     def _analyze_description_to_personality(self, description: str) -> Optional[Personality]:
         """Analyzes text description to determine an average target personality."""
@@ -102,13 +304,8 @@ class CompanyService:
 
     def _get_trait_weights_from_description(self, description: str) -> Dict[str, float]:
         """Extracts trait names and assigns weights from a description string."""
-        words = description.lower().split()
-        trait_weights = {}
-        for word in words:
-            # Check existence via injected DAO
-            if self.trait_dao.get_trait(word):
-                 trait_weights[word] = 1.0  # Assign weight 1.0 for now
-        return trait_weights
+        # Resolves inflections and misspellings to canonical trait names
+        return self.trait_dao.get_trait_index().analyze(description)
 
     @staticmethod
     def _calculate_distance(p1: Personality, p2: Personality) -> float:
@@ -129,4 +326,43 @@ class CompanyService:
         avg_friendliness = sum(trait.friendliness * weights[trait_name] for trait_name, trait in traits.items()) / total_weight
         avg_dominance = sum(trait.dominance * weights[trait_name] for trait_name, trait in traits.items()) / total_weight
 
-        return Personality(avg_friendliness, avg_dominance)
\ No newline at end of file
+        return Personality(avg_friendliness, avg_dominance)
+
+
+class _Counter:
+    """Iterates over ``items`` and counts how many have been consumed."""
+    def __init__(self, items: Iterable):
+        self.items = iter(items)
+        self.count = 0
+
+    def __iter__(self) -> Iterator:
+        for item in self.items:
+            self.count += 1
+            yield item
+
+
+def percentile_ranks(distances: Sequence[float], population: int) -> List[float]:
+    """
+    Returns the percentile rank of each of the best ``distances`` of a population.
+
+    ``distances`` must be the smallest distances of the population in ascending
+    order, as every ranking returns them, so each one's rank is its position and no
+    further sorting or counting is needed. A rank is reported as "top p%", with p the
+    position as a share of the population: 100 * (1 + candidates strictly closer) /
+    population. Tied candidates all get the best position among them, so they can
+    be in a smaller top share than the number of candidates at least as close. The
+    closest of 200 candidates is in the top 0.5%, and so is any candidate tied with it.
+    """
+    if population < len(distances):
+        raise ValueError("population cannot be smaller than the number of distances")
+    ranks, rank, previous = [], 0, None
+    for position, dist in enumerate(distances, start=1):
+        if dist != previous:
+            rank, previous = position, dist
+        ranks.append(100.0 * rank / population)
+    return ranks
+
+
+def _with_percentiles(ranked: List[Tuple[str, float]], population: int) -> List[Tuple[str, float, float]]:
+    ranks = percentile_ranks([dist for _, dist in ranked], population)
+    return [(name, dist, rank) for (name, dist), rank in zip(ranked, ranks)]
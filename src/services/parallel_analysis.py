@@ -0,0 +1,66 @@
+"""
+Parallel description analysis module for the Personality Analysis System.
+
+This module turns batches of free-text descriptions into trait weights using a pool
+of worker processes. Each worker builds its own read-only TraitIndex from the lexicon
+once, when it starts, and then analyzes batches of descriptions without touching the
+database. Results are returned in input order, so the caller can apply them with a
+single-threaded write step.
+
+Functions:
+    analyze_descriptions: Analyzes descriptions in parallel and returns their trait weights.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence
+from fuzzy_index import TraitIndex
+
+# Constants
+DEFAULT_BATCH_SIZE = 256
+
+# Per-process index, built by _init_worker
+_worker_index: Optional[TraitIndex] = None
+
+
+def _init_worker(trait_names: Sequence[str]):
+    global _worker_index
+    _worker_index = TraitIndex(trait_names)
+
+
+def _analyze_batch(descriptions: Sequence[str]) -> List[Dict[str, float]]:
+    return [_worker_index.analyze(description) for description in descriptions]
+
+
+def analyze_descriptions(descriptions: Sequence[str], trait_names: Iterable[str],
+                         workers: Optional[int] = None,
+                         batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, float]]:
+    """
+    Analyzes descriptions into {trait: weight} dictionaries, in input order.
+
+    Args:
+        descriptions: The description texts to analyze.
+        trait_names: The lexicon's canonical trait names.
+        workers: Number of worker processes (default: CPU count). With 1 worker, or
+            when everything fits in one batch, analysis runs in this process.
+        batch_size: Descriptions sent to a worker per task.
+    """
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be at least 1")
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    trait_names = tuple(trait_names)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(descriptions) <= batch_size:
+        index = TraitIndex(trait_names)
+        return [index.analyze(description) for description in descriptions]
+
+    batches = [descriptions[i:i + batch_size] for i in range(0, len(descriptions), batch_size)]
+    results: List[Dict[str, float]] = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches)),
+                             initializer=_init_worker, initargs=(trait_names,)) as pool:
+        # map() yields batch results in submission order
+        for batch_result in pool.map(_analyze_batch, batches):
+            results.extend(batch_result)
+    return results
@@ -11,61 +11,107 @@ Classes:
 The service provides functionality to:
 - Add individual traits to person profiles
 - Process natural language descriptions to extract personality traits
+- Analyze batches of descriptions in parallel for bulk enrichment
 - Calculate updated personality scores using weighted averaging
+- Maintain exponentially time-decayed observation sums in constant time per update
 - Validate and manage person-trait relationships
+- Count which traits descriptions name together, in the same write as the description
+- Merge the profiles of persons stored under near-duplicate names
 - Handle dynamic personality profile updates
 """
 
-from typing import Dict
-from personality_models import Personality, PersonStats
-from person_dao import PersonDAO
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+import decay
+from personality_models import DecayState, Personality, PersonStats
+from person_dao import PersonDAO, cooccurrences
 from trait_dao import TraitDAO
+from services import parallel_analysis
 # Import Company potentially needed if description analysis stays coupled, or move analysis logic
 # from company import Company
 
 class PersonService:
     """Handles business logic related to Person entities."""
 
-    def __init__(self, person_dao: PersonDAO, trait_dao: TraitDAO):
+    def __init__(self, person_dao: PersonDAO, trait_dao: TraitDAO,
+                 decay_half_life_days: Optional[float] = None,
+                 clock: Callable[[], float] = time.time):
         """
         Initializes the PersonService with data access objects.
 
         Args:
-            person_dao: An instance of PersonDAO.
+            person_dao: An instance of PersonDAO, or a BufferedPersonDAO for write-behind updates.
             trait_dao: An instance of TraitDAO.
+            decay_half_life_days: Half-life used when folding new observations into a
+                person's time-decayed sums. It is recorded by the first decayed write,
+                and writes with a different half-life raise ValueError. Defaults to the
+                recorded half-life, or DEFAULT_HALF_LIFE_DAYS if none is recorded yet.
+            clock: Returns the current time in seconds since the epoch.
         """
         self.person_dao = person_dao
         self.trait_dao = trait_dao
+        self.decay_half_life_days = decay_half_life_days
+        self.clock = clock
+        self._half_life_recorded = False
+
+    def _record_half_life(self):
+        """Records this service's decay half-life with the DAO before its first decayed write."""
+        if not self._half_life_recorded:
+            if self.decay_half_life_days is None:
+                recorded = self.person_dao.get_decay_half_life()
+                self.decay_half_life_days = decay.DEFAULT_HALF_LIFE_DAYS if recorded is None else recorded
+            self.person_dao.record_decay_half_life(self.decay_half_life_days)
+            self._half_life_recorded = True
 
     def add_trait_to_person(self, person_name: str, trait_name: str):
         """Adds a trait to a person and updates their personality."""
         trait = self.trait_dao.get_trait(trait_name)
         if not trait:
             raise ValueError(f"Trait '{trait_name}' not found in database")
+        self._observe_traits(person_name, [(trait_name, trait)])
 
-        person_dict = self.person_dao.get_person(person_name)
-        if not person_dict:
-            # Consider creating the person or raising a specific error
-            raise ValueError(f"Person '{person_name}' not found.")
-
-        # Map dictionary to PersonStats object
-        person_stats = PersonStats(
-            name=person_dict['name'],
-            personality=Personality(person_dict['friendliness'], person_dict['dominance']),
-            n_friendliness=person_dict['n_friendliness'],
-            n_dominance=person_dict['n_dominance']
-        )
+    def _observe_traits(self, person_name: str, traits: List[Tuple[str, Personality]],
+                        description: bool = False):
+        """
+        Folds observed traits into a person's profile with a single write.
 
-        # Calculate new personality
-        new_personality = self._calculate_new_personality(person_stats, trait)
+        With ``description``, the traits were named together by one description and
+        their co-occurrence counts are written in the same transaction.
+        """
+        self._record_half_life()
+        now = self.clock()
 
-        # Update via DAO
-        self.person_dao.update_personality(
-            person_name,
-            new_personality,
-            person_stats.n_friendliness + 1,
-            person_stats.n_dominance + 1
-        )
+        def observe(person_dict: Dict) -> Tuple:
+            # Map dictionary to PersonStats object
+            person_stats = PersonStats(
+                name=person_dict['person'],
+                personality=Personality(person_dict['friendliness'], person_dict['dominance']),
+                n_friendliness=person_dict['n_friendliness'],
+                n_dominance=person_dict['n_dominance']
+            )
+
+            decay_state = DecayState(
+                updated_at=person_dict.get('decay_updated_at'),
+                weight=person_dict.get('decay_weight') or 0.0,
+                friendliness_sum=person_dict.get('decay_f_sum') or 0.0,
+                dominance_sum=person_dict.get('decay_d_sum') or 0.0,
+            )
+            observed: Dict[str, int] = {}
+            for trait_name, trait in traits:
+                # Calculate new personality
+                person_stats = PersonStats(
+                    name=person_stats.name,
+                    personality=self._calculate_new_personality(person_stats, trait),
+                    n_friendliness=person_stats.n_friendliness + 1,
+                    n_dominance=person_stats.n_dominance + 1
+                )
+                decay_state = decay.observe(decay_state, trait, now, self.decay_half_life_days)
+                observed[trait_name] = observed.get(trait_name, 0) + 1
+            return (person_stats.personality, person_stats.n_friendliness, person_stats.n_dominance,
+                    decay_state, observed, cooccurrences(observed) if description else None)
+
+        # Read and write in one atomic step, so concurrent observations are not lost
+        self.person_dao.modify_person(person_name, observe)
 
     def add_description_to_person(self, person_name: str, description: str):
         """Adds a description and updates personality based on contained traits."""
@@ -83,22 +129,94 @@ class PersonService:
         description = description.strip()
 
         trait_weights = self._analyze_description_for_traits(description)
+        return self.apply_trait_weights(person_name, trait_weights)
 
+    def apply_trait_weights(self, person_name: str, trait_weights: Dict[str, float]) -> List[str]:
+        """
+        Applies already-analyzed trait weights to a person and returns the traits added.
+
+        All traits of the description are folded into the profile in one transaction,
+        together with the counts of which traits the description named together.
+        """
         if not trait_weights:
             raise ValueError("No valid traits found in the provided description.")
 
-        added_traits = []
+        traits = []
         for trait_name in trait_weights:
+            trait = self.trait_dao.get_trait(trait_name)
+            if not trait:
+                print(f"Warning: Trait '{trait_name}' not found in database")  # Log missing traits but continue
+                continue
+            traits.append((trait_name, trait))
+
+        if not traits:
+            raise ValueError("No valid traits could be added from the description.")
+
+        self._observe_traits(person_name, traits, description=True)
+        return [trait_name for trait_name, _ in traits]
+
+    def add_descriptions(self, items: Sequence[Tuple[str, str]],
+                         workers: Optional[int] = None) -> List[Tuple[str, Union[List[str], Exception]]]:
+        """
+        Applies many (person_name, description) pairs, analyzing them in parallel.
+
+        Descriptions are turned into trait weights by a process pool, where each worker
+        holds its own read-only copy of the lexicon index. The resulting weights are then
+        applied one by one in input order on this thread, so database writes stay
+        single-threaded. A failing item does not stop the others.
+
+        Args:
+            items: (person_name, description) pairs.
+            workers: Number of analysis processes (default: one per CPU; 1 runs inline).
+
+        Returns:
+            One (person_name, added_traits or exception) tuple per input item, in order.
+        """
+        # str(None) would be the name "None"
+        names = ['' if name is None else str(name).strip() for name, _ in items]
+        trait_names = [trait for trait, _, _ in self.trait_dao.iter_traits()]
+        all_weights = parallel_analysis.analyze_descriptions(
+            [str(description).strip() for _, description in items], trait_names, workers=workers)
+
+        results = []
+        for person_name, trait_weights in zip(names, all_weights):
             try:
-                self.add_trait_to_person(person_name, trait_name)
-                added_traits.append(trait_name)
+                if not person_name:
+                    raise ValueError("Person name cannot be empty")
+                results.append((person_name, self.apply_trait_weights(person_name, trait_weights)))
             except ValueError as e:
-                print(f"Warning: {e}")  # Log missing traits but continue
+                results.append((person_name, e))
+        return results
 
-        if not added_traits:
-            raise ValueError("No valid traits could be added from the description.")
+    def dedupe(self, dry_run: bool = False) -> List[Tuple[str, List[str]]]:
+        """
+        Merges persons stored under near-duplicate names, such as "Jon Doe" and "John Doe".
+
+        In each group of similar names the person with the most observations is kept
+        (ties go to the first name) and the others are merged into it, see
+        ``PersonDAO.merge_persons``.
 
-        return added_traits
+        Args:
+            dry_run: Only report what would be merged.
+
+        Returns:
+            (kept person, [merged persons]) for every group, sorted by kept person.
+        """
+        plan = []
+        for group in self.person_dao.find_duplicate_groups():
+            persons = {name: self.person_dao.get_person(name) for name in group}
+            group = [name for name in group if persons[name] is not None]
+            if len(group) < 2:
+                continue
+            keep = min(group, key=lambda name: (
+                -(persons[name]['n_friendliness'] + persons[name]['n_dominance']), name))
+            plan.append((keep, [name for name in group if name != keep]))
+        plan.sort()
+        if not dry_run and plan:
+            self._record_half_life()
+            for keep, duplicates in plan:
+                self.person_dao.merge_persons(keep, duplicates, self.decay_half_life_days)
+        return plan
 
     def _calculate_new_personality(
         self,
@@ -137,9 +255,5 @@ class PersonService:
         if not isinstance(description, str):
             raise TypeError("Description must be a string")
 
-        words = description.lower().split()
-        trait_weights = {}
-        for word in words:
-            if self.trait_dao.get_trait(word):  # Check existence via injected DAO
-                trait_weights[word] = 1.0  # Assign weight 1.0 for now
-        return trait_weights
\ No newline at end of file
+        # Resolves inflections and misspellings to canonical trait names
+        return self.trait_dao.get_trait_index().analyze(description)
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Trait service module for the Personality Analysis System.
+
+This module contains the business logic for changing the coordinates of traits that
+persons have already observed. Person profiles store only running means, so a moved
+trait would otherwise leave every profile built from it stale until all descriptions
+were re-ingested. Instead, each persons database keeps how often every person
+observed every trait (``person_traits``), and a trait change is folded into exactly
+the persons who observed it with one set-based update per database (see
+``PersonDAO.apply_trait_deltas``).
+
+The lexicon is shared by all tenants, so the service recomputes every persons
+database it is given. The trait is written first and the persons databases after;
+if the process stops in between, profiles keep the old coordinates until the next
+change of that trait.
+
+It also reports which traits descriptions name together, from the co-occurrence
+counts that PersonService keeps as descriptions are applied (``trait_pairs``).
+
+Classes:
+    TraitService: Updates traits and recomputes the profiles that observed them.
+
+The service provides functionality to:
+- Update one trait and shift the profiles of the persons who observed it
+- Import a lexicon and shift the profiles affected by every changed trait
+- Report the traits named together with a trait, or the most frequent pairs overall
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import lexicon
+from personality_models import Personality
+from person_dao import PersonDAO
+from trait_dao import TraitDAO
+
+
+class TraitService:
+    """Handles business logic related to trait changes."""
+
+    def __init__(self, trait_dao: TraitDAO, person_daos: Iterable[PersonDAO]):
+        """
+        Initializes the TraitService with data access objects.
+
+        Args:
+            trait_dao: An instance of TraitDAO.
+            person_daos: The persons databases whose profiles follow trait changes,
+                for example one per tenant.
+        """
+        self.trait_dao = trait_dao
+        self.person_daos = list(person_daos)
+
+    def update_trait(self, name: str, personality: Personality) -> int:
+        """
+        Changes a trait's coordinates and recomputes the persons who observed it.
+
+        Returns:
+            The number of person profiles recomputed, over all persons databases.
+
+        Raises:
+            ValueError: If the trait does not exist or the scores are out of range.
+        """
+        name = name.strip().lower()
+        low, high = lexicon.SCORE_RANGE
+        if not (low <= personality.friendliness <= high) or not (low <= personality.dominance <= high):
+            raise ValueError("Personality scores must be between -10 and 10")
+        previous = self.trait_dao.update_trait(name, personality)
+        if previous is None:
+            raise ValueError(f"Trait '{name}' not found in database")
+        return self._apply_deltas({name: _delta(previous, personality)})
+
+    def import_traits(self, traits: Dict[str, Personality], prune: bool = False,
+                      dry_run: bool = False) -> Tuple[lexicon.LexiconDiff, int]:
+        """
+        Imports a lexicon like ``TraitDAO.import_traits`` and recomputes the persons
+        who observed any changed trait.
+
+        Persons keep the observations of pruned traits at their last coordinates.
+
+        Returns:
+            The diff, and the number of person profiles recomputed (0 for a dry run).
+        """
+        diff = self.trait_dao.import_traits(traits, prune=prune, dry_run=dry_run)
+        if dry_run:
+            return diff, 0
+        deltas = {name: _delta(diff.previous[name], traits[name]) for name in diff.changed}
+        return diff, self._apply_deltas(deltas)
+
+    def cooccurring_traits(self, trait: str, top: Optional[int] = None) -> Tuple[int, List[Tuple[str, int]]]:
+        """
+        Returns how many descriptions named a trait and the traits named with it most often.
+
+        Counts are summed over all persons databases. Each database answers from an
+        index range of ``trait_pairs``, without reading any description.
+
+        Returns:
+            (descriptions naming the trait, [(other_trait, descriptions naming both)]),
+            sorted by count descending, then name.
+        """
+        trait = trait.strip().lower()
+        if top is not None and (not isinstance(top, int) or top < 1):
+            raise ValueError("top must be a positive integer")
+        if len(self.person_daos) == 1:
+            self.person_daos[0].create_tables()
+            return self.person_daos[0].get_cooccurring(trait, top)
+        total, partners = 0, Counter()
+        for person_dao in self.person_daos:
+            person_dao.create_tables()
+            # Every partner is needed for exact sums; a trait has at most one per lexicon entry
+            descriptions, pairs = person_dao.get_cooccurring(trait)
+            total += descriptions
+            partners.update(dict(pairs))
+        return total, sorted(partners.items(), key=lambda pair: (-pair[1], pair[0]))[:top]
+
+    def top_pairs(self, top: Optional[int] = None) -> List[Tuple[str, str, int]]:
+        """Returns the (trait, other, descriptions) pairs named together most often, summed over all databases."""
+        if top is not None and (not isinstance(top, int) or top < 1):
+            raise ValueError("top must be a positive integer")
+        if len(self.person_daos) == 1:
+            self.person_daos[0].create_tables()
+            return self.person_daos[0].get_top_pairs(top)
+        pairs = Counter()
+        for person_dao in self.person_daos:
+            person_dao.create_tables()
+            pairs.update({(trait, other): count for trait, other, count in person_dao.get_top_pairs()})
+        ranked = sorted(pairs.items(), key=lambda pair: (-pair[1], pair[0]))[:top]
+        return [(trait, other, count) for (trait, other), count in ranked]
+
+    def _apply_deltas(self, deltas: Dict[str, Tuple[float, float]]) -> int:
+        updated = 0
+        for person_dao in self.person_daos:
+            person_dao.create_tables()
+            updated += person_dao.apply_trait_deltas(deltas)
+        return updated
+
+
+def _delta(old: Personality, new: Personality) -> Tuple[float, float]:
+    return (new.friendliness - old.friendliness, new.dominance - old.dominance)
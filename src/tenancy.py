@@ -0,0 +1,122 @@
+"""
+Tenant routing module for the Personality Analysis System.
+
+Each tenant (client company) keeps its candidate pool in its own persons database,
+``<tenant_dir>/<tenant>/persons.db``, so ingestion for one tenant never waits on
+another tenant's write lock. The trait lexicon stays in one shared database.
+
+The router maps tenants to their DAOs and runs cross-tenant queries by scattering
+the work to every shard on a thread pool (SQLite releases the GIL while it reads)
+and merging the shards' already sorted results with a k-way merge.
+
+Classes:
+    TenantRouter: Maps tenants to their databases and runs cross-tenant queries.
+"""
+
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+import db_connection
+import decay
+from person_dao import PersonDAO
+from trait_dao import TraitDAO
+from services.company_service import CompanyService, percentile_ranks
+
+# Constants
+PERSONS_DB = 'persons.db'
+DEFAULT_MAX_WORKERS = 8
+
+T = TypeVar('T')
+
+
+class TenantRouter:
+    """Maps tenants to their database files and fans queries out across them."""
+    def __init__(self, trait_dao: Optional[TraitDAO] = None, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Args:
+            trait_dao: The shared lexicon. Defaults to the configured traits database.
+            max_workers: Maximum number of shards queried at the same time.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.trait_dao = trait_dao if trait_dao is not None else TraitDAO()
+        self.max_workers = max_workers
+
+    def persons_db(self, tenant: str) -> str:
+        """Returns the path of a tenant's persons database."""
+        return db_connection.resolve_db_path(PERSONS_DB, tenant)
+
+    def person_dao(self, tenant: str) -> PersonDAO:
+        return PersonDAO(self.persons_db(tenant))
+
+    def tenants(self) -> List[str]:
+        """Lists the tenants that have a persons database, sorted by name."""
+        return db_connection.list_tenants(PERSONS_DB)
+
+    def scatter(self, operation: Callable[[str], T],
+                tenants: Optional[Iterable[str]] = None) -> Dict[str, T]:
+        """
+        Runs ``operation(tenant)`` for every tenant concurrently.
+
+        Returns {tenant: result}. The first exception raised by any shard is re-raised
+        after all shards have finished.
+        """
+        tenants = list(self.tenants() if tenants is None else tenants)
+        if not tenants:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tenants)),
+                                thread_name_prefix='tenant-shard') as pool:
+            futures = {tenant: pool.submit(operation, tenant) for tenant in tenants}
+        return {tenant: future.result() for tenant, future in futures.items()}
+
+    def find_matches(self, description: str, top: Optional[int] = None,
+                     tenants: Optional[Iterable[str]] = None,
+                     decay_half_life_days: Optional[float] = None,
+                     percentiles: bool = False,
+                     decay_prior_weight: float = decay.DEFAULT_PRIOR_WEIGHT) -> List[Tuple]:
+        """
+        Ranks persons of all (or the given) tenants against a description.
+
+        The description is analyzed once against the shared lexicon; each shard then
+        ranks its own persons (keeping only its ``top`` best when given) and the sorted
+        shard results are merged. ``decay_half_life_days`` and ``decay_prior_weight``
+        rank by time-decayed personalities, as in CompanyService.find_matches_for_description.
+
+        With ``percentiles``, each match also carries its percentile rank among the
+        candidates of all queried tenants. Each shard's top results include every one
+        of its candidates in the overall top, so positions in the merged result are
+        exact overall ranks, and the population is the sum of the shards' counts.
+
+        Returns:
+            (tenant, person_name, distance) tuples, or (tenant, person_name, distance,
+            percentile) with ``percentiles``, sorted by distance, then person name, then
+            tenant. Empty if the description names no known traits.
+        """
+        if top is not None and (not isinstance(top, int) or top < 1):
+            raise ValueError("top must be a positive integer")
+        tenants = list(self.tenants() if tenants is None else tenants)
+        if not tenants:
+            return []
+        now = time.time()
+        target = CompanyService(self.person_dao(tenants[0]), self.trait_dao).target_for_description(description)
+        if target is None:
+            return []
+
+        def rank_shard(tenant: str) -> Tuple[List[Tuple[str, str, float]], int]:
+            person_dao = self.person_dao(tenant)
+            person_dao.create_tables()
+            ranked, population = CompanyService(person_dao, self.trait_dao).rank_with_population(
+                target, top, decay_half_life_days, now, decay_prior_weight)
+            return [(tenant, name, dist) for name, dist in ranked], population
+
+        shard_results = self.scatter(rank_shard, tenants)
+        merged = heapq.merge(*(ranked for ranked, _ in shard_results.values()),
+                             key=lambda match: (match[2], match[1], match[0]))
+        matches = list(itertools.islice(merged, top))
+        if not percentiles:
+            return matches
+        population = sum(count for _, count in shard_results.values())
+        ranks = percentile_ranks([dist for _, _, dist in matches], population)
+        return [(*match, rank) for match, rank in zip(matches, ranks)]
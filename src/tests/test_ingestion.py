@@ -0,0 +1,423 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import db_connection
+import lexicon
+import name_keys
+import person_commands
+import schema
+from person_dao import PersonDAO, SimilarPersonError
+from personality_models import Personality
+from services import parallel_analysis
+from services.person_service import PersonService
+from services.trait_service import TraitService
+from trait_dao import TraitDAO
+from write_buffer import BufferedPersonDAO
+
+
+class TestLexiconImport(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.trait_dao = TraitDAO(os.path.join(self.tmp_dir.name, 'traits.db'))
+        self.trait_dao.create_tables()
+
+    def tearDown(self):
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(content)
+        return path
+
+    def test_import_reports_added_changed_and_removed(self):
+        self.trait_dao.add_traits([('friendly', 7.0, 6.0), ('quiet', 3.0, 2.0), ('strict', 2.0, 8.0)])
+        path = self._write('lexicon.csv', 'trait,friendliness,dominance\n'
+                                          'Friendly,7.0,6.0\nquiet,3.5,2.0\nleader,9,9\n')
+
+        diff = self.trait_dao.import_traits(lexicon.load_lexicon(path), prune=True)
+
+        self.assertEqual(diff.added, ['leader'])
+        self.assertEqual(diff.changed, ['quiet'])
+        self.assertEqual(diff.removed, ['strict'])
+        self.assertEqual(diff.unchanged, 1)
+        self.assertEqual(self.trait_dao.get_trait('quiet'), Personality(3.5, 2.0))
+        self.assertIsNone(self.trait_dao.get_trait('strict'))
+
+    def test_import_without_prune_keeps_missing_traits(self):
+        self.trait_dao.add_traits([('strict', 2.0, 8.0)])
+        path = self._write('lexicon.jsonl', '{"trait": "leader", "friendliness": 9, "dominance": 9}\n')
+        diff = self.trait_dao.import_traits(lexicon.load_lexicon(path))
+        self.assertEqual(diff.removed, ['strict'])
+        self.assertIsNotNone(self.trait_dao.get_trait('strict'))
+
+    def test_dry_run_does_not_write(self):
+        path = self._write('lexicon.csv', 'leader,9,9\n')
+        diff = self.trait_dao.import_traits(lexicon.load_lexicon(path), dry_run=True)
+        self.assertEqual(diff.added, ['leader'])
+        self.assertIsNone(self.trait_dao.get_trait('leader'))
+
+    def test_out_of_range_scores_are_rejected_with_line_numbers(self):
+        path = self._write('lexicon.csv', 'leader,9,9\nodd,11,0\nworse,0,-12\n')
+        with self.assertRaises(ValueError) as ctx:
+            lexicon.load_lexicon(path, chunk_size=2)
+        self.assertIn('line', str(ctx.exception).lower())
+        self.assertIn('2', str(ctx.exception))
+
+    def test_non_numeric_score_is_rejected(self):
+        path = self._write('lexicon.csv', 'leader,high,9\n')
+        with self.assertRaises(ValueError):
+            lexicon.load_lexicon(path)
+
+    def test_export_round_trips(self):
+        self.trait_dao.add_traits([('friendly', 7.0, 6.0), ('leader', 9.0, 9.0)])
+        path = os.path.join(self.tmp_dir.name, 'export.jsonl')
+        self.assertEqual(lexicon.write_lexicon(path, self.trait_dao.iter_traits()), 2)
+        self.assertEqual(lexicon.load_lexicon(path),
+                         {'friendly': Personality(7.0, 6.0), 'leader': Personality(9.0, 9.0)})
+
+
+class PersonTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.person_dao = PersonDAO(os.path.join(self.tmp_dir.name, 'persons.db'))
+        self.person_dao.create_tables()
+        self.trait_dao = TraitDAO(os.path.join(self.tmp_dir.name, 'traits.db'))
+        self.trait_dao.create_tables()
+        self.trait_dao.add_traits([('friendly', 7.0, 6.0), ('strict', 2.0, 8.0)])
+        for name in ('Alice', 'Bob'):
+            self.person_dao.add_person(name)
+
+    def tearDown(self):
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+
+class TestWriteBehindBuffer(PersonTestCase):
+    def test_updates_are_coalesced_and_visible_through_the_buffer(self):
+        with BufferedPersonDAO(self.person_dao, max_pending=100, max_delay=60) as buffered:
+            service = PersonService(buffered, self.trait_dao)
+            with mock.patch.object(self.person_dao, 'update_personalities',
+                                   wraps=self.person_dao.update_personalities) as write:
+                service.add_description_to_person('Alice', 'friendly strict')
+                service.add_description_to_person('Alice', 'friendly')
+                self.assertEqual(self.person_dao.get_person('Alice')['n_friendliness'], 0)
+                self.assertEqual(buffered.get_person('Alice')['n_friendliness'], 3)
+                self.assertEqual(buffered.flush(), 1)
+                write.assert_called_once()
+
+        alice = self.person_dao.get_person('Alice')
+        self.assertEqual(alice['n_friendliness'], 3)
+        self.assertAlmostEqual(alice['friendliness'], (7.0 + 2.0 + 7.0) / 3)
+        # The coalesced write carried the decayed sums of all three observations
+        self.assertAlmostEqual(alice['decay_weight'], 3.0, places=4)
+        self.assertAlmostEqual(alice['decay_f_sum'] / alice['decay_weight'], alice['friendliness'], places=4)
+
+    def test_size_threshold_triggers_flush(self):
+        buffered = BufferedPersonDAO(self.person_dao, max_pending=2, max_delay=60)
+        buffered.update_personality('Alice', Personality(1.0, 1.0), 1, 1)
+        self.assertEqual(buffered.pending_count, 1)
+        buffered.update_personality('Bob', Personality(2.0, 2.0), 1, 1)
+        self.assertEqual(buffered.pending_count, 0)
+        self.assertEqual(self.person_dao.get_person('Bob')['friendliness'], 2.0)
+        buffered.close()
+
+    def test_time_threshold_triggers_flush(self):
+        buffered = BufferedPersonDAO(self.person_dao, max_pending=100, max_delay=0.05)
+        buffered.update_personality('Alice', Personality(1.0, 1.0), 1, 1)
+        deadline = time.monotonic() + 5
+        while buffered.pending_count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.person_dao.get_person('Alice')['friendliness'], 1.0)
+        buffered.close()
+
+    def test_delegated_reads_see_buffered_updates(self):
+        with BufferedPersonDAO(self.person_dao, max_pending=100, max_delay=60) as buffered:
+            PersonService(buffered, self.trait_dao).add_description_to_person('Alice', 'friendly strict')
+            self.assertEqual(buffered.get_trait_counts('Alice'), {'friendly': 1, 'strict': 1})
+            self.assertEqual(buffered.pending_count, 0)
+            buffered.update_personality('Bob', Personality(5.0, 4.0), 1, 1)
+            self.assertIn(('Bob', 5.0, 4.0), list(buffered.iter_coordinates()))
+
+    def test_flush_writes_without_blocking_the_buffer(self):
+        writing, release = threading.Event(), threading.Event()
+        write = self.person_dao.update_personalities
+
+        def slow_write(rows):
+            writing.set()
+            release.wait(5)
+            write(rows)
+
+        with BufferedPersonDAO(self.person_dao, max_pending=100, max_delay=60) as buffered:
+            buffered.update_personality('Alice', Personality(1.0, 1.0), 1, 1)
+            with mock.patch.object(self.person_dao, 'update_personalities', side_effect=slow_write):
+                flusher = threading.Thread(target=buffered.flush)
+                flusher.start()
+                self.assertTrue(writing.wait(5))
+                # Neither call waits for the write in progress, and the read sees it
+                buffered.update_personality('Bob', Personality(2.0, 2.0), 1, 1)
+                self.assertEqual(buffered.get_person('Alice')['friendliness'], 1.0)
+                self.assertEqual(buffered.pending_count, 2)
+                release.set()
+                flusher.join()
+            self.assertEqual(self.person_dao.get_person('Alice')['friendliness'], 1.0)
+            self.assertEqual(buffered.pending_count, 1)  # Bob
+        self.assertEqual(self.person_dao.get_person('Bob')['friendliness'], 2.0)
+
+    def test_failed_flush_keeps_updates_for_the_next(self):
+        with BufferedPersonDAO(self.person_dao, max_pending=100, max_delay=60) as buffered:
+            buffered.update_personality('Alice', Personality(1.0, 1.0), 1, 1, traits={'friendly': 1})
+            with mock.patch.object(self.person_dao, 'update_personalities', side_effect=OSError('disk full')):
+                with self.assertRaises(OSError):
+                    buffered.flush()
+            buffered.update_personality('Alice', Personality(2.0, 2.0), 2, 2, traits={'friendly': 1})
+            self.assertEqual(buffered.flush(), 1)
+        self.assertEqual(self.person_dao.get_person('Alice')['friendliness'], 2.0)
+        self.assertEqual(self.person_dao.get_trait_counts('Alice'), {'friendly': 2})
+
+    def test_close_flushes_and_rejects_further_updates(self):
+        buffered = BufferedPersonDAO(self.person_dao, max_pending=100, max_delay=60)
+        buffered.update_personality('Alice', Personality(3.0, 3.0), 1, 1)
+        buffered.close()
+        self.assertEqual(self.person_dao.get_person('Alice')['friendliness'], 3.0)
+        with self.assertRaises(RuntimeError):
+            buffered.update_personality('Alice', Personality(4.0, 4.0), 2, 2)
+
+
+class TestParallelAnalysis(unittest.TestCase):
+    TRAITS = ('friendly', 'strict', 'leader', 'collaborative')
+
+    def test_parallel_results_match_serial_results_in_order(self):
+        descriptions = [f'description {i} ' + ('friendly leader' if i % 3 else 'strict colaborative')
+                        for i in range(40)]
+        serial = parallel_analysis.analyze_descriptions(descriptions, self.TRAITS, workers=1)
+        parallel = parallel_analysis.analyze_descriptions(descriptions, self.TRAITS, workers=2, batch_size=7)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(parallel[0], {'strict': 1.0, 'collaborative': 1.0})
+        self.assertEqual(parallel[1], {'friendly': 1.0, 'leader': 1.0})
+
+    def test_invalid_worker_count_is_rejected(self):
+        with self.assertRaises(ValueError):
+            parallel_analysis.analyze_descriptions(['friendly'], self.TRAITS, workers=0)
+
+
+class TestBulkEnrichment(PersonTestCase):
+    def test_add_descriptions_applies_in_order_and_reports_failures(self):
+        service = PersonService(self.person_dao, self.trait_dao)
+        results = service.add_descriptions([
+            ('Alice', 'friendly'),
+            ('Nobody', 'friendly'),
+            ('Alice', 'strict'),
+            ('Bob', 'nothing useful here'),
+        ], workers=1)
+
+        self.assertEqual([name for name, _ in results], ['Alice', 'Nobody', 'Alice', 'Bob'])
+        self.assertEqual(results[0][1], ['friendly'])
+        self.assertIsInstance(results[1][1], ValueError)
+        self.assertEqual(results[2][1], ['strict'])
+        self.assertIsInstance(results[3][1], ValueError)
+        alice = self.person_dao.get_person('Alice')
+        self.assertEqual(alice['n_friendliness'], 2)
+        self.assertAlmostEqual(alice['friendliness'], 4.5)
+
+    def test_rows_without_a_name_are_rejected_with_line_numbers(self):
+        path = os.path.join(self.tmp_dir.name, 'descriptions.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"person": "Alice", "description": "friendly"}\n{"description": "strict"}\n')
+        with self.assertRaisesRegex(ValueError, '^Line 2: missing person name$'):
+            person_commands.read_description_rows(path, 'jsonl')
+
+        path = os.path.join(self.tmp_dir.name, 'descriptions.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('person,description\nAlice,friendly\n ,strict\n')
+        with self.assertRaisesRegex(ValueError, '^Line 3: missing person name$'):
+            person_commands.read_description_rows(path, 'csv')
+
+    def test_none_is_not_taken_as_a_name(self):
+        service = PersonService(self.person_dao, self.trait_dao)
+        results = service.add_descriptions([(None, 'friendly')], workers=1)
+        self.assertIsInstance(results[0][1], ValueError)
+        self.assertIsNone(self.person_dao.get_person('None'))
+
+
+
+class TestTraitRecomputation(PersonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = PersonService(self.person_dao, self.trait_dao)
+        self.traits = TraitService(self.trait_dao, [self.person_dao])
+
+    def test_trait_counts_are_recorded(self):
+        self.service.add_description_to_person('Alice', 'friendly strict')
+        self.service.add_description_to_person('Alice', 'friendly')
+        self.assertEqual(self.person_dao.get_trait_counts('Alice'), {'friendly': 2, 'strict': 1})
+        self.assertEqual(self.person_dao.get_trait_counts('Bob'), {})
+
+    def test_update_matches_reingesting_with_the_new_coordinates(self):
+        self.service.add_description_to_person('Alice', 'friendly strict')
+        self.service.add_description_to_person('Alice', 'friendly')
+        self.service.add_description_to_person('Bob', 'strict')
+
+        self.assertEqual(self.traits.update_trait('Friendly', Personality(1.0, 3.0)), 1)
+
+        alice = self.person_dao.get_person('Alice')
+        self.assertAlmostEqual(alice['friendliness'], (1.0 + 2.0 + 1.0) / 3)
+        self.assertAlmostEqual(alice['dominance'], (3.0 + 8.0 + 3.0) / 3)
+        self.assertEqual(alice['n_friendliness'], 3)
+        self.assertAlmostEqual(alice['decay_f_sum'] / alice['decay_weight'], alice['friendliness'], places=4)
+        self.assertEqual(self.person_dao.get_person('Bob')['friendliness'], 2.0)
+
+    def test_unknown_trait_and_out_of_range_scores_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.traits.update_trait('unknown', Personality(1.0, 1.0))
+        with self.assertRaises(ValueError):
+            self.traits.update_trait('friendly', Personality(11.0, 1.0))
+        self.assertEqual(self.trait_dao.get_trait('friendly'), Personality(7.0, 6.0))
+
+    def test_observations_without_counts_keep_their_coordinates(self):
+        # A profile from before trait counts were kept: one unattributed observation at (4, 4)
+        self.person_dao.update_personality('Alice', Personality(4.0, 4.0), 1, 1)
+        self.service.add_trait_to_person('Alice', 'friendly')
+        self.traits.update_trait('friendly', Personality(9.0, 6.0))
+        self.assertAlmostEqual(self.person_dao.get_person('Alice')['friendliness'], (4.0 + 9.0) / 2)
+
+    def test_import_recomputes_changed_traits(self):
+        self.service.add_description_to_person('Alice', 'friendly strict')
+        diff, updated = self.traits.import_traits(
+            {'friendly': Personality(5.0, 6.0), 'strict': Personality(0.0, 8.0)})
+        self.assertEqual(diff.changed, ['friendly', 'strict'])
+        self.assertEqual(updated, 1)
+        self.assertAlmostEqual(self.person_dao.get_person('Alice')['friendliness'], 2.5)
+
+    def test_buffered_updates_are_flushed_before_recomputing(self):
+        with BufferedPersonDAO(self.person_dao, max_pending=100, max_delay=60) as buffered:
+            PersonService(buffered, self.trait_dao).add_description_to_person('Alice', 'friendly')
+            PersonService(buffered, self.trait_dao).add_description_to_person('Alice', 'friendly')
+            TraitService(self.trait_dao, [buffered]).update_trait('friendly', Personality(1.0, 6.0))
+            self.assertEqual(self.person_dao.get_trait_counts('Alice'), {'friendly': 2})
+            self.assertAlmostEqual(buffered.get_person('Alice')['friendliness'], 1.0)
+
+    def test_deleting_a_person_drops_their_counts(self):
+        self.service.add_description_to_person('Alice', 'friendly')
+        db_connection.run_write(self.person_dao.db_name, lambda conn, cursor: cursor.execute(
+            "DELETE FROM persons WHERE person = 'Alice'"))
+        self.assertEqual(self.person_dao.get_trait_counts('Alice'), {})
+
+
+
+class TestTraitCooccurrence(PersonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.trait_dao.add_traits([('leader', 8.0, 8.0)])
+        self.service = PersonService(self.person_dao, self.trait_dao)
+
+    def test_descriptions_count_the_traits_they_name_together(self):
+        self.service.add_description_to_person('Alice', 'strict leader')
+        self.service.add_description_to_person('Bob', 'friendly leader')
+        self.service.add_description_to_person('Bob', 'strict leaders')
+        # Single traits are not descriptions
+        self.service.add_trait_to_person('Alice', 'friendly')
+
+        self.assertEqual(self.person_dao.get_cooccurring('leader'), (3, [('strict', 2), ('friendly', 1)]))
+        self.assertEqual(self.person_dao.get_cooccurring('friendly', top=5), (1, [('leader', 1)]))
+        self.assertEqual(self.person_dao.get_top_pairs(1), [('leader', 'strict', 2)])
+        self.assertEqual(self.person_dao.get_cooccurring('unknown'), (0, []))
+
+    def test_description_is_applied_in_one_transaction(self):
+        with mock.patch.object(self.person_dao, 'modify_person', wraps=self.person_dao.modify_person) as write:
+            self.service.add_description_to_person('Alice', 'friendly strict leader')
+        write.assert_called_once()
+        alice = self.person_dao.get_person('Alice')
+        self.assertEqual(alice['n_friendliness'], 3)
+        self.assertAlmostEqual(alice['friendliness'], (7.0 + 2.0 + 8.0) / 3)
+
+    def test_buffered_descriptions_keep_their_own_pairs(self):
+        with BufferedPersonDAO(self.person_dao, max_pending=100, max_delay=60) as buffered:
+            service = PersonService(buffered, self.trait_dao)
+            service.add_description_to_person('Alice', 'strict leader')
+            service.add_description_to_person('Alice', 'friendly')
+        self.assertEqual(self.person_dao.get_cooccurring('leader'), (1, [('strict', 1)]))
+        self.assertEqual(self.person_dao.get_cooccurring('friendly'), (1, []))
+
+    def test_counts_are_summed_across_databases(self):
+        other = PersonDAO(os.path.join(self.tmp_dir.name, 'other.db'))
+        other.create_tables()
+        other.add_person('Carol')
+        self.service.add_description_to_person('Alice', 'strict leader')
+        PersonService(other, self.trait_dao).add_description_to_person('Carol', 'friendly strict leader')
+
+        traits = TraitService(self.trait_dao, [self.person_dao, other])
+        self.assertEqual(traits.cooccurring_traits('Leader', top=1), (2, [('strict', 2)]))
+        self.assertEqual(traits.top_pairs(), [('leader', 'strict', 2), ('friendly', 'leader', 1),
+                                              ('friendly', 'strict', 1)])
+
+
+class TestDuplicateNames(PersonTestCase):
+    def test_names_share_blocking_keys_with_their_variants(self):
+        self.assertEqual(name_keys.soundex('Tymczak'), 'T522')
+        self.assertEqual(name_keys.normalize_name(' Doe,  Jöhn '), 'doe john')
+        self.assertEqual(name_keys.name_keys('John Doe'), ['n:doe john', 'p:D000 J500'])
+        self.assertEqual(name_keys.name_keys('Jon Doe')[1], 'p:D000 J500')
+        self.assertTrue(name_keys.is_similar('Jon Doe', 'John  Doe'))
+        self.assertFalse(name_keys.is_similar('Jon Doe', 'Jane Dee'))
+        self.assertFalse(name_keys.is_similar('P001', 'P002'))
+
+    def test_similar_names_are_rejected_unless_allowed(self):
+        self.person_dao.add_person('John Doe')
+        with self.assertRaises(SimilarPersonError) as raised:
+            self.person_dao.add_person('Jon Doe')
+        self.assertEqual(raised.exception.matches, ['John Doe'])
+        self.assertIsNone(self.person_dao.get_person('Jon Doe'))
+        with self.assertRaises(ValueError):
+            self.person_dao.add_person('John Doe')
+
+        self.person_dao.add_person('Jon Doe', allow_similar=True)
+        self.person_dao.add_person('Jane Dee')
+        self.assertIsNotNone(self.person_dao.get_person('Jon Doe'))
+
+    def test_bulk_add_skips_existing_and_holds_back_similar_names(self):
+        added, held_back = self.person_dao.add_persons(['Alice', 'John Doe', 'Doe, John', 'Carol', 'Jon Doe'])
+        self.assertEqual(added, ['John Doe', 'Carol'])
+        self.assertEqual(held_back, {'Doe, John': ['John Doe'], 'Jon Doe': ['John Doe']})
+
+    def test_names_written_without_the_dao_are_indexed(self):
+        # Rows replicated or stored before the key index existed reach it through the queue
+        db_connection.run_write(self.person_dao.db_name, lambda conn, cursor: cursor.execute(
+            "INSERT INTO persons (person) VALUES ('John Doe')"))
+        with self.assertRaises(SimilarPersonError):
+            self.person_dao.add_person('Jon Doe')
+        self.assertEqual(self.person_dao.find_duplicate_groups(), [])
+
+    def test_dedupe_merges_profiles_counts_and_decayed_sums(self):
+        service = PersonService(self.person_dao, self.trait_dao, clock=lambda: 1000.0)
+        self.person_dao.add_persons(['John Doe', 'Jon Doe', 'Doe, John'], allow_similar=True)
+        service.add_description_to_person('John Doe', 'friendly')
+        service.add_description_to_person('John Doe', 'friendly')
+        service.add_description_to_person('Jon Doe', 'strict')
+
+        plan = [('John Doe', ['Doe, John', 'Jon Doe'])]
+        self.assertEqual(service.dedupe(dry_run=True), plan)
+        self.assertIsNotNone(self.person_dao.get_person('Jon Doe'))
+        self.assertEqual(service.dedupe(), plan)
+
+        john = self.person_dao.get_person('John Doe')
+        self.assertAlmostEqual(john['friendliness'], (7.0 + 7.0 + 2.0) / 3)
+        self.assertAlmostEqual(john['dominance'], (6.0 + 6.0 + 8.0) / 3)
+        self.assertEqual((john['n_friendliness'], john['n_dominance']), (3, 3))
+        self.assertAlmostEqual(john['decay_weight'], 3.0)
+        self.assertAlmostEqual(john['decay_f_sum'], 16.0)
+        self.assertEqual(self.person_dao.get_trait_counts('John Doe'), {'friendly': 2, 'strict': 1})
+        self.assertIsNone(self.person_dao.get_person('Jon Doe'))
+        self.assertEqual(self.person_dao.get_trait_counts('Jon Doe'), {})
+        self.assertEqual(service.dedupe(), [])
+        # The merged names are free again, and still look like John Doe
+        with self.assertRaises(SimilarPersonError):
+            self.person_dao.add_person('Jon Doe')
+
+
+if __name__ == '__main__':
+    unittest.main()
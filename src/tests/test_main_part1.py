@@ -9,9 +9,12 @@ from services.company_service import CompanyService
 import db_connection
 import sys
 import populate_traits_db
+import schema
 
 class TestMainPart1(unittest.TestCase): # Renamed class to avoid conflict
     def setUp(self):
+        # Isolated in-memory databases, shared by the DAOs and CLI commands of this test
+        db_connection.configure(db_dir=db_connection.MEMORY)
         self.person_db = PersonDAO()
         self.trait_db = TraitDAO()
         self.person_db.reset_database() # Reset persons database
@@ -20,6 +23,10 @@ class TestMainPart1(unittest.TestCase): # Renamed class to avoid conflict
         self.trait_db.create_tables() # Ensure traits tables are created for testing
         populate_traits_db.populate_traits_db() # Populate traits for tests
 
+    def tearDown(self):
+        db_connection.configure(db_dir='')
+        schema.invalidate()
+
     def test_add_person_and_traits(self):
         person_name = "Alice"
         description = "friendly dominant"
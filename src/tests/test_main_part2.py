@@ -4,13 +4,18 @@ from trait_dao import TraitDAO
 from person import Person
 from personality_models import Personality # Import Personality
 from db_connection import DatabaseConnection # Import DatabaseConnection
+import db_connection
+import schema
 import sys
 from populate_traits_db import populate_traits_db
 from main import main
+from services.company_service import CompanyService
 from services.person_service import PersonService
 
 class TestMainPart2(unittest.TestCase): # Renamed class to avoid conflict
     def setUp(self):
+        # Isolated in-memory databases, shared by the DAOs and CLI commands of this test
+        db_connection.configure(db_dir=db_connection.MEMORY)
         self.person_db = PersonDAO()
         self.trait_db = TraitDAO()
         self.person_db.create_tables()
@@ -104,9 +109,26 @@ class TestMainPart2(unittest.TestCase): # Renamed class to avoid conflict
         # In a real test, you might want to capture stdout to assert the output
         # For now, we'll just check that the command runs without errors
 
+    def test_decay_half_life_is_chosen_by_the_writing_command(self):
+        sys.argv = ["main.py", "trait", "create", "test_trait", "3.0", "7.0"]
+        main()
+        sys.argv = ["main.py", "person", "create", "TestPerson"]
+        main()
+        sys.argv = ["main.py", "person", "add_desc", "TestPerson", "test_trait", "--decay-half-life", "90"]
+        main()
+        self.assertEqual(self.person_db.get_decay_half_life(), 90)
+
+        # Later writes keep the recorded half-life, and queries can use it
+        sys.argv = ["main.py", "person", "add_desc", "TestPerson", "test_trait"]
+        main()
+        self.assertEqual(self.person_db.get_person("TestPerson")["n_friendliness"], 2)
+        matches = CompanyService(self.person_db, self.trait_db).find_matches_for_description(
+            "test_trait", decay_half_life_days=90)
+        self.assertEqual([name for name, _ in matches], ["TestPerson"])
+
     def test_database_connection_context_manager(self):
         # Test the DatabaseConnection context manager
-        db_name = 'test_db.db'
+        db_name = db_connection.resolve_db_path('test_db.db')
         try:
             with DatabaseConnection(db_name) as (conn, cursor):
                 self.assertIsNotNone(conn)
@@ -126,7 +148,8 @@ class TestMainPart2(unittest.TestCase): # Renamed class to avoid conflict
     def tearDown(self): # Added tearDown to part2 to avoid conflict if both parts are run
         # self.person_db.close() # Removed close calls as PersonDAO and TraitDAO don't have close methods
         # self.trait_db.close()
-        pass
+        db_connection.configure(db_dir='')
+        schema.invalidate()
 
 # if __name__ == '__main__':
 #    unittest.main()
@@ -0,0 +1,551 @@
+import asyncio
+import importlib.util
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+import db_connection
+import decay
+import fuzzy_index
+import plotting
+import role_index
+import schema
+from person_dao import PersonDAO
+from personality_models import Personality
+from services import async_services
+from services.analytics_service import AnalyticsService
+from services.company_service import CompanyService, percentile_ranks
+from services.person_service import PersonService
+from tenancy import TenantRouter
+from trait_dao import TraitDAO
+
+
+class MatchingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.person_dao = PersonDAO(os.path.join(self.tmp_dir.name, 'persons.db'))
+        self.person_dao.create_tables()
+        self.trait_dao = TraitDAO(os.path.join(self.tmp_dir.name, 'traits.db'))
+        self.trait_dao.create_tables()
+        self.trait_dao.add_traits([('friendly', 7.0, 6.0), ('strict', 2.0, 8.0), ('quiet', 3.0, 2.0)])
+        self.company_service = CompanyService(self.person_dao, self.trait_dao)
+
+    def tearDown(self):
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+    def add_person(self, name, friendliness, dominance):
+        self.person_dao.add_person(name)
+        self.person_dao.update_personality(name, Personality(friendliness, dominance), 1, 1)
+
+
+class TestTopKMatching(MatchingTestCase):
+    def setUp(self):
+        super().setUp()
+        coordinates = [(-3.0, 4.0), (7.0, 6.0), (1.0, 1.0), (6.0, 5.0), (2.0, 8.0), (8.0, 7.0), (0.0, 0.0)]
+        for i, (friendliness, dominance) in enumerate(coordinates):
+            self.add_person(f'P{i}', friendliness, dominance)
+
+    def test_top_k_matches_prefix_of_full_ranking(self):
+        full = self.company_service.find_matches_for_description('friendly')
+        self.assertEqual(len(full), 7)
+        for k in (1, 3, 7, 20):
+            top = self.company_service.find_matches_for_description('friendly', top=k)
+            self.assertEqual([name for name, _ in top], [name for name, _ in full[:k]])
+            for (_, expected), (_, actual) in zip(full, top):
+                self.assertAlmostEqual(expected, actual)
+
+    def test_ties_are_broken_by_name(self):
+        # Both are at distance 1 from friendly (7, 6)
+        self.add_person('Zed', 7.0, 7.0)
+        self.add_person('Amy', 7.0, 5.0)
+        top = self.company_service.find_matches_for_description('friendly', top=3)
+        self.assertEqual([name for name, _ in top], ['P1', 'Amy', 'Zed'])
+
+    def test_invalid_top_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.company_service.find_matches_for_description('friendly', top=0)
+
+
+class TestPercentileRanks(MatchingTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(200):
+            self.add_person(f'P{i:03d}', 7.0 - i * 0.01, 6.0)
+
+    def test_ranks_are_positions_over_the_whole_population(self):
+        for top in (None, 5):
+            matches = self.company_service.find_matches_for_description('friendly', top=top, percentiles=True)
+            self.assertEqual(len(matches), 200 if top is None else 5)
+            self.assertEqual(matches[0][0], 'P000')
+            self.assertAlmostEqual(matches[0][2], 0.5)
+            self.assertAlmostEqual(matches[4][2], 2.5)
+            self.assertAlmostEqual(matches[-1][2], 100.0 if top is None else 2.5)
+        # Without decayed observations everyone gets the neutral prior and ties for first
+        decayed = self.company_service.find_matches_for_description(
+            'friendly', top=5, decay_half_life_days=30.0, percentiles=True)
+        self.assertEqual({rank for *_, rank in decayed}, {0.5})
+
+    def test_saved_profile_ranks_use_the_materialized_ranking(self):
+        self.company_service.save_profile('Support', 'friendly')
+        live = self.company_service.find_matches_for_description('friendly', top=3, percentiles=True)
+        saved = self.company_service.get_profile_matches('Support', 3, percentiles=True)
+        self.assertEqual([(name, rank) for name, _, rank in saved], [(name, rank) for name, _, rank in live])
+
+    def test_ties_share_the_best_rank(self):
+        self.assertEqual(percentile_ranks([0.0, 1.0, 1.0, 2.0], 8), [12.5, 25.0, 25.0, 50.0])
+        self.assertEqual(percentile_ranks([3.0, 3.0, 3.0], 4), [25.0, 25.0, 25.0])
+        # Through a ranking: the twin and P000 are both first of 201, P001 comes third
+        self.add_person('Twin', 7.0, 6.0)
+        matches = self.company_service.find_matches_for_description('friendly', top=3, percentiles=True)
+        self.assertEqual([name for name, _, _ in matches], ['P000', 'Twin', 'P001'])
+        for (_, _, rank), expected in zip(matches, (100 / 201, 100 / 201, 300 / 201)):
+            self.assertAlmostEqual(rank, expected)
+        self.assertEqual(percentile_ranks([], 0), [])
+        with self.assertRaises(ValueError):
+            percentile_ranks([1.0, 2.0], 1)
+
+
+class TestSavedProfiles(MatchingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_person('Alice', 7.0, 6.0)
+        self.add_person('Bob', 2.0, 8.0)
+        self.add_person('Carol', 0.0, 0.0)
+
+    def test_saved_ranking_matches_live_query(self):
+        self.company_service.save_profile('Support', 'friendly')
+        saved = self.company_service.get_profile_matches('Support', 10)
+        live = self.company_service.find_matches_for_description('friendly')
+        self.assertEqual([name for name, _ in saved], [name for name, _ in live])
+        for (_, expected), (_, actual) in zip(live, saved):
+            self.assertAlmostEqual(expected, actual)
+
+    def test_ranking_follows_person_inserts_and_updates(self):
+        self.company_service.save_profile('Support', 'friendly')
+        self.add_person('Dave', 7.0, 6.5)
+        self.assertEqual([name for name, _ in self.company_service.get_profile_matches('Support', 2)],
+                         ['Alice', 'Dave'])
+        self.person_dao.update_personality('Carol', Personality(7.0, 6.0), 2, 2)
+        top = self.company_service.get_profile_matches('Support', 2)
+        self.assertEqual([name for name, _ in top], ['Alice', 'Carol'])
+        self.assertAlmostEqual(top[1][1], 0.0)
+
+    def test_profile_stores_target_personality(self):
+        self.company_service.save_profile('Ops', 'friendly strict')
+        profile = self.company_service.company_dao.get_profile('Ops')
+        self.assertEqual(profile.description, 'friendly strict')
+        self.assertEqual(profile.target, Personality(4.5, 7.0))
+
+    def test_unknown_profile_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.company_service.get_profile_matches('Nobody', 5)
+
+    def test_deleted_profile_stops_being_maintained(self):
+        self.company_service.save_profile('Support', 'friendly')
+        self.assertTrue(self.company_service.company_dao.delete_profile('Support'))
+        self.add_person('Dave', 7.0, 6.5)
+        with self.assertRaises(ValueError):
+            self.company_service.get_profile_matches('Support', 5)
+
+
+class TestFuzzyTraitResolution(MatchingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.trait_dao.add_traits([('leader', 9.0, 9.0), ('collaborative', 8.0, 5.0)])
+
+    def test_inflections_and_misspellings_resolve_to_canonical_traits(self):
+        index = self.trait_dao.get_trait_index()
+        self.assertEqual(index.resolve('leadership'), 'leader')
+        self.assertEqual(index.resolve('friendlier'), 'friendly')
+        self.assertEqual(index.resolve('colaborative'), 'collaborative')
+        self.assertEqual(index.resolve('stricter'), 'strict')
+
+    def test_short_and_unrelated_words_do_not_match(self):
+        index = self.trait_dao.get_trait_index()
+        for word in ('and', 'quite', 'strong', 'team'):
+            self.assertIsNone(index.resolve(word), word)
+
+    def test_description_analysis_uses_the_index(self):
+        weights = self.company_service._get_trait_weights_from_description(
+            'Friendlier, colaborative team player with leadership skills.')
+        self.assertEqual(weights, {'friendly': 1.0, 'collaborative': 1.0, 'leader': 1.0})
+
+    def test_index_is_rebuilt_only_when_lexicon_changes(self):
+        first = self.trait_dao.get_trait_index()
+        self.assertIs(self.trait_dao.get_trait_index(), first)
+        self.trait_dao.add_trait('innovative', Personality(9.0, 6.0))
+        rebuilt = self.trait_dao.get_trait_index()
+        self.assertIsNot(rebuilt, first)
+        self.assertEqual(rebuilt.resolve('inovative'), 'innovative')
+
+    def test_edit_distance_counts_transpositions_once(self):
+        self.assertEqual(fuzzy_index.edit_distance('quiet', 'quite'), 1)
+        self.assertEqual(fuzzy_index.edit_distance('leader', 'ledaer'), 1)
+        self.assertEqual(fuzzy_index.edit_distance('strict', 'strong', limit=1), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestTenantRouting(MatchingTestCase):
+    def setUp(self):
+        super().setUp()
+        db_connection.configure(tenant_dir=os.path.join(self.tmp_dir.name, 'tenants'))
+        self.router = TenantRouter(self.trait_dao)
+        self.pools = {
+            'acme': [('Ann', 7.0, 6.5), ('Cid', 0.0, 0.0), ('Eve', 6.0, 6.0)],
+            'globex': [('Bob', 7.0, 5.5), ('Dan', 3.0, 2.0)],
+            'initech': [('Ann', 8.0, 6.0)],
+        }
+        for tenant, persons in self.pools.items():
+            dao = self.router.person_dao(tenant)
+            dao.create_tables()
+            for name, friendliness, dominance in persons:
+                dao.add_person(name)
+                dao.update_personality(name, Personality(friendliness, dominance), 1, 1)
+
+    def tearDown(self):
+        db_connection.configure(tenant='', tenant_dir=db_connection.DEFAULT_TENANT_DIR)
+        super().tearDown()
+
+    def test_tenants_get_separate_files(self):
+        self.assertEqual(self.router.tenants(), ['acme', 'globex', 'initech'])
+        paths = {self.router.persons_db(tenant) for tenant in self.router.tenants()}
+        self.assertEqual(len(paths), 3)
+        self.assertIsNone(self.router.person_dao('globex').get_person('Ann'))
+
+        db_connection.configure(tenant='acme')
+        self.assertEqual(PersonDAO().db_name, self.router.persons_db('acme'))
+        # The lexicon is shared
+        self.assertEqual(TraitDAO().db_name, 'traits.db')
+
+    def test_invalid_tenant_names_are_rejected(self):
+        for name in ('../escape', 'a/b', '.hidden', 'x' * 65):
+            with self.assertRaises(ValueError):
+                db_connection.resolve_db_path('persons.db', tenant=name)
+
+    def test_cross_tenant_matches_are_merged_in_distance_order(self):
+        everyone = sorted(
+            ((tenant, name, math.hypot(f - 7.0, d - 6.0))
+             for tenant, persons in self.pools.items() for name, f, d in persons),
+            key=lambda match: (match[2], match[1], match[0]))
+        matches = self.router.find_matches('friendly')
+        self.assertEqual([(t, n) for t, n, _ in matches], [(t, n) for t, n, _ in everyone])
+
+        top = self.router.find_matches('friendly', top=3)
+        self.assertEqual([(t, n) for t, n, _ in top], [('acme', 'Ann'), ('globex', 'Bob'), ('initech', 'Ann')])
+        self.assertEqual(self.router.find_matches('friendly', top=2, tenants=['globex']),
+                         [('globex', 'Bob', 0.5), ('globex', 'Dan', math.hypot(4.0, 4.0))])
+
+    def test_cross_tenant_percentiles_cover_all_shards(self):
+        top = self.router.find_matches('friendly', top=3, percentiles=True)
+        # Six candidates over three tenants; Ann of acme and Bob tie at distance 0.5
+        self.assertEqual([rank for *_, rank in top], [100.0 / 6, 100.0 / 6, 300.0 / 6])
+
+
+class TestAsyncServices(MatchingTestCase):
+    def setUp(self):
+        super().setUp()
+        for name, friendliness, dominance in [('Ann', 7.0, 6.5), ('Bob', 1.0, 1.0), ('Cy', 6.0, 6.0)]:
+            self.add_person(name, friendliness, dominance)
+
+    def tearDown(self):
+        db_connection.close_reused_connections()
+        super().tearDown()
+
+    def test_awaitable_calls_match_blocking_ones(self):
+        person_service = PersonService(self.person_dao, self.trait_dao)
+        expected = self.company_service.find_matches_for_description('friendly', top=2)
+
+        async def scenario():
+            async with async_services.AsyncExecutor(max_workers=2) as executor:
+                companies = async_services.AsyncCompanyService(self.company_service, executor)
+                persons = async_services.AsyncPersonDAO(self.person_dao, executor)
+                matches = await asyncio.gather(*(companies.find_matches_for_description('friendly', top=2)
+                                                 for _ in range(6)))
+                await async_services.AsyncPersonService(person_service, executor).add_description_to_person(
+                    'Bob', 'strict')
+                # Two pool threads, each reusing one connection per database file
+                self.assertLessEqual(len(db_connection._reused), 2)
+                return matches, await persons.get_person('Bob')
+
+        matches, bob = asyncio.run(scenario())
+        self.assertTrue(all(result == expected for result in matches))
+        self.assertEqual(bob['n_friendliness'], 2)
+
+    def test_closing_an_executor_keeps_other_connections_open(self):
+        def reused_connection():
+            self.person_dao.get_person('Ann')
+            return db_connection._reused_connection(self.person_dao.db_name)
+
+        async def scenario():
+            async with async_services.AsyncExecutor(max_workers=1) as kept:
+                first = async_services.AsyncExecutor(max_workers=1)
+                await first.run(reused_connection)
+                conn = await kept.run(reused_connection)
+                await first.aclose()
+                self.assertIs(await kept.run(reused_connection), conn)
+                return await kept.run(lambda: conn.execute('SELECT COUNT(*) FROM persons').fetchone()[0])
+
+        self.assertEqual(asyncio.run(scenario()), 3)
+
+    def test_pending_calls_are_bounded(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def work():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        async def scenario():
+            async with async_services.AsyncExecutor(max_workers=4, max_pending=2) as executor:
+                await asyncio.gather(*(executor.run(work) for _ in range(8)))
+
+        asyncio.run(scenario())
+        self.assertEqual(len(peak), 8)
+        self.assertLessEqual(max(peak), 2)
+
+    def test_cancelled_queued_call_never_runs(self):
+        release = threading.Event()
+        ran = []
+
+        async def scenario():
+            async with async_services.AsyncExecutor(max_workers=1) as executor:
+                blocker = asyncio.ensure_future(executor.run(release.wait))
+                await asyncio.sleep(0.01)
+                with self.assertRaises(asyncio.TimeoutError):
+                    await executor.run(ran.append, 1, timeout=0.05)
+                release.set()
+                await blocker
+
+        asyncio.run(scenario())
+        self.assertEqual(ran, [])
+
+    def test_cancellation_interrupts_running_query(self):
+        def slow_query():
+            with db_connection.DatabaseConnection(self.person_dao.db_name) as (_, cursor):
+                cursor.execute('WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) '
+                               'SELECT COUNT(*) FROM n')
+                return cursor.fetchone()
+
+        async def scenario():
+            async with async_services.AsyncExecutor(max_workers=1) as executor:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await executor.run(slow_query, timeout=0.1)
+                # The only pool thread was freed by the interrupt
+                people = async_services.AsyncPersonDAO(self.person_dao, executor)
+                return await people.get_person('Ann', timeout=5)
+
+        started = time.monotonic()
+        self.assertEqual(asyncio.run(scenario())['person'], 'Ann')
+        self.assertLess(time.monotonic() - started, 5)
+
+
+class TestTimeDecay(MatchingTestCase):
+    DAY = decay.SECONDS_PER_DAY
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1_700_000_000.0
+        self.clock_time = self.now
+        self.person_service = PersonService(self.person_dao, self.trait_dao, decay_half_life_days=30,
+                                            clock=lambda: self.clock_time)
+
+    def observe(self, name, trait, days_ago):
+        self.clock_time = self.now - days_ago * self.DAY
+        self.person_service.add_trait_to_person(name, trait)
+
+    def test_observations_lose_half_their_weight_per_half_life(self):
+        state = decay.observe(None, Personality(4.0, 2.0), now=0.0, half_life_days=30)
+        state = decay.observe(state, Personality(0.0, 0.0), now=30 * self.DAY, half_life_days=30)
+        self.assertAlmostEqual(state.weight, 1.5)
+        self.assertAlmostEqual(state.friendliness_sum, 2.0)
+        self.assertEqual(state.updated_at, 30 * self.DAY)
+
+    def test_recent_observations_dominate_decayed_ranking(self):
+        for name in ('Ann', 'Cy'):
+            self.person_dao.add_person(name)
+        self.observe('Ann', 'strict', days_ago=365)
+        self.observe('Ann', 'friendly', days_ago=1)
+        self.observe('Cy', 'friendly', days_ago=365)
+        self.observe('Cy', 'strict', days_ago=1)
+
+        # Identical all-time averages
+        plain = dict(self.company_service.find_matches_for_description('friendly'))
+        self.assertAlmostEqual(plain['Ann'], plain['Cy'])
+
+        ranked = self.company_service.find_matches_for_description(
+            'friendly', decay_half_life_days=30, now=self.now)
+        self.assertEqual([name for name, _ in ranked], ['Ann', 'Cy'])
+        top = self.company_service.find_matches_for_description(
+            'friendly', top=1, decay_half_life_days=30, now=self.now)
+        self.assertEqual(top, ranked[:1])
+
+    def test_stale_profiles_keep_their_shape_unless_shrunk(self):
+        self.person_dao.add_person('Old')
+        self.person_dao.add_person('Never')
+        self.observe('Old', 'friendly', days_ago=600)
+        ranked = dict(self.company_service.find_matches_for_description(
+            'quiet', decay_half_life_days=30, now=self.now))
+        # Decay alone only reweighs observations against each other
+        self.assertAlmostEqual(ranked['Old'], math.hypot(7.0 - 3.0, 6.0 - 2.0))
+        self.assertAlmostEqual(ranked['Never'], math.hypot(3.0, 2.0))
+
+        # With a prior, the profile drifts to neutral as its observation ages
+        def shrunk(days_later):
+            observed_at = self.now - 600 * self.DAY
+            return dict(self.company_service.find_matches_for_description(
+                'quiet', decay_half_life_days=30, now=observed_at + days_later * self.DAY,
+                decay_prior_weight=1.0))['Old']
+
+        self.assertAlmostEqual(shrunk(0), math.hypot(3.5 - 3.0, 3.0 - 2.0))
+        self.assertAlmostEqual(shrunk(30), math.hypot(7.0 / 3 - 3.0, 2.0 - 2.0))
+        self.assertAlmostEqual(shrunk(600), math.hypot(3.0, 2.0), places=4)
+        with self.assertRaises(ValueError):
+            self.company_service.find_matches_for_description('quiet', decay_prior_weight=1.0)
+
+    def test_half_life_must_match_the_recorded_one(self):
+        self.assertIsNone(self.person_dao.get_decay_half_life())
+        self.person_dao.add_person('Ann')
+        self.observe('Ann', 'friendly', days_ago=1)
+        self.assertEqual(self.person_dao.get_decay_half_life(), 30)
+        with self.assertRaisesRegex(ValueError, 'half-life of 30 days'):
+            self.company_service.find_matches_for_description('friendly', decay_half_life_days=90)
+        with self.assertRaisesRegex(ValueError, 'half-life of 30 days'):
+            PersonService(self.person_dao, self.trait_dao, decay_half_life_days=180).add_trait_to_person('Ann', 'strict')
+        self.assertEqual(self.person_dao.get_person('Ann')['n_friendliness'], 1)
+
+    def test_writes_default_to_the_recorded_half_life(self):
+        self.person_dao.add_person('Ann')
+        self.observe('Ann', 'friendly', days_ago=1)
+        service = PersonService(self.person_dao, self.trait_dao)
+        service.add_trait_to_person('Ann', 'strict')
+        self.assertEqual(service.decay_half_life_days, 30)
+        self.assertEqual(self.person_dao.get_person('Ann')['n_friendliness'], 2)
+
+    def test_invalid_half_life_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.company_service.find_matches_for_description('friendly', decay_half_life_days=0)
+
+
+class TestCohortAnalytics(MatchingTestCase):
+    def setUp(self):
+        super().setUp()
+        # Two tight groups and one person without traits
+        for i, (friendliness, dominance) in enumerate([(1.0, 1.0), (1.5, 1.0), (1.0, 1.5),
+                                                        (8.0, 8.0), (8.5, 8.0), (8.0, 8.5), (9.0, 9.0)]):
+            self.add_person(f'P{i}', friendliness, dominance)
+        self.person_dao.add_person('Unobserved')
+
+    def test_coordinate_arrays_are_chunked(self):
+        chunks = list(self.person_dao.iter_coordinate_arrays(chunk_size=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual(chunks[0].shape, (3, 2))
+
+    def test_kmeans_finds_groups_independent_of_chunk_size(self):
+        reports = [AnalyticsService(self.person_dao, chunk_size=size).cohorts(clusters=2, seed=7)
+                   for size in (2, 1000)]
+        for report in reports:
+            self.assertEqual((report.total, report.unobserved), (8, 1))
+            self.assertEqual([cohort.count for cohort in report.cohorts], [4, 3])
+            large, small = report.cohorts
+            self.assertAlmostEqual(large.friendliness, 8.375)
+            self.assertAlmostEqual(large.dominance, 8.375)
+            self.assertAlmostEqual(small.friendliness, 3.5 / 3)
+            self.assertAlmostEqual(large.share, 4 / 7)
+        self.assertAlmostEqual(reports[0].inertia, reports[1].inertia)
+
+    def test_quadrants_and_grid_cells(self):
+        report = AnalyticsService(self.person_dao, chunk_size=2).cohorts(method='grid', cell_size=5.0)
+        # Every observed person scores above the scale's center (0) on both axes
+        self.assertEqual(report.quadrants, {'unfriendly-submissive': 0, 'unfriendly-dominant': 0,
+                                            'friendly-submissive': 0, 'friendly-dominant': 7})
+        self.assertEqual([(cohort.label, cohort.count) for cohort in report.cohorts],
+                         [('F 5-10, D 5-10', 4), ('F 0-5, D 0-5', 3)])
+        self.assertAlmostEqual(report.cohorts[0].density, 4 / 25)
+
+    def test_quadrants_split_at_the_center_of_the_scale(self):
+        dao = PersonDAO(os.path.join(self.tmp_dir.name, 'quadrants.db'))
+        dao.create_tables()
+        for name, friendliness, dominance in [('Q1', -6.0, -4.0), ('Q2', -3.0, 7.0), ('Q3', -1.0, 2.0),
+                                              ('Q4', 5.0, -9.0), ('Q5', 8.0, 3.0), ('Q6', 0.5, 0.5)]:
+            dao.add_person(name)
+            dao.update_personality(name, Personality(friendliness, dominance), 1, 1)
+        report = AnalyticsService(dao).cohorts(method='grid')
+        self.assertEqual(report.quadrants, {'unfriendly-submissive': 1, 'unfriendly-dominant': 2,
+                                            'friendly-submissive': 1, 'friendly-dominant': 2})
+
+    def test_population_histogram_is_independent_of_chunk_size(self):
+        histograms = [AnalyticsService(self.person_dao, chunk_size=size).population_histogram(bins=8)
+                      for size in (1, 3, 1000)]
+        for histogram in histograms:
+            self.assertEqual(int(histogram.counts.sum()), 7)
+            self.assertEqual((histogram.total, histogram.unobserved), (8, 1))
+            self.assertEqual(histogram.friendliness_edges[0], 1.0)
+            self.assertEqual(histogram.friendliness_edges[-1], 9.0)
+            self.assertTrue((histogram.counts == histograms[0].counts).all())
+
+    @unittest.skipUnless(importlib.util.find_spec('matplotlib'), 'matplotlib is not installed')
+    def test_render_population_heatmap(self):
+        histogram = AnalyticsService(self.person_dao).population_histogram(bins=16)
+        path = os.path.join(self.tmp_dir.name, 'img', 'population.png')
+        plotting.render_population(histogram, path, target=Personality(-2.0, 12.0))
+        with open(path, 'rb') as handle:
+            self.assertEqual(handle.read(8), b'\x89PNG\r\n\x1a\n')
+
+    def test_empty_population(self):
+        empty = PersonDAO(os.path.join(self.tmp_dir.name, 'empty.db'))
+        empty.create_tables()
+        report = AnalyticsService(empty).cohorts()
+        self.assertEqual((report.total, report.observed, report.cohorts), (0, 0, []))
+
+
+class TestRoleMatching(MatchingTestCase):
+    def test_roles_store_targets_and_skip_unknown_descriptions(self):
+        saved, skipped = self.company_service.save_roles([('Greeter', 'friendly'), ('Mystery', 'unknown words'),
+                                                          ('Mentor', 'friendly and quiet')])
+        self.assertEqual((saved, skipped), (2, ['Mystery']))
+        roles = {role.name: role.target for role in self.company_service.company_dao.get_roles()}
+        self.assertEqual(sorted(roles), ['Greeter', 'Mentor'])
+        self.assertAlmostEqual(roles['Mentor'].friendliness, 5.0)
+        self.assertAlmostEqual(roles['Mentor'].dominance, 4.0)
+
+    def test_nearest_roles_match_brute_force_with_ties_by_name(self):
+        rng = random.Random(3)
+        # Integer grid coordinates make many equidistant roles
+        rows = [(f'role-{i:04d}', float(rng.randint(0, 10)), float(rng.randint(0, 10))) for i in range(500)]
+        index = role_index.RoleIndex(rows)
+        for friendliness, dominance in [(5.0, 5.0), (0.0, 10.0), (3.5, 7.0)]:
+            expected = sorted((math.hypot(f - friendliness, d - dominance), name) for name, f, d in rows)
+            for k in (1, 7, 50, 600):
+                found = index.nearest(Personality(friendliness, dominance), k)
+                self.assertEqual([name for name, _ in found], [name for _, name in expected[:k]])
+                for (_, dist), (expected_dist, _) in zip(found, expected):
+                    self.assertAlmostEqual(dist, expected_dist)
+
+    def test_person_roles_use_cached_index_until_roles_change(self):
+        self.add_person('Ann', 6.5, 5.5)
+        self.company_service.save_roles([('Greeter', 'friendly'), ('Auditor', 'strict')])
+        self.assertEqual([name for name, _ in self.company_service.find_roles_for_person('Ann', 1)], ['Greeter'])
+        dao = self.company_service.company_dao
+        self.assertIs(dao.get_role_index(), dao.get_role_index())
+
+        self.company_service.save_roles([('Host', 'friendly')])
+        self.assertEqual(len(dao.get_role_index()), 3)
+        self.assertEqual([name for name, _ in self.company_service.find_roles_for_person('Ann', 2)],
+                         ['Greeter', 'Host'])
+        dao.delete_role('Greeter')
+        self.assertEqual([name for name, _ in self.company_service.find_roles_for_person('Ann', 5)],
+                         ['Host', 'Auditor'])
+        with self.assertRaises(ValueError):
+            self.company_service.find_roles_for_person('Nobody', 1)
@@ -0,0 +1,865 @@
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+import backup
+import changefeed
+import db_connection
+import loadgen
+import person_commands
+import query_log
+import schema
+from memory_dao import MemoryBackend
+from person_dao import PersonDAO, SimilarPersonError
+from personality_models import Personality
+from services.analytics_service import AnalyticsService
+from services.company_service import CompanyService
+from services.person_service import PersonService
+from services.trait_service import TraitService
+from trait_dao import TraitDAO
+
+
+class TestSchema(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, 'persons.db')
+        schema.invalidate()
+
+    def tearDown(self):
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+    def _index_names(self):
+        conn = sqlite3.connect(self.db_name)
+        try:
+            rows = conn.execute("SELECT name FROM sqlite_master WHERE type='index'").fetchall()
+            return {row[0] for row in rows}
+        finally:
+            conn.close()
+
+    def test_fresh_database_is_migrated_to_latest_version(self):
+        version = schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+        self.assertEqual(version, schema.PERSONS_MIGRATIONS[-1][0])
+        conn = sqlite3.connect(self.db_name)
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], version)
+        conn.close()
+        self.assertIn('idx_friendliness', self._index_names())
+        self.assertNotIn('idx_person_name', self._index_names())
+
+    def test_legacy_redundant_index_is_dropped(self):
+        conn = sqlite3.connect(self.db_name)
+        conn.execute('CREATE TABLE persons (person TEXT PRIMARY KEY, friendliness REAL, dominance REAL, '
+                     'n_friendliness INTEGER, n_dominance INTEGER)')
+        conn.execute('CREATE INDEX idx_person_name ON persons(person)')
+        conn.execute("INSERT INTO persons VALUES ('Alice', 1.0, 2.0, 1, 1)")
+        conn.commit()
+        conn.close()
+
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+        self.assertNotIn('idx_person_name', self._index_names())
+        conn = sqlite3.connect(self.db_name)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM persons').fetchone()[0], 1)
+        conn.close()
+
+    def test_decay_sums_are_backfilled_from_averages(self):
+        conn = sqlite3.connect(self.db_name)
+        for _, statements in schema.PERSONS_MIGRATIONS[:3]:
+            for statement in statements:
+                conn.execute(statement)
+        conn.execute("INSERT INTO persons VALUES ('Alice', 4.0, 2.0, 3, 3)")
+        conn.execute("INSERT INTO persons VALUES ('Bob', 0.0, 0.0, 0, 0)")
+        conn.execute('PRAGMA user_version = 3')
+        conn.commit()
+        conn.close()
+
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+        conn = sqlite3.connect(self.db_name)
+        rows = dict((row[0], row[1:]) for row in conn.execute(
+            'SELECT person, decay_updated_at IS NOT NULL, decay_weight, decay_f_sum, decay_d_sum FROM persons'))
+        conn.close()
+        self.assertEqual(rows['Alice'], (1, 3.0, 12.0, 6.0))
+        self.assertEqual(rows['Bob'], (0, 0.0, 0.0, 0.0))
+
+    def test_schema_is_checked_once_per_process(self):
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+        with mock.patch('db_connection.DatabaseConnection') as connection:
+            schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+            connection.assert_not_called()
+
+    def test_reset_schema_forgets_cached_version(self):
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+        schema.reset_schema(self.db_name)
+        conn = sqlite3.connect(self.db_name)
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], 0)
+        conn.close()
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+        self.assertIn('idx_dominance', self._index_names())
+
+
+class TestConcurrency(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, 'persons.db')
+        schema.invalidate()
+
+    def tearDown(self):
+        db_connection.configure(concurrency='default')
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+    def test_wal_mode_is_enabled_on_connect(self):
+        db_connection.configure(concurrency='wal')
+        with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            db_connection.configure(concurrency='optimistic')
+
+    def test_lock_errors_are_retried_with_backoff(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise sqlite3.OperationalError('database is locked')
+            return 'ok'
+
+        with mock.patch('time.sleep') as sleep:
+            self.assertEqual(db_connection.with_retry(flaky), 'ok')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_other_errors_are_not_retried(self):
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise sqlite3.OperationalError('no such table: persons')
+
+        with self.assertRaises(sqlite3.OperationalError):
+            db_connection.with_retry(broken)
+        self.assertEqual(len(calls), 1)
+
+    def test_writer_thread_serializes_concurrent_writes(self):
+        db_connection.configure(concurrency='writer')
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+        errors = []
+
+        def ingest(worker):
+            try:
+                for i in range(25):
+                    db_connection.run_write(self.db_name, lambda conn, cursor: cursor.execute(
+                        'INSERT INTO persons (person) VALUES (?)', (f'w{worker}-{i}',)))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=ingest, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
+            cursor.execute('SELECT COUNT(*) FROM persons')
+            self.assertEqual(cursor.fetchone()[0], 200)
+
+    def test_nested_write_on_writer_thread_runs_inline(self):
+        db_connection.configure(concurrency='writer')
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+
+        def insert(name):
+            return lambda conn, cursor: cursor.execute('INSERT INTO persons (person) VALUES (?)', (name,))
+
+        def fail(conn, cursor):
+            insert('Rolled back')(conn, cursor)
+            raise ValueError('boom')
+
+        def outer(conn, cursor):
+            insert('Outer')(conn, cursor)
+            db_connection.run_write(self.db_name, insert('Inner'))
+            with self.assertRaises(ValueError):
+                db_connection.run_write(self.db_name, fail)
+
+        # Would wait forever if the nested calls were queued behind the outer one
+        writer = threading.Thread(target=db_connection.run_write, args=(self.db_name, outer), daemon=True)
+        writer.start()
+        writer.join(5)
+        self.assertFalse(writer.is_alive())
+        with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
+            cursor.execute('SELECT person FROM persons ORDER BY person')
+            self.assertEqual([row[0] for row in cursor.fetchall()], ['Inner', 'Outer'])
+
+    def test_concurrent_observations_are_not_lost(self):
+        for mode in ('default', 'writer'):
+            with self.subTest(mode=mode):
+                db_connection.configure(concurrency=mode)
+                person_dao = PersonDAO(os.path.join(self.tmp_dir.name, f'{mode}-persons.db'))
+                trait_dao = TraitDAO(os.path.join(self.tmp_dir.name, f'{mode}-traits.db'))
+                trait_dao.add_trait('friendly', Personality(7.0, 6.0))
+                person_dao.add_person('Alice')
+                service = PersonService(person_dao, trait_dao, clock=lambda: 1000.0)
+
+                def observe():
+                    for _ in range(10):
+                        service.add_trait_to_person('Alice', 'friendly')
+
+                threads = [threading.Thread(target=observe) for _ in range(4)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                alice = person_dao.get_person('Alice')
+                self.assertEqual((alice['n_friendliness'], alice['decay_weight']), (40, 40.0))
+                self.assertEqual(person_dao.get_trait_counts('Alice'), {'friendly': 40})
+
+    def test_failed_write_is_rolled_back(self):
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+
+        def insert_then_fail(conn, cursor):
+            cursor.execute("INSERT INTO persons (person) VALUES ('Alice')")
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            db_connection.run_write(self.db_name, insert_then_fail)
+        with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
+            cursor.execute('SELECT COUNT(*) FROM persons')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestStorageProfiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, 'persons.db')
+        schema.invalidate()
+
+    def tearDown(self):
+        db_connection.configure(concurrency='default', profile='default')
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+    def _pragmas(self):
+        with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
+            return {name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                    for name in ('cache_size', 'mmap_size', 'synchronous', 'temp_store', 'journal_mode')}
+
+    def test_default_profile_keeps_sqlite_defaults(self):
+        pragmas = self._pragmas()
+        self.assertEqual(pragmas['mmap_size'], 0)
+        self.assertEqual(pragmas['journal_mode'], 'delete')
+
+    def test_read_mostly_profile_maps_the_file(self):
+        db_connection.configure(profile='read-mostly')
+        pragmas = self._pragmas()
+        self.assertEqual(pragmas['cache_size'], -64 * 1024)
+        self.assertEqual(pragmas['mmap_size'], 1024 * db_connection.MIB)
+        self.assertEqual(pragmas['synchronous'], 1)  # NORMAL
+        self.assertEqual(pragmas['temp_store'], 2)  # MEMORY
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+
+        dao = PersonDAO(self.db_name)
+        dao.create_tables()
+        dao.add_person('Alice')
+        self.assertEqual([person['person'] for person in dao.get_all()], ['Alice'])
+
+    def test_durable_profile_syncs_every_commit(self):
+        db_connection.configure(profile='durable')
+        pragmas = self._pragmas()
+        self.assertEqual(pragmas['synchronous'], 2)  # FULL
+        self.assertEqual(pragmas['mmap_size'], 0)
+
+    def test_profiles_apply_to_in_memory_databases(self):
+        db_connection.configure(profile='bulk-ingest', db_dir=db_connection.MEMORY)
+        try:
+            dao = PersonDAO()
+            dao.create_tables()
+            dao.add_person('Alice')
+            self.assertIsNotNone(dao.get_person('Alice'))
+        finally:
+            db_connection.configure(db_dir='')
+
+    def test_unknown_profile_is_rejected(self):
+        with self.assertRaises(ValueError):
+            db_connection.configure(profile='turbo')
+
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, 'persons.db')
+        schema.invalidate()
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+        conn = sqlite3.connect(self.db_name)
+        conn.executemany('INSERT INTO persons (person, friendliness, dominance, n_friendliness, n_dominance) VALUES (?, ?, ?, 1, 1)',
+                         [(f'p{i}', float(i), -float(i)) for i in range(500)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def _count(self, db_name):
+        conn = sqlite3.connect(db_name)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM persons').fetchone()[0]
+        finally:
+            conn.close()
+
+    def _round_trip(self, snapshot_name):
+        info = backup.snapshot(self.db_name, self._path(snapshot_name))
+        self.assertTrue(os.path.exists(info.path + backup.CHECKSUM_SUFFIX))
+        self.assertTrue(backup.verify_checksum(info.path))
+
+        conn = sqlite3.connect(self.db_name)
+        conn.execute('DELETE FROM persons')
+        conn.commit()
+        conn.close()
+
+        backup.restore(info.path, self.db_name, require_checksum=True)
+        self.assertEqual(self._count(self.db_name), 500)
+        return info
+
+    def test_plain_snapshot_round_trip(self):
+        info = self._round_trip('snap.db')
+        self.assertFalse(info.compressed)
+
+    def test_compressed_snapshot_round_trip(self):
+        info = self._round_trip('snap.db.gz')
+        self.assertTrue(info.compressed)
+
+    def test_snapshot_while_writer_is_active(self):
+        stop = threading.Event()
+
+        def write():
+            # Writes until the snapshot is done, which it must be despite them
+            i = 0
+            while not stop.is_set():
+                db_connection.run_write(self.db_name, lambda conn, cursor: cursor.execute(
+                    'INSERT INTO persons (person) VALUES (?)', (f'w{i}',)))
+                i += 1
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            info = backup.snapshot(self.db_name, self._path('live.db'))
+        finally:
+            stop.set()
+            writer.join()
+        self.assertGreaterEqual(self._count(info.path), 500)
+
+    def test_rollback_journal_snapshot_lets_writers_in(self):
+        conn = sqlite3.connect(self.db_name)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        conn.close()
+        stop = threading.Event()
+        errors = []
+        written = []
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                try:
+                    db_connection.run_write(self.db_name, lambda conn, cursor: cursor.execute(
+                        'INSERT INTO persons (person) VALUES (?)', (f'w{i}',)))
+                except Exception as e:
+                    errors.append(e)
+                    return
+                i += 1
+                written.append(i)
+
+        steps = []
+
+        def progress(status, remaining, total):
+            steps.append(len(written))
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            info = backup.snapshot(self.db_name, self._path('live.db'), pages=1, progress=progress)
+        finally:
+            stop.set()
+            writer.join()
+        self.assertEqual(errors, [])
+        # Writes went in between the batches instead of waiting for the whole copy
+        self.assertGreater(len(steps), 1)
+        self.assertGreater(steps[-1], steps[0])
+        self.assertGreaterEqual(self._count(info.path), 500)
+
+    def test_restarted_rollback_journal_snapshot_falls_back_to_one_step(self):
+        other = sqlite3.connect(self.db_name)
+        steps = []
+
+        def progress(status, remaining, total):
+            # A write from another connection between steps restarts the copy
+            steps.append(remaining)
+            other.execute('INSERT INTO persons (person) VALUES (?)', (f'w{len(steps)}',))
+            other.commit()
+
+        try:
+            info = backup.snapshot(self.db_name, self._path('restarted.db'), pages=1, progress=progress)
+        finally:
+            other.close()
+        self.assertEqual(steps[-1], 0)
+        self.assertEqual(len(steps), backup.MAX_SNAPSHOT_RESTARTS + 2)
+        conn = sqlite3.connect(info.path)
+        try:
+            self.assertEqual(conn.execute('PRAGMA integrity_check').fetchone()[0], 'ok')
+        finally:
+            conn.close()
+        self.assertGreaterEqual(self._count(info.path), 500)
+
+    def test_checksum_mismatch_is_rejected(self):
+        info = backup.snapshot(self.db_name, self._path('snap.db'))
+        with open(info.path, 'ab') as handle:
+            handle.write(b'tampered')
+        with self.assertRaises(ValueError):
+            backup.restore(info.path, self.db_name)
+        self.assertEqual(self._count(self.db_name), 500)
+
+    def test_missing_checksum_can_be_required(self):
+        info = backup.snapshot(self.db_name, self._path('snap.db'), checksum=False)
+        with self.assertRaises(ValueError):
+            backup.restore(info.path, self.db_name, require_checksum=True)
+
+    def test_invalid_snapshot_is_rejected(self):
+        bogus = self._path('bogus.db')
+        with open(bogus, 'wb') as handle:
+            handle.write(b'not a database' * 100)
+        with self.assertRaises(ValueError):
+            backup.restore(bogus, self.db_name)
+        self.assertEqual(self._count(self.db_name), 500)
+
+
+class TestChangeFeed(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source = PersonDAO(self.path('source.db'))
+        self.replica = PersonDAO(self.path('replica.db'))
+        schema.invalidate()
+        for dao in (self.source, self.replica):
+            dao.create_tables()
+
+    def tearDown(self):
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def rows(self, dao):
+        return sorted((person['person'], person['friendliness'], person['dominance'], person['n_friendliness'])
+                      for person in dao.get_all())
+
+    def change_count(self, dao):
+        with db_connection.DatabaseConnection(dao.db_name) as (_, cursor):
+            return cursor.execute('SELECT COUNT(*) FROM change_log').fetchone()[0]
+
+    def sync(self, since, name):
+        info = changefeed.export_changes(self.source.db_name, 'persons', self.path(name), since=since)
+        changefeed.apply_changes(self.replica.db_name, 'persons', self.path(name))
+        return info
+
+    def test_existing_rows_are_captured_by_the_migration(self):
+        db_name = self.path('legacy.db')
+        schema.ensure_schema(db_name, schema.PERSONS_MIGRATIONS[:5])
+        conn = sqlite3.connect(db_name)
+        conn.execute("INSERT INTO persons (person, friendliness, dominance) VALUES ('Old', 1.0, 2.0)")
+        conn.commit()
+        conn.close()
+        schema.invalidate()
+        info = changefeed.export_changes(db_name, 'persons', self.path('legacy.jsonl'))
+        self.assertEqual((info.upserts, info.deletes), (1, 0))
+
+    def test_incremental_sync_converges_and_is_idempotent(self):
+        for name in ('Ann', 'Bob', 'Cid'):
+            self.source.add_person(name)
+        self.source.update_personality('Ann', Personality(7.0, 6.0), 1, 1)
+        first = self.sync(0, 'first.jsonl')
+        self.assertEqual((first.upserts, first.deletes), (3, 0))
+        self.assertEqual(self.rows(self.replica), self.rows(self.source))
+
+        # Several writes to one key ship as one row; deletes ship as deletes
+        for value in (1.0, 2.0, 3.0):
+            self.source.update_personality('Bob', Personality(value, value), 1, 1)
+        with db_connection.DatabaseConnection(self.source.db_name) as (conn, cursor):
+            cursor.execute("DELETE FROM persons WHERE person = 'Cid'")
+            conn.commit()
+        second = self.sync(first.through, 'second.jsonl')
+        self.assertEqual((second.upserts, second.deletes), (1, 1))
+        self.assertEqual(self.rows(self.replica), self.rows(self.source))
+
+        # Replaying both files again changes nothing and logs nothing new
+        logged = self.change_count(self.replica)
+        changefeed.apply_changes(self.replica.db_name, 'persons', self.path('first.jsonl'))
+        changefeed.apply_changes(self.replica.db_name, 'persons', self.path('second.jsonl'))
+        self.assertEqual(self.rows(self.replica), [('Ann', 7.0, 6.0, 1), ('Bob', 3.0, 3.0, 1)])
+        self.assertEqual(self.change_count(self.replica), logged)
+        overlapping = changefeed.export_changes(self.source.db_name, 'persons', self.path('all.jsonl'))
+        self.assertEqual(changefeed.apply_changes(self.replica.db_name, 'persons', self.path('all.jsonl')).skipped,
+                         overlapping.upserts + overlapping.deletes)
+        self.assertEqual(changefeed.replication_position(self.replica.db_name, 'persons', second.source),
+                         second.through)
+
+        empty = self.sync(second.through, 'empty.jsonl')
+        self.assertEqual((empty.upserts, empty.deletes, empty.through), (0, 0, second.through))
+
+    def test_trait_counts_and_name_keys_are_replicated(self):
+        trait_dao = TraitDAO(self.path('traits.db'))
+        trait_dao.add_traits([('friendly', 7.0, 6.0), ('strict', 2.0, 8.0), ('leader', 8.0, 8.0)])
+        self.source.add_persons(['Ann', 'John Doe'])
+        self.source.add_person('Jon Doe', allow_similar=True)
+        service = PersonService(self.source, trait_dao, decay_half_life_days=30.0, clock=lambda: 1000.0)
+        for name, description in [('Ann', 'friendly leader'), ('John Doe', 'strict leader'), ('Jon Doe', 'strict')]:
+            service.add_description_to_person(name, description)
+
+        def derived(dao):
+            return ({name: dao.get_trait_counts(name) for name in ('Ann', 'John Doe', 'Jon Doe')},
+                    dao.get_top_pairs(), dao.get_decay_half_life(), dao.find_duplicate_groups())
+
+        first = self.sync(0, 'first.jsonl')
+        self.assertEqual(derived(self.replica), derived(self.source))
+        self.assertEqual(derived(self.replica)[3], [['John Doe', 'Jon Doe']])
+
+        # Merging moves trait counts and deletes a person, with its counts and name keys
+        service.dedupe()
+        self.sync(first.through, 'second.jsonl')
+        self.assertEqual(self.rows(self.replica), self.rows(self.source))
+        self.assertEqual(self.replica.get_trait_counts('John Doe'), {'strict': 2, 'leader': 1})
+        self.assertEqual(self.replica.get_trait_counts('Jon Doe'), {})
+        self.assertEqual(self.replica.find_duplicate_groups(), [])
+
+    def test_invalid_composite_keys_are_rejected(self):
+        path = self.path('bad.jsonl')
+        self.source.add_person('Ann')
+        changefeed.export_changes(self.source.db_name, 'persons', path)
+        with open(path, 'a', encoding='utf-8') as handle:
+            handle.write('{"seq": 99, "table": "person_traits", "op": "delete", "key": "Ann"}\n')
+        with self.assertRaisesRegex(ValueError, 'Line 3'):
+            changefeed.apply_changes(self.replica.db_name, 'persons', path)
+        self.assertEqual(self.rows(self.replica), [])
+
+    def test_files_that_leave_a_gap_are_refused(self):
+        self.source.add_person('Ann')
+        first = changefeed.export_changes(self.source.db_name, 'persons', self.path('first.jsonl'))
+        self.source.add_person('Bob')
+        changefeed.export_changes(self.source.db_name, 'persons', self.path('second.jsonl'), since=first.through)
+        with self.assertRaises(ValueError):
+            changefeed.apply_changes(self.replica.db_name, 'persons', self.path('second.jsonl'))
+        self.assertEqual(self.rows(self.replica), [])
+
+    def test_traits_feed_updates_lexicon(self):
+        source, replica = TraitDAO(self.path('traits_a.db')), TraitDAO(self.path('traits_b.db'))
+        source.create_tables()
+        source.add_traits([('friendly', 7.0, 6.0), ('strict', 2.0, 8.0)])
+        changefeed.export_changes(source.db_name, 'traits', self.path('traits.jsonl'))
+        changefeed.apply_changes(replica.db_name, 'traits', self.path('traits.jsonl'))
+        self.assertEqual(replica.get_all(), source.get_all())
+        self.assertEqual(replica.get_trait_index().resolve('friendly'), 'friendly')
+
+    def test_mismatched_and_invalid_files_are_rejected(self):
+        self.source.add_person('Ann')
+        changefeed.export_changes(self.source.db_name, 'persons', self.path('persons.jsonl'))
+        with self.assertRaises(ValueError):
+            changefeed.apply_changes(self.path('traits.db'), 'traits', self.path('persons.jsonl'))
+        with open(self.path('broken.jsonl'), 'w') as handle:
+            handle.write(open(self.path('persons.jsonl')).readline())
+            handle.write('{"table": "persons", "op": "upsert", "key": "Eve", "row": {"person": "Mallory"}}\n')
+        with self.assertRaises(ValueError):
+            changefeed.apply_changes(self.replica.db_name, 'persons', self.path('broken.jsonl'))
+        self.assertEqual(self.rows(self.replica), [])
+
+    def test_prune_changes(self):
+        for name in ('Ann', 'Bob'):
+            self.source.add_person(name)
+        info = changefeed.export_changes(self.source.db_name, 'persons', self.path('all.jsonl'))
+        self.assertEqual(changefeed.prune_changes(self.source.db_name, 'persons', info.through), 2)
+        self.assertEqual(self.change_count(self.source), 0)
+
+
+class TestQueryLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, 'persons.db')
+        schema.invalidate()
+        schema.ensure_schema(self.db_name, schema.PERSONS_MIGRATIONS)
+        query_log.reset_query_stats()
+
+    def tearDown(self):
+        db_connection.configure(disable_tracing=True)
+        query_log.reset_query_stats()
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+    def test_tracing_is_off_by_default(self):
+        with db_connection.DatabaseConnection(self.db_name) as (conn, cursor):
+            self.assertNotIsInstance(cursor, query_log.TracingCursor)
+            cursor.execute('SELECT COUNT(*) FROM persons')
+        self.assertEqual(query_log.query_stats(), [])
+
+    def test_slow_statements_are_logged_with_plan_and_redacted_params(self):
+        db_connection.configure(slow_query_ms=0)
+        with self.assertLogs('query_log', level='WARNING') as logs:
+            with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
+                cursor.execute("SELECT * FROM persons WHERE n_friendliness = ?", (7,))
+                cursor.fetchall()
+                cursor.execute("SELECT * FROM persons WHERE person = 'Secret Name'")
+        output = '\n'.join(logs.output)
+        self.assertIn('SCAN persons', output)
+        self.assertIn('params: 1 redacted', output)
+        self.assertNotIn('Secret Name', output)
+
+        stats = {entry.statement: entry for entry in query_log.query_stats()}
+        scan = stats['SELECT * FROM persons WHERE n_friendliness = ?']
+        self.assertTrue(scan.full_scan)
+        self.assertEqual(scan.count, 1)
+        self.assertFalse(stats['SELECT * FROM persons WHERE person = ?'].full_scan)
+
+    def test_aggregates_without_logging(self):
+        db_connection.configure(slow_query_ms=float('inf'))
+        with self.assertNoLogs('query_log', level='WARNING'):
+            db_connection.run_write(self.db_name, lambda conn, cursor: cursor.executemany(
+                'INSERT INTO persons (person) VALUES (?)', ((f'p{i}',) for i in range(3))))
+            for _ in range(2):
+                with db_connection.DatabaseConnection(self.db_name) as (conn, _):
+                    self.assertEqual(conn.execute('SELECT COUNT(*) FROM persons').fetchone()[0], 3)
+        stats = {entry.statement: entry for entry in query_log.query_stats()}
+        self.assertEqual(stats['SELECT COUNT(*) FROM persons'].count, 2)
+        self.assertEqual(stats['INSERT INTO persons (person) VALUES (?)'].count, 1)
+
+
+class TestLoadGenerator(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.persons_db = os.path.join(self.tmp_dir.name, 'persons.db')
+        self.traits_db = os.path.join(self.tmp_dir.name, 'traits.db')
+        schema.invalidate()
+
+    def tearDown(self):
+        db_connection.configure(concurrency='default')
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+    def test_mixed_workload_reports_percentiles_per_operation(self):
+        loadgen.seed_databases(self.persons_db, self.traits_db, candidates=200, seed=3)
+        config = loadgen.LoadConfig(self.persons_db, self.traits_db, workers=3, duration=0.6,
+                                    read_ratio=0.5, concurrency='wal', seed=3)
+        windows = []
+        with mock.patch('builtins.print'):
+            samples = loadgen.run_load(config, interval=0.2,
+                                       report=lambda start, end, window: windows.append(window))
+
+        self.assertGreater(len(windows), 1)
+        self.assertEqual(sum(len(window) for window in windows), len(samples))
+        stats = loadgen.summarize(samples, config.duration)
+        self.assertEqual(set(stats), set(loadgen.OPERATIONS))
+        for entry in stats.values():
+            self.assertLessEqual(entry.p50_ms, entry.p95_ms)
+            self.assertLessEqual(entry.p95_ms, entry.p99_ms)
+            self.assertEqual(entry.other_errors, 0)
+
+        # Writes went through the services, so personality counts moved
+        conn = sqlite3.connect(self.persons_db)
+        updated = conn.execute('SELECT COUNT(*) FROM persons WHERE n_friendliness > 1').fetchone()[0]
+        conn.close()
+        self.assertGreater(updated, 0)
+
+
+class TestDatabaseLocation(unittest.TestCase):
+    def setUp(self):
+        schema.invalidate()
+
+    def tearDown(self):
+        db_connection.configure(db_dir='', tenant='')
+        schema.invalidate()
+
+    def test_db_dir_argument(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db_connection.configure(db_dir=os.path.join(directory, 'data'))
+            self.assertEqual(PersonDAO().db_name, os.path.join(directory, 'data', 'persons.db'))
+            db_connection.configure(tenant='acme')
+            self.assertEqual(PersonDAO().db_name, os.path.join(directory, 'data', 'tenants', 'acme', 'persons.db'))
+            self.assertEqual(PersonDAO('explicit.db').db_name, 'explicit.db')
+
+    def test_baseline_databases_are_migrated_on_first_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Tables as created before schema versioning (user_version 0)
+            conn = sqlite3.connect(os.path.join(directory, 'persons.db'))
+            conn.execute('CREATE TABLE persons (person TEXT PRIMARY KEY, friendliness REAL DEFAULT 0.0, '
+                         'dominance REAL DEFAULT 0.0, n_friendliness INTEGER DEFAULT 0, '
+                         'n_dominance INTEGER DEFAULT 0)')
+            conn.execute("INSERT INTO persons (person) VALUES ('Alice')")
+            conn.commit()
+            conn.close()
+            conn = sqlite3.connect(os.path.join(directory, 'traits.db'))
+            conn.execute('CREATE TABLE traits (trait TEXT PRIMARY KEY, friendliness REAL, dominance REAL)')
+            conn.execute("INSERT INTO traits VALUES ('friendly', 8.0, 2.0), ('leader', 1.0, 9.0)")
+            conn.commit()
+            conn.close()
+
+            db_connection.configure(db_dir=directory)
+            output = io.StringIO()
+            with redirect_stdout(output):
+                person_commands.add_description_to_person(
+                    SimpleNamespace(name='Alice', description='friendly leader'))
+            self.assertNotIn('error', output.getvalue().lower())
+            person = PersonDAO().get_person('Alice')
+            self.assertEqual((person['n_friendliness'], person['n_dominance']), (2, 2))
+            self.assertIsNotNone(person['decay_updated_at'])
+            db_connection.close_reused_connections()
+
+    def test_memory_databases_are_shared_until_closed(self):
+        db_connection.configure(db_dir=db_connection.MEMORY)
+        writer = PersonDAO()
+        writer.create_tables()
+        writer.add_person('Alice')
+        self.assertIsNotNone(PersonDAO().get_person('Alice'))
+        self.assertTrue(db_connection.is_uri(writer.db_name))
+
+        db_connection.close_memory_databases()
+        fresh = PersonDAO()
+        self.assertNotEqual(fresh.db_name, writer.db_name)
+        fresh.create_tables()
+        self.assertIsNone(fresh.get_person('Alice'))
+
+    def test_memory_tenants_and_snapshots(self):
+        db_connection.configure(db_dir=db_connection.MEMORY)
+        for tenant in ('globex', 'acme'):
+            dao = PersonDAO(tenant=tenant)
+            dao.create_tables()
+            dao.add_person(f'{tenant}-person')
+        self.assertEqual(db_connection.list_tenants('persons.db'), ['acme', 'globex'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, 'acme.db')
+            backup.snapshot(PersonDAO(tenant='acme').db_name, snapshot)
+            conn = sqlite3.connect(snapshot)
+            self.assertEqual(conn.execute('SELECT person FROM persons').fetchall(), [('acme-person',)])
+            conn.close()
+
+    def test_temp_dir_is_removed_when_switching_away(self):
+        db_connection.configure(db_dir=db_connection.TEMP)
+        dao = PersonDAO()
+        dao.create_tables()
+        directory = os.path.dirname(dao.db_name)
+        self.assertTrue(os.path.exists(dao.db_name))
+        db_connection.configure(db_dir='')
+        self.assertFalse(os.path.exists(directory))
+
+
+class TestMemoryBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.backend = MemoryBackend()
+
+    def tearDown(self):
+        self.backend.close()
+        schema.invalidate()
+        self.tmp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    @staticmethod
+    def _populate(person_dao, trait_dao):
+        trait_dao.create_tables()
+        person_dao.create_tables()
+        trait_dao.add_traits([('friendly', 7.0, 6.0), ('strict', 2.0, 8.0), ('leader', 8.0, 8.0)])
+        trait_dao.add_trait('Calm', Personality(5.0, -2.0))
+        person_dao.add_persons(['Ann', 'Bob', 'Carol', 'Dave', 'John Doe'])
+        person_dao.add_person('Jon Doe', allow_similar=True)
+        persons = PersonService(person_dao, trait_dao, decay_half_life_days=30.0, clock=lambda: 1000.0)
+        for name, description in [('Ann', 'friendly leader'), ('Bob', 'strict'), ('Carol', 'calm friendly'),
+                                  ('Ann', 'calm'), ('John Doe', 'strict leader'), ('Jon Doe', 'friendly')]:
+            persons.add_description_to_person(name, description)
+        return persons
+
+    def _results(self, person_dao, trait_dao):
+        """Runs every service on a backend and collects what they return."""
+        persons = self._populate(person_dao, trait_dao)
+        companies = CompanyService(person_dao, trait_dao)
+        traits = TraitService(trait_dao, [person_dao])
+        results = {
+            'all': companies.find_matches_for_description('friendly leader', percentiles=True),
+            'top': companies.find_matches_for_description('strict', top=2),
+            'decayed': companies.find_matches_for_description('calm', decay_half_life_days=30.0, now=5000.0),
+            'profile': (companies.save_profile('Acme', 'friendly calm').target,
+                        companies.get_profile_matches('Acme', 3, percentiles=True)),
+            'roles': (companies.save_roles([('Lead', 'leader'), ('Mediator', 'calm'), ('Nothing', 'xyz')]),
+                      companies.find_roles_for_person('Carol', 2)),
+            'cooccurring': (traits.cooccurring_traits('leader'), traits.top_pairs(2)),
+            'updated': traits.update_trait('friendly', Personality(6.0, 5.0)),
+            'imported': traits.import_traits({'friendly': Personality(6.0, 5.0), 'strict': Personality(1.0, 9.0),
+                                              'bold': Personality(4.0, 9.0)})[0].summary(),
+            'dedupe': persons.dedupe(),
+            'cohorts': AnalyticsService(person_dao).cohorts(method='grid', cell_size=2.0),
+        }
+        results['persons'] = sorted((p['person'], round(p['friendliness'], 9), round(p['dominance'], 9),
+                                     p['n_friendliness'], p['n_dominance']) for p in person_dao.get_all())
+        results['after'] = companies.get_profile_matches('Acme', 10)
+        results['counts'] = person_dao.get_trait_counts('John Doe')
+        results['john'] = {key: round(value, 9) if isinstance(value, float) else value
+                           for key, value in person_dao.get_person('John Doe').items()}
+        return results
+
+    def test_services_give_the_same_results_on_both_backends(self):
+        sqlite = self._results(PersonDAO(self._path('persons.db')), TraitDAO(self._path('traits.db')))
+        memory = self._results(self.backend.persons, self.backend.traits)
+        for key in sqlite:
+            self.assertEqual(repr(memory[key]), repr(sqlite[key]), key)
+
+    def test_similar_and_existing_names_are_rejected(self):
+        self.backend.persons.add_person('John Doe')
+        with self.assertRaises(SimilarPersonError):
+            self.backend.persons.add_person('Doe, John')
+        with self.assertRaises(ValueError):
+            self.backend.persons.add_person(' John Doe ')
+
+    def test_snapshot_round_trips_the_whole_store(self):
+        self._populate(self.backend.persons, self.backend.traits)
+        CompanyService(self.backend.persons, self.backend.traits).save_profile('Acme', 'friendly')
+        path = self.backend.snapshot(self._path('store.npz'))
+
+        with MemoryBackend(path) as loaded:
+            self.assertEqual(loaded.persons.get_all(), self.backend.persons.get_all())
+            self.assertEqual(loaded.persons.get_person('Ann'), self.backend.persons.get_person('Ann'))
+            self.assertEqual(loaded.persons.get_trait_counts('Ann'), {'calm': 1, 'friendly': 1, 'leader': 1})
+            self.assertEqual(loaded.persons.get_top_pairs(), self.backend.persons.get_top_pairs())
+            self.assertEqual(loaded.traits.get_all(), self.backend.traits.get_all())
+            self.assertEqual(loaded.companies.get_top('Acme', 3), self.backend.companies.get_top('Acme', 3))
+            with self.assertRaises(SimilarPersonError):
+                loaded.persons.add_person('Jon  Doe')
+
+        with open(self._path('bad.npz'), 'wb') as handle:
+            np.savez(handle, meta=np.frombuffer(b'{"format": "other"}', dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            MemoryBackend().load(self._path('bad.npz'))
+
+    def test_background_snapshots_and_close_persist_changes(self):
+        path = self._path('store.npz')
+        backend = MemoryBackend(path, snapshot_interval=0.02)
+        backend.persons.add_person('Ann')
+        deadline = time.monotonic() + 5
+        while not os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(os.path.exists(path))
+        backend.persons.add_person('Bob')
+        backend.close()
+        self.assertEqual([p['person'] for p in MemoryBackend(path).persons.get_all()], ['Ann', 'Bob'])
+
@@ -7,12 +7,30 @@ their friendliness and dominance scores.
 
 Functions:
     create_trait: Handles the 'trait create' command to create new personality traits.
+    update_trait: Handles the 'trait update' command to move a trait and recompute affected profiles.
+    show_cooccurrences: Handles the 'trait cooccur' command to show traits named together.
     list_traits: Handles the 'trait list' command to display all available traits.
+    import_traits: Handles the 'trait import' command to bulk-load a lexicon file.
+    export_traits: Handles the 'trait export' command to write the lexicon to a file.
 """
 
-from typing import Any
+from typing import Any, List
 from trait_dao import TraitDAO
+from person_dao import PersonDAO
 from personality_models import Personality # Import the correct Personality model
+from services.trait_service import TraitService
+from tenancy import TenantRouter
+import lexicon
+
+
+def _person_daos(args: Any) -> List[PersonDAO]:
+    """The persons databases whose profiles follow trait changes."""
+    person_daos = [PersonDAO()]
+    if getattr(args, 'all_tenants', False):
+        router = TenantRouter()
+        person_daos += [router.person_dao(tenant) for tenant in router.tenants()
+                        if router.persons_db(tenant) != person_daos[0].db_name]
+    return person_daos
 
 def create_trait(args: Any) -> None:
     """Handles the 'trait create' command."""
@@ -35,7 +53,7 @@ def create_trait(args: Any) -> None:
 
     # Instantiate DAO directly
     trait_dao = TraitDAO()
-    # Table creation might be better handled centrally (e.g., on app startup or via a setup command)
+    # Schema check is cached per process; migrations only run when the version is behind
     trait_dao.create_tables()
     try:
         # Create Personality object from validated data
@@ -46,6 +64,51 @@ def create_trait(args: Any) -> None:
         print(f"Error creating trait '{args.name}': {str(e)}")
 
 
+def update_trait(args: Any) -> None:
+    """Handles the 'trait update' command."""
+    try:
+        personality = Personality(float(args.friendliness), float(args.dominance))
+    except ValueError:
+        print("Error: Friendliness and dominance must be numeric values.")
+        return
+
+    trait_dao = TraitDAO()
+    trait_dao.create_tables()
+    try:
+        updated = TraitService(trait_dao, _person_daos(args)).update_trait(args.name, personality)
+    except Exception as e:
+        print(f"Error updating trait '{args.name}': {str(e)}")
+        return
+    print(f"Trait '{args.name.strip().lower()}' updated; recomputed {updated} person profile(s).")
+
+
+def show_cooccurrences(args: Any) -> None:
+    """Handles the 'trait cooccur' command."""
+    service = TraitService(TraitDAO(), _person_daos(args))
+    try:
+        if args.name:
+            descriptions, pairs = service.cooccurring_traits(args.name, args.top)
+            name = args.name.strip().lower()
+            if not descriptions:
+                print(f"No descriptions have named '{name}' yet.")
+                return
+            print(f"'{name}' was named in {descriptions} description(s). Named with it most often:")
+            if not pairs:
+                print("- (no other traits)")
+            for other, count in pairs:
+                print(f"- {other}: {count} ({100.0 * count / descriptions:.1f}%)")
+        else:
+            pairs = service.top_pairs(args.top)
+            if not pairs:
+                print("No traits have been named together yet.")
+                return
+            print("Traits named together most often:")
+            for trait, other, count in pairs:
+                print(f"- {trait} + {other}: {count}")
+    except Exception as e:
+        print(f"Error reading trait co-occurrences: {str(e)}")
+
+
 def list_traits(args: Any) -> None:
     """Handles the 'trait list' command."""
     trait_dao = TraitDAO()
@@ -63,4 +126,50 @@ def list_traits(args: Any) -> None:
         else:
             print("No traits found.")
     except Exception as e:
-        print(f"Error listing traits: {str(e)}")
\ No newline at end of file
+        print(f"Error listing traits: {str(e)}")
+
+
+def import_traits(args: Any) -> None:
+    """Handles the 'trait import' command."""
+    try:
+        traits = lexicon.load_lexicon(args.path, args.format)
+    except (OSError, ValueError) as e:
+        print(f"Error reading lexicon '{args.path}': {str(e)}")
+        return
+
+    trait_dao = TraitDAO()
+    trait_dao.create_tables()
+    try:
+        diff, updated = TraitService(trait_dao, _person_daos(args)).import_traits(
+            traits, prune=args.prune, dry_run=args.dry_run)
+    except Exception as e:
+        print(f"Error importing traits: {str(e)}")
+        return
+
+    prefix = "Dry run: " if args.dry_run else ""
+    print(f"{prefix}Imported {len(traits)} traits from '{args.path}'.")
+    print(f"- Added: {len(diff.added)}")
+    print(f"- Changed: {len(diff.changed)}")
+    if args.prune:
+        print(f"- Removed: {len(diff.removed)}")
+    else:
+        print(f"- Not in file (kept, use --prune to remove): {len(diff.removed)}")
+    print(f"- Unchanged: {diff.unchanged}")
+    if not args.dry_run:
+        print(f"- Person profiles recomputed: {updated}")
+    if args.verbose:
+        for label, names in (('+', diff.added), ('~', diff.changed), ('-', diff.removed)):
+            for name in names:
+                print(f"  {label} {name}")
+
+
+def export_traits(args: Any) -> None:
+    """Handles the 'trait export' command."""
+    trait_dao = TraitDAO()
+    try:
+        count = lexicon.write_lexicon(args.path, trait_dao.iter_traits(), args.format)
+    except Exception as e:
+        print(f"Error exporting traits: {str(e)}")
+        return
+    if args.path != '-':
+        print(f"Exported {count} traits to '{args.path}'.")
\ No newline at end of file
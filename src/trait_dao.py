@@ -3,11 +3,10 @@ Trait Data Access Object (DAO) module for the Personality Analysis System.
 
 This module provides database access operations for trait-related data, including
 CRUD operations, database schema management, and performance optimizations.
-It implements the Data Access Object pattern with a base DAO class for common functionality.
+It implements the SQLite backend of the trait interface defined in base_dao.
 
 Classes:
-    BaseDAO: Abstract base class defining the interface for all DAO operations.
-    TraitDAO: Concrete implementation for trait database operations with full CRUD support.
+    TraitDAO: SQLite implementation of BaseTraitDAO.
 
 The DAO provides functionality for:
 - Creating and managing trait database tables with proper indexing
@@ -18,54 +17,40 @@ The DAO provides functionality for:
 """
 
 import sqlite3
-from abc import ABC, abstractmethod
-from typing import Tuple, List, Dict, Optional
+from typing import Tuple, Dict, Optional, Iterable, Iterator
 import personality_models
 import db_connection
+import schema
+import lexicon
+from base_dao import BaseTraitDAO
 
 # Constants
 DB_TIMEOUT = 5
 
 
-class BaseDAO(ABC):
-    """Abstract base class for Database Access Objects."""
-    def __init__(self, db_name: str):
-        self.db_name = db_name
+class TraitDAO(BaseTraitDAO):
+    """Data Access Object for Trait-related database operations, stored in SQLite."""
+    def __init__(self, db_name: Optional[str] = None):
+        # The lexicon is shared by all tenants
+        super().__init__(db_name or db_connection.resolve_db_path('traits.db', shared=True))
 
-    @abstractmethod
     def create_tables(self):
-        pass
+        """Ensures the traits schema is current (checked once per process)."""
+        schema.ensure_schema(self.db_name, schema.TRAITS_MIGRATIONS)
 
-    @abstractmethod
-    def get_all(self):
-        # Note: Implementations differ (Dict vs List). Consider refining BaseDAO contract.
-        pass
+    def _connect(self) -> db_connection.DatabaseConnection:
+        """Opens a read connection, migrating the schema first if it is out of date."""
+        self.create_tables()
+        return db_connection.DatabaseConnection(self.db_name)
 
-
-class TraitDAO(BaseDAO):
-    """Data Access Object for Trait-related database operations."""
-    def __init__(self):
-        super().__init__('traits.db')
-
-    def create_tables(self):
-        """Creates the traits table if it doesn't exist."""
-        with db_connection.DatabaseConnection(self.db_name) as (conn, cursor):
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS traits (
-                    trait TEXT PRIMARY KEY,
-                    friendliness REAL,
-                    dominance REAL
-                )
-            ''')
-            # Add indexes for better query performance
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_trait_name ON traits(trait)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_trait_friendliness ON traits(friendliness)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_trait_dominance ON traits(dominance)')
-            conn.commit()
+    def _write(self, op):
+        """Runs ``op`` through db_connection.run_write once the schema is current."""
+        self.create_tables()
+        return db_connection.run_write(self.db_name, op)
 
     def get_all(self) -> Dict[str, personality_models.Personality]:
         """Retrieves all traits as a dictionary keyed by trait name."""
-        with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
+        with self._connect() as (_, cursor):
             cursor.execute('SELECT trait, friendliness, dominance FROM traits')
             return {
                 row[0]: personality_models.Personality(row[1], row[2])
@@ -74,7 +59,7 @@ class TraitDAO(BaseDAO):
 
     def get_trait(self, name: str) -> Optional[personality_models.Personality]:
         """Retrieves a single trait by name."""
-        with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
+        with self._connect() as (_, cursor):
             cursor.execute('SELECT friendliness, dominance FROM traits WHERE trait=?', (name,))
             row = cursor.fetchone()
             # print(f"TraitDAO.get_trait('{name}') - row: {row}") # Debug print removed
@@ -85,55 +70,99 @@ class TraitDAO(BaseDAO):
 
     def add_trait(self, name: str, personality: personality_models.Personality):
         """Adds a new trait to the database."""
-        # Input validation
-        if not isinstance(name, str):
-            raise TypeError("Trait name must be a string")
-        if not name.strip():
-            raise ValueError("Trait name cannot be empty")
-        if not isinstance(personality, personality_models.Personality):
-            raise TypeError("Personality must be a Personality object")
-
-        name = name.strip().lower()  # Normalize trait names
-        if len(name) > 50:  # Reasonable limit
-            raise ValueError("Trait name cannot exceed 50 characters")
-
-        # Validate personality scores
-        if not (-10 <= personality.friendliness <= 10) or not (-10 <= personality.dominance <= 10):
-            raise ValueError("Personality scores must be between -10 and 10")
-
-        with db_connection.DatabaseConnection(self.db_name) as (conn, cursor):
-            try:
-                cursor.execute(
-                    'INSERT INTO traits (trait, friendliness, dominance) VALUES (?, ?, ?)',
-                    (name, personality.friendliness, personality.dominance)
-                )
-                conn.commit()
-            except sqlite3.IntegrityError:
-                raise ValueError(f"Trait '{name}' already exists.")
-
-    def update_trait(self, name: str, personality: personality_models.Personality):
-        """Updates an existing trait in the database."""
-        with db_connection.DatabaseConnection(self.db_name) as (conn, cursor):
+        name = self._validate_trait(name, personality)
+
+        def insert(conn, cursor):
+            cursor.execute(
+                'INSERT INTO traits (trait, friendliness, dominance) VALUES (?, ?, ?)',
+                (name, personality.friendliness, personality.dominance)
+            )
+
+        try:
+            self._write(insert)
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Trait '{name}' already exists.")
+
+    def update_trait(self, name: str,
+                     personality: personality_models.Personality) -> Optional[personality_models.Personality]:
+        """Updates an existing trait and returns its previous coordinates, or None if it does not exist."""
+        def update(conn, cursor):
+            # Take the write lock before reading so the returned coordinates are the ones replaced
+            db_connection.begin_immediate(conn, cursor)
+            cursor.execute('SELECT friendliness, dominance FROM traits WHERE trait=?', (name,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
             cursor.execute(
                 'UPDATE traits SET friendliness=?, dominance=? WHERE trait=?',
                 (personality.friendliness, personality.dominance, name)
             )
-            conn.commit() # Consider checking cursor.rowcount to ensure update occurred
+            return personality_models.Personality(row[0], row[1])
 
-    def get_all_traits(self) -> List[Dict]:
-        """Returns all traits as a list of dictionaries."""
-        with db_connection.DatabaseConnection(self.db_name) as (_, cursor):
+        return self._write(update)
+
+    def add_traits(self, rows: Iterable[Tuple[str, float, float]]):
+        """Adds (trait, friendliness, dominance) rows in one transaction, skipping existing traits."""
+        rows = list(rows)  # Materialize so a retried transaction sees the same rows
+        self._write(lambda conn, cursor: cursor.executemany(
+            'INSERT OR IGNORE INTO traits (trait, friendliness, dominance) VALUES (?, ?, ?)',
+            rows
+        ))
+
+    def import_traits(self, traits: Dict[str, personality_models.Personality],
+                      prune: bool = False, dry_run: bool = False) -> lexicon.LexiconDiff:
+        """Upserts a whole lexicon in a single transaction and returns what changed.
+
+        Args:
+            traits: Validated traits keyed by normalized name.
+            prune: Also delete stored traits that are missing from ``traits``. Without it,
+                ``diff.removed`` lists the missing traits but they are kept.
+            dry_run: Compute the diff without writing anything.
+        """
+        if dry_run:
+            return lexicon.diff_lexicon(self.get_all(), traits)
+
+        def apply(conn, cursor):
+            # Take the write lock before reading so the diff matches what gets written
+            db_connection.begin_immediate(conn, cursor)
             cursor.execute('SELECT trait, friendliness, dominance FROM traits')
-            columns = [description[0] for description in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            current = {
+                row[0]: personality_models.Personality(row[1], row[2])
+                for row in cursor.fetchall()
+            }
+            diff = lexicon.diff_lexicon(current, traits)
+            upserts = [(name, traits[name].friendliness, traits[name].dominance)
+                       for name in diff.added + diff.changed]
+            cursor.executemany('''
+                INSERT INTO traits (trait, friendliness, dominance) VALUES (?, ?, ?)
+                ON CONFLICT(trait) DO UPDATE SET
+                    friendliness=excluded.friendliness, dominance=excluded.dominance
+            ''', upserts)
+            if prune:
+                cursor.executemany('DELETE FROM traits WHERE trait=?', [(name,) for name in diff.removed])
+            return diff
+
+        return self._write(apply)
+
+    def iter_traits(self, batch_size: int = 1000) -> Iterator[Tuple[str, float, float]]:
+        """Streams (trait, friendliness, dominance) rows ordered by name."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT trait, friendliness, dominance FROM traits ORDER BY trait')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def get_lexicon_version(self) -> Tuple[str, int]:
+        """Returns a (generation, version) pair that changes whenever any trait is written."""
+        with self._connect() as (_, cursor):
+            cursor.execute('SELECT generation, version FROM lexicon_meta WHERE id = 1')
+            row = cursor.fetchone()
+            return (row[0], row[1]) if row else ('', 0)
 
     def reset_database(self):
-        """Resets the traits database by dropping and recreating the table."""
-        try:
-            with db_connection.DatabaseConnection(self.db_name) as (conn, cursor):
-                cursor.execute("DROP TABLE IF EXISTS traits")
-                conn.commit()
-        except sqlite3.OperationalError as e:
-            # Provide more context for the error
-            print(f"Database lock error during traits reset: {e}. Ensure no other processes are accessing traits.db.")
+        """Resets the traits database by dropping and recreating the schema."""
+        # Lock errors are retried with backoff inside reset_schema and raised if they persist
+        schema.reset_schema(self.db_name)
         self.create_tables() # Recreate the tables
\ No newline at end of file
@@ -0,0 +1,229 @@
+"""
+Write-behind buffer module for the Personality Analysis System.
+
+This module provides a drop-in wrapper around PersonDAO that buffers personality
+updates in memory and writes them to the database in grouped transactions. Repeated
+updates to the same person are coalesced, so only the latest state is written, along
+with the trait observations and co-occurrence counts of all the coalesced updates.
+
+Durability semantics:
+- ``update_personality`` returns as soon as the update is buffered. It is durable only
+  after the next flush, which happens when ``max_pending`` persons are buffered, when
+  the oldest buffered update is ``max_delay`` seconds old, on ``flush()``/``close()``,
+  and at interpreter exit. A crash loses at most the updates buffered since the last
+  flush.
+- Reads through the buffer always see buffered updates: ``get_person`` overlays them,
+  and every other DAO method flushes first. Other connections and processes, and
+  DAOs obtained from the wrapped one (such as ``get_company_dao()``), only see them
+  after they are flushed.
+- A flush writes outside the buffer lock, so updates and ``get_person`` calls do not
+  wait for the database; flushes themselves run one at a time, in order.
+
+Classes:
+    BufferedPersonDAO: PersonDAO wrapper that coalesces and group-commits updates.
+"""
+
+import atexit
+import functools
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+import personality_models
+from person_dao import PersonDAO, TraitPairCounts
+
+# Constants
+DEFAULT_MAX_PENDING = 1000
+DEFAULT_MAX_DELAY = 0.25  # seconds
+
+PendingUpdate = Tuple[personality_models.Personality, int, int, Optional[personality_models.DecayState],
+                      Counter, Counter]
+
+
+def _coalesce(previous: Optional[PendingUpdate], update: PendingUpdate) -> PendingUpdate:
+    """Combines two updates of one person; the later one's scores win, counts add up."""
+    if previous is None:
+        return update
+    personality, n_friendliness, n_dominance, decay, observed, cooccurring = update
+    # Coalescing must not drop decayed sums or trait counts that are still unwritten
+    return (personality, n_friendliness, n_dominance, previous[3] if decay is None else decay,
+            observed + previous[4], cooccurring + previous[5])
+
+
+class BufferedPersonDAO:
+    """Wraps a PersonDAO and group-commits personality updates.
+
+    Attributes other than the buffered read/write methods are delegated to the
+    wrapped DAO, flushing first, so the wrapper can be passed wherever a PersonDAO
+    is expected.
+    """
+    def __init__(self, person_dao: PersonDAO, max_pending: int = DEFAULT_MAX_PENDING,
+                 max_delay: float = DEFAULT_MAX_DELAY):
+        """
+        Initializes the buffer.
+
+        Args:
+            person_dao: The DAO that receives flushed updates.
+            max_pending: Number of distinct buffered persons that triggers a flush.
+            max_delay: Maximum age in seconds of a buffered update before it is flushed.
+        """
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        if max_delay <= 0:
+            raise ValueError("max_delay must be positive")
+        self.person_dao = person_dao
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self.last_error: Optional[Exception] = None
+        self._pending: Dict[str, PendingUpdate] = {}
+        self._flushing: Dict[str, PendingUpdate] = {}  # being written, still overlaid by reads
+        self._oldest_pending_at: Optional[float] = None
+        self._cond = threading.Condition(threading.RLock())
+        # Serializes flushes and is held across their writes; taken before _cond, never after
+        self._flush_lock = threading.RLock()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._run_flusher, name='person-write-buffer', daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.person_dao, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def flushed(*args, **kwargs):
+            # The wrapped DAO must not answer reads, or act on rows, without buffered updates
+            self.flush()
+            return attribute(*args, **kwargs)
+        return flushed
+
+    def __enter__(self) -> 'BufferedPersonDAO':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def pending_count(self) -> int:
+        """Number of persons with updates that are not written yet, including a flush in progress."""
+        with self._cond:
+            return len(self._pending.keys() | self._flushing.keys())
+
+    def get_person(self, name: str) -> Optional[Dict]:
+        """Retrieves a person, overlaying any buffered update."""
+        with self._cond:
+            pending = self._pending.get(name)
+            if name in self._flushing:
+                pending = self._flushing[name] if pending is None else _coalesce(self._flushing[name], pending)
+        # An in-flight flush is still overlaid, so reading before or after it commits gives the same
+        person = self.person_dao.get_person(name)
+        if person is not None and pending is not None:
+            personality, n_friendliness, n_dominance, decay, _, _ = pending
+            person.update(friendliness=personality.friendliness, dominance=personality.dominance,
+                          n_friendliness=n_friendliness, n_dominance=n_dominance)
+            if decay is not None:
+                person.update(decay_updated_at=decay.updated_at, decay_weight=decay.weight,
+                              decay_f_sum=decay.friendliness_sum, decay_d_sum=decay.dominance_sum)
+        return person
+
+    def get_all(self) -> List[Dict]:
+        """Flushes buffered updates, then retrieves all persons."""
+        self.flush()
+        return self.person_dao.get_all()
+
+    def update_personality(self, name: str, personality: personality_models.Personality,
+                           n_friendliness: int, n_dominance: int,
+                           decay: Optional[personality_models.DecayState] = None,
+                           traits: Optional[Dict[str, int]] = None,
+                           pairs: Optional[TraitPairCounts] = None):
+        """Buffers a personality update; see the module docstring for durability."""
+        with self._cond:
+            full = self._buffer(name, (personality, n_friendliness, n_dominance, decay, traits, pairs))
+        if full:
+            self.flush()
+
+    def modify_person(self, name: str, modify: Callable[[Dict], Tuple]):
+        """Buffers ``modify(person)`` for a person as seen through the buffer, atomically."""
+        with self._cond:
+            # No other update through this buffer can slip in between the read and the write
+            person = self.get_person(name)
+            if person is None:
+                raise ValueError(f"Person '{name}' not found.")
+            full = self._buffer(name, modify(person))
+        if full:
+            self.flush()
+
+    def _buffer(self, name: str, update: Tuple) -> bool:
+        """Coalesces an update into the buffer; returns whether it is full. Called with the lock held."""
+        if self._closed:
+            raise RuntimeError("Write buffer is closed")
+        personality, n_friendliness, n_dominance, *rest = update
+        decay, traits, pairs = (list(rest) + [None, None, None])[:3]
+        if not self._pending:
+            self._oldest_pending_at = time.monotonic()
+            self._cond.notify()
+        self._pending[name] = _coalesce(self._pending.get(name), (
+            personality, n_friendliness, n_dominance, decay, Counter(traits or {}), Counter(pairs or {})))
+        # Flushing takes _flush_lock, so the caller does it after releasing the lock
+        return len(self._pending) >= self.max_pending
+
+    def flush(self) -> int:
+        """Writes all buffered updates in one transaction and returns how many were written."""
+        with self._flush_lock:
+            with self._cond:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                self._oldest_pending_at = None
+            rows = [(name, *pending) for name, pending in self._flushing.items()]
+            try:
+                self.person_dao.update_personalities(rows)
+            except Exception:
+                # Put the updates back under any that arrived meanwhile, for the next flush
+                with self._cond:
+                    for name, pending in self._pending.items():
+                        self._flushing[name] = _coalesce(self._flushing.get(name), pending)
+                    self._pending, self._flushing = self._flushing, {}
+                    self._oldest_pending_at = time.monotonic()
+                raise
+            with self._cond:
+                self._flushing = {}
+            return len(rows)
+
+    def apply_trait_deltas(self, deltas: Dict[str, Tuple[float, float]]) -> int:
+        """Flushes buffered updates, then shifts the persons who observed the changed traits."""
+        with self._flush_lock:
+            # Buffered scores were computed from the old coordinates and would overwrite the shift
+            self.flush()
+            return self.person_dao.apply_trait_deltas(deltas)
+
+    def close(self):
+        """Flushes buffered updates and stops the background flusher."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._flusher.join()
+        atexit.unregister(self.close)
+        self.flush()
+
+    def _run_flusher(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._pending:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                remaining = self._oldest_pending_at + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+            try:
+                self.flush()
+                self.last_error = None
+            except Exception as e:
+                # flush kept the updates buffered; the next one retries them
+                self.last_error = e
+                print(f"Warning: write-behind flush failed, will retry: {e}")